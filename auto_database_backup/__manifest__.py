@@ -22,7 +22,7 @@
 {
     'name': "Automatic Database Backup To Local Server, Remote Server,"
             "Google Drive, Dropbox, Onedrive, Nextcloud and Amazon S3 Odoo17",
-    'version': '17.0.6.0.1',
+    'version': '17.0.31.0.1',
     'live_test_url': 'https://youtu.be/Q2yMZyYjuTI',
     'category': 'Extra Tools',
     'summary': 'Odoo Database Backup, Automatic Backup, Database Backup, Automatic Backup,Database auto-backup, odoo backup'
@@ -36,13 +36,18 @@
     'depends': ['base', 'mail'],
     'data': [
         'security/ir.model.access.csv',
+        'data/ir_config_parameter_data.xml',
         'data/ir_cron_data.xml',
         'data/mail_template_data.xml',
         'views/db_backup_configure_views.xml',
+        'views/db_backup_run_views.xml',
+        'views/db_backup_catalog_views.xml',
+        'views/db_backup_restore_job_views.xml',
+        'wizard/db_backup_restore_views.xml',
         'wizard/dropbox_auth_code_views.xml',
     ],
     'external_dependencies': {
-        'python': ['dropbox', 'pyncclient', 'boto3', 'nextcloud-api-wrapper','paramiko']},
+        'python': ['dropbox', 'boto3', 'paramiko']},
     'images': ['static/description/banner.gif'],
     'license': 'LGPL-3',
     'installable': True,
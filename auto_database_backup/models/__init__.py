@@ -20,3 +20,9 @@
 #
 ###############################################################################
 from . import db_backup_configure
+from . import db_backup_blob
+from . import db_backup_catalog
+from . import db_backup_manifest
+from . import db_backup_run
+from . import db_backup_wal
+from . import db_backup_restore_job
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+###############################################################################
+#
+#    Cybrosys Technologies Pvt. Ltd.
+#
+#    Copyright (C) 2023-TODAY Cybrosys Technologies(<https://www.cybrosys.com>)
+#    Author: Cybrosys Techno Solutions (odoo@cybrosys.com)
+#
+#    You can modify it under the terms of the GNU LESSER
+#    GENERAL PUBLIC LICENSE (LGPL v3), Version 3.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU LESSER GENERAL PUBLIC LICENSE (LGPL v3) for more details.
+#
+#    You should have received a copy of the GNU LESSER GENERAL PUBLIC LICENSE
+#    (LGPL v3) along with this program.
+#    If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+from odoo import fields, models
+
+
+class DbBackupBlob(models.Model):
+    """Filestore file already stored on the destination of a backup
+    configuration in deduplicated filestore mode, so that it is never
+    uploaded again"""
+    _name = 'db.backup.blob'
+    _description = 'Database Backup Filestore Blob'
+
+    config_id = fields.Many2one('db.backup.configure',
+                                string='Backup Configuration', required=True,
+                                index=True, ondelete='cascade',
+                                help='Configuration which uploaded the blob')
+    checksum = fields.Char(string='Checksum', required=True,
+                           help='SHA-1 of the file, which is also its name on'
+                                ' the destination')
+    key = fields.Char(string='Remote Key',
+                      help='Path or identifier of the blob on the '
+                           'destination, empty for the blobs uploaded before '
+                           'it was recorded, which are never deleted')
+
+    _sql_constraints = [
+        ('checksum_uniq', 'unique(config_id, checksum)',
+         'A filestore blob is uploaded only once per configuration.'),
+    ]
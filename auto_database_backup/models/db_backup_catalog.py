@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+###############################################################################
+#
+#    Cybrosys Technologies Pvt. Ltd.
+#
+#    Copyright (C) 2023-TODAY Cybrosys Technologies(<https://www.cybrosys.com>)
+#    Author: Cybrosys Techno Solutions (odoo@cybrosys.com)
+#
+#    You can modify it under the terms of the GNU LESSER
+#    GENERAL PUBLIC LICENSE (LGPL v3), Version 3.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU LESSER GENERAL PUBLIC LICENSE (LGPL v3) for more details.
+#
+#    You should have received a copy of the GNU LESSER GENERAL PUBLIC LICENSE
+#    (LGPL v3) along with this program.
+#    If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+from odoo import fields, models, _
+
+
+class DbBackupCatalog(models.Model):
+    """Backup stored on the destination of a configuration. Retention,
+    browsing and restores read the catalog instead of listing the
+    destination, which is only reconciled with it from time to time."""
+    _name = 'db.backup.catalog'
+    _description = 'Database Backup Catalog'
+    _order = 'backup_time desc, id desc'
+
+    config_id = fields.Many2one('db.backup.configure',
+                                string='Backup Configuration', required=True,
+                                index=True, ondelete='cascade',
+                                help='Configuration which made the backup')
+    run_id = fields.Many2one('db.backup.run', string='Run',
+                             ondelete='set null',
+                             help='Run which made the backup, empty for '
+                                  'backups found on the destination')
+    name = fields.Char(string='Backup Filename', required=True,
+                       help='Name of the backup on the destination')
+    key = fields.Char(string='Remote Key', required=True,
+                      help='Path or identifier of the backup on the '
+                           'destination')
+    index_key = fields.Char(string='Filestore Index Key',
+                            help='Path or identifier of the filestore index '
+                                 'of the backup, in deduplicated filestore '
+                                 'mode')
+    backup_destination = fields.Selection(
+        selection='_selection_backup_destination',
+        string='Backup Destination',
+        help='Destination the backup was stored on')
+    location = fields.Char(
+        string='Location',
+        help='Folder of the destination holding the backup, as the JSON '
+             'values of the fields locating it on the configuration')
+    backup_time = fields.Datetime(string='Backup Time', required=True,
+                                  index=True,
+                                  help='When the backup was made')
+    size = fields.Float(string='Size (MB)', digits=(16, 2),
+                        help='Size of the backup on the destination')
+    checksum = fields.Char(string='SHA-256',
+                           help='Checksum of the stored backup, empty for '
+                                'backups found on the destination')
+
+    _sql_constraints = [
+        ('name_uniq', 'unique(config_id, name)',
+         'A backup is catalogued only once per configuration.'),
+    ]
+
+    def _selection_backup_destination(self):
+        """Destinations of the backup configurations"""
+        return self.env['db.backup.configure']._fields[
+            'backup_destination'].selection
+
+    def _location(self):
+        """Destination and location of the backup. Backups catalogued before
+        locations were recorded are at the location of their
+        configuration, their location is filled before it changes."""
+        self.ensure_one()
+        return self.backup_destination, \
+            self.location or self.config_id._backup_location()
+
+    def action_restore(self):
+        """Open the wizard restoring this backup"""
+        self.ensure_one()
+        return {
+            'type': 'ir.actions.act_window',
+            'name': _('Restore Backup'),
+            'res_model': 'db.backup.restore',
+            'view_mode': 'form',
+            'target': 'new',
+            'context': {'default_config_id': self.config_id.id,
+                        'default_backup_id': self.id},
+        }
@@ -19,36 +19,107 @@
 #    If not, see <http://www.gnu.org/licenses/>.
 #
 ###############################################################################
-import boto3
+import contextlib
 import dropbox
-import errno
-import ftplib
+import hashlib
+import io
 import json
 import logging
-import nextcloud_client
 import os
 import paramiko
+import pytz
+import re
 import requests
 import shutil
 import subprocess
+import tarfile
 import tempfile
+import time
+import zipfile
 import odoo
-from datetime import timedelta
-from nextcloud import NextCloud
-from requests.auth import HTTPBasicAuth
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
 from werkzeug import urls
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
 from odoo import api, fields, models, _
-from odoo.exceptions import UserError, ValidationError
+from odoo.exceptions import AccessError, UserError, ValidationError
 from odoo.tools import find_pg_tool, exec_pg_environ
 from odoo.http import request
 from odoo.service import db
+from ..tools.backup_codecs import ARCHIVE_CODECS, FrameWriter, \
+    archive_reader, archive_writer, check_codec, codec_from_name, \
+    write_zip_file, zip_compression
+from ..tools.backup_crypto import check_encryption, decrypting_reader
+from ..tools.backup_drivers import BackupEntry, DriverPool, get_driver
+from ..tools.backup_drivers.amazon_s3 import S3_MIN_PART_SIZE
+from ..tools.backup_drivers.next_cloud import NEXTCLOUD_MAX_CHUNK_MB, \
+    NEXTCLOUD_MIN_CHUNK_MB
+from ..tools.backup_drivers.onedrive import ONEDRIVE_MAX_CHUNK_MB
+from ..tools.backup_stream import CHUNK_SIZE, ChunkedStream, \
+    CountingWriter, Throttle, fan_out, threaded_chunks
+from .db_backup_run import MB, STAGING_FOLDER
 
 _logger = logging.getLogger(__name__)
 ONEDRIVE_SCOPE = ['offline_access openid Files.ReadWrite.All']
-MICROSOFT_GRAPH_END_POINT = "https://graph.microsoft.com"
 GOOGLE_AUTH_ENDPOINT = 'https://accounts.google.com/o/oauth2/auth'
 GOOGLE_TOKEN_ENDPOINT = 'https://accounts.google.com/o/oauth2/token'
-GOOGLE_API_BASE_URL = 'https://www.googleapis.com'
+BACKUP_EXTENSIONS = {'zip': 'zip', 'dump': 'dump', 'directory': 'tar'}
+# Deduplicated filestore blobs are stored under their SHA-1 in this folder
+FILESTORE_BLOB_FOLDER = 'filestore'
+FILESTORE_PATH_RE = re.compile(r'^([0-9a-f]{2})/(\1[0-9a-f]{38})$')
+# Backups are named <database>_<UTC time>.<extension>
+BACKUP_TIME_RE = re.compile(r'_(\d{4}-\d\d-\d\d_\d\d-\d\d-\d\d)\.')
+BACKUP_TIME_FORMAT = '%Y-%m-%d_%H-%M-%S'
+# Continuous backups are base backups of the cluster followed by its WAL,
+# archived in this folder
+BASE_BACKUP_EXTENSION = 'base.tar.gz'
+WAL_FOLDER = 'wal'
+WAL_SEGMENT_RE = re.compile(r'^[0-9A-F]{24}$')
+# Clusters are restored to point in time under this folder of the data
+# directory, unless the auto_database_backup.restore_directory parameter
+# sets another one. Their path is written in the restore_command.
+RESTORE_FOLDER = 'backup_restores'
+RESTORE_PATH_RE = re.compile(r'^[\w./-]+$')
+# Filestore snapshots are made in this folder of the data directory
+SNAPSHOT_FOLDER = 'backup_snapshots'
+# Fields locating the backups on each destination, changing any of them
+# points the next backups to another location
+DESTINATION_FIELDS = {
+    'local': ('backup_path',),
+    'ftp': ('ftp_host', 'ftp_path'),
+    'sftp': ('sftp_host', 'sftp_path'),
+    'google_drive': ('google_drive_folder_key',),
+    'dropbox': ('dropbox_folder',),
+    'onedrive': ('onedrive_folder_key',),
+    'next_cloud': ('domain', 'nextcloud_folder_key'),
+    'amazon_s3': ('bucket_file_name', 'aws_folder_name', 'aws_endpoint_url'),
+}
+LOCATION_FIELDS = {'backup_destination'}.union(
+    *DESTINATION_FIELDS.values())
+ENCRYPTION_FIELDS = {'backup_encryption', 'encryption_passphrase'}
+
+
+def _lock_snapshots(snapshot_root, exclusive=False):
+    """Return the lock file of the folder `snapshot_root` of the filestore
+    snapshots, opened and locked. Backups share the lock while they read a
+    snapshot, an exclusive lock is only taken when none of them does, else
+    None is returned. There is no lock where `fcntl` is missing."""
+    if fcntl is None:
+        return None
+    try:
+        lock = open(os.path.join(snapshot_root, '.lock'), 'ab')
+    except OSError:
+        return None
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB if exclusive
+                    else fcntl.LOCK_SH)
+    except OSError:
+        lock.close()
+        return None
+    return lock
 
 
 class DbBackupConfigure(models.Model):
@@ -63,11 +134,126 @@ class DbBackupConfigure(models.Model):
                           help='Name of the database')
     master_pwd = fields.Char(string='Master Password', required=True,
                              help='Master password')
+    backup_mode = fields.Selection([
+        ('dump', 'Database Dump'),
+        ('continuous', 'Continuous (WAL Archiving)')
+    ], string='Backup Mode', default='dump', required=True,
+        help='Continuous takes periodic base backups of the whole PostgreSQL '
+             'cluster with pg_basebackup and archives its WAL with '
+             'pg_receivewal each time the WAL Archiving scheduled action '
+             'runs, so that it can be restored to any point in time. The '
+             'PostgreSQL user needs the REPLICATION privilege. Only completed '
+             'WAL segments are archived, set archive_timeout on the server '
+             'to bound the data which can be lost. The filestore is not part '
+             'of these backups.')
+    base_backup_interval = fields.Integer(
+        string='Base Backup Every', default=7,
+        help='Number of days after which a new base backup is taken in '
+             'continuous mode')
     backup_format = fields.Selection([
         ('zip', 'Zip'),
-        ('dump', 'Dump')
+        ('dump', 'Dump'),
+        ('directory', 'Directory')
     ], string='Backup Format', default='zip', required=True,
-        help='Format of the backup')
+        help='Format of the backup. Directory runs pg_dump with several '
+             'parallel jobs and packs its output with the filestore in a '
+             'tar archive')
+    filestore_mode = fields.Selection([
+        ('archive', 'In Backup Archive'),
+        ('dedup', 'Deduplicated')
+    ], string='Filestore Backup', default='archive', required=True,
+        help='Deduplicated stores each filestore file only once on the '
+             'destination under its SHA-1, each backup then only uploads the '
+             'new files and a small index of the filestore')
+    backup_chain = fields.Selection([
+        ('full', 'Full'),
+        ('differential', 'Differential'),
+        ('incremental', 'Incremental')
+    ], string='Backup Level', default='full', required=True,
+        help='Directory format only. Between two full backups, differential '
+             'backups ship what changed since the last full backup and '
+             'incremental backups what changed since the previous backup')
+    full_backup_interval = fields.Integer(
+        string='Full Backup Every', default=7,
+        help='Number of days after which a full backup starts a new chain')
+    manifest_ids = fields.One2many('db.backup.manifest', 'config_id',
+                                   string='Backup Chain',
+                                   help='Checksum manifests of the backups '
+                                        'of the current chains')
+    run_ids = fields.One2many('db.backup.run', 'config_id', string='Runs',
+                              help='History of the backups of this '
+                                   'configuration')
+    backup_ids = fields.One2many('db.backup.catalog', 'config_id',
+                                 string='Backups',
+                                 help='Catalog of the backups stored on the '
+                                      'destination')
+    compression_codec = fields.Selection([
+        ('store', 'Store'),
+        ('deflate_1', 'Deflate (Fast)'),
+        ('deflate_6', 'Deflate'),
+        ('deflate_9', 'Deflate (Best)'),
+        ('zstd', 'Zstandard'),
+        ('lz4', 'LZ4')
+    ], string='Compression', default='deflate_6', required=True,
+        help='Compression of zip backups. Deflate compresses each file of the '
+             'archive, Zstandard and LZ4 compress the whole archive, which '
+             'is then saved as .zip.zst or .zip.lz4. Files which are already '
+             'compressed, like images or PDF, are stored as they are. '
+             'The database manager of Odoo cannot restore .zip.zst and '
+             '.zip.lz4 backups, restore them from the backup catalog or '
+             'decompress them with the zstd or lz4 command first.')
+    compression_threads = fields.Integer(
+        string='Compression Threads',
+        help='Number of threads used by Zstandard, 0 uses one per CPU core')
+    dump_jobs = fields.Integer(string='Dump Jobs', default=2,
+                               help='Number of tables dumped in parallel by '
+                                    'pg_dump in directory format')
+    dump_nice = fields.Integer(
+        string='Dump CPU Priority',
+        help='Niceness of pg_dump, from 0 (normal priority) to 19 (lowest '
+             'priority), so that it leaves the CPU to the Odoo workers')
+    dump_io_class = fields.Selection([
+        ('default', 'Normal'),
+        ('low', 'Low'),
+        ('idle', 'Idle')
+    ], string='Dump I/O Priority', default='default', required=True,
+        help='I/O priority of pg_dump. Low is the lowest best-effort '
+             'priority, Idle only reads the disk when nothing else does.')
+    filestore_bandwidth = fields.Integer(
+        string='Filestore Read Limit',
+        help='Maximum speed in MB/s at which the filestore is read, 0 does '
+             'not limit it')
+    upload_bandwidth = fields.Integer(
+        string='Upload Limit',
+        help='Maximum speed in MB/s of the uploads to the destination, 0 '
+             'does not limit it')
+    backup_window_start = fields.Float(
+        string='Backup Window Start',
+        help='Time of the day, in the timezone of the user, from which a '
+             'backup may start. The window may span midnight. When the start '
+             'and the end are equal, backups start whenever the scheduled '
+             'action runs.')
+    backup_window_end = fields.Float(
+        string='Backup Window End',
+        help='Time of the day, in the timezone of the user, after which a '
+             'backup may not start anymore. Run the scheduled action more '
+             'than once a day, each configuration then backs up once within '
+             'each window.')
+    backup_encryption = fields.Boolean(
+        string='Encrypt Backups',
+        help='Encrypt the backups with AES-256-GCM while they are uploaded, '
+             'the filestore blobs and the WAL files included')
+    encryption_passphrase = fields.Char(
+        string='Encryption Passphrase', copy=False,
+        help='Passphrase the encryption key is derived from. Keep a copy of '
+             'it outside of this database, the backups can not be restored '
+             'without it.')
+    backup_streaming = fields.Boolean(
+        string='Streaming Backup',
+        help='Pipe the dump straight into the destination while it is '
+             'generated, without writing a temporary copy to local disk. '
+             'Onedrive needs the size of the backup before it is uploaded, '
+             'its backups are always staged.')
     backup_destination = fields.Selection([
         ('local', 'Local Storage'),
         ('google_drive', 'Google Drive'),
@@ -96,6 +282,13 @@ class DbBackupConfigure(models.Model):
     ftp_password = fields.Char(string='FTP Password', copy=False,
                                help='FTP password')
     ftp_path = fields.Char(string='FTP Path', help='FTP path details')
+    ftp_tls = fields.Boolean(string='FTPS',
+                             help='Secure the control and data connections '
+                                  'with explicit TLS (AUTH TLS)')
+    ftp_passive = fields.Boolean(string='Passive Mode', default=True,
+                                 help='Open the data connections from Odoo '
+                                      'to the server. Disable it only when '
+                                      'the server cannot accept them.')
     dropbox_client_key = fields.Char(string='Dropbox Client ID', copy=False,
                                      help='Client id of the dropbox')
     dropbox_client_secret = fields.Char(string='Dropbox Client Secret',
@@ -119,6 +312,25 @@ class DbBackupConfigure(models.Model):
     days_to_remove = fields.Integer(string='Remove After',
                                     help='Automatically delete stored backups'
                                          ' after this specified number of days')
+    retention_policy = fields.Selection([
+        ('age', 'By Age'),
+        ('gfs', 'Daily, Weekly and Monthly')
+    ], string='Retention', default='age', required=True,
+        help='By Age removes the backups older than a number of days. Daily, '
+             'Weekly and Monthly keeps the last backup of each of the most '
+             'recent days, weeks, months and years, and removes the others')
+    keep_daily = fields.Integer(string='Daily Backups', default=7,
+                                help='Number of days whose last backup is '
+                                     'kept')
+    keep_weekly = fields.Integer(string='Weekly Backups', default=4,
+                                 help='Number of weeks whose last backup is '
+                                      'kept')
+    keep_monthly = fields.Integer(string='Monthly Backups', default=12,
+                                  help='Number of months whose last backup '
+                                       'is kept')
+    keep_yearly = fields.Integer(string='Yearly Backups',
+                                 help='Number of years whose last backup is '
+                                      'kept')
     google_drive_folder_key = fields.Char(string='Drive Folder ID',
                                           help='Folder id of the drive')
     notify_user = fields.Boolean(string='Notify User',
@@ -148,6 +360,10 @@ class DbBackupConfigure(models.Model):
                                               help='Token validity date')
     onedrive_folder_key = fields.Char(string='Folder ID',
                                       help='Folder id of the onedrive')
+    onedrive_chunk_size = fields.Integer(
+        string='Onedrive Chunk Size', default=10,
+        help='Size in MiB of the ranged requests of the Onedrive uploads, '
+             'between 1 and 60')
     is_onedrive_token_generated = fields.Boolean(
         string='onedrive Tokens Generated',
         compute='_compute_is_onedrive_token_generated',
@@ -190,6 +406,13 @@ class DbBackupConfigure(models.Model):
                                        help="Field used to store the unique "
                                             "identifier for a Nextcloud "
                                             "folder.")
+    nextcloud_chunk_size = fields.Integer(
+        string='Nextcloud Chunk Size', default=10,
+        help="Size in MiB of the chunks of the Nextcloud uploads, between 5 "
+             "and 5120")
+    nextcloud_max_concurrency = fields.Integer(
+        string='Nextcloud Concurrency', default=4,
+        help="Number of chunks uploaded to Nextcloud at the same time")
     aws_access_key = fields.Char(string="Amazon S3 Access Key",
                                  help="Field used to store the Access Key"
                                       " for an Amazon S3 bucket.")
@@ -202,17 +425,85 @@ class DbBackupConfigure(models.Model):
     aws_folder_name = fields.Char(string='File Name',
                                   help="field used to store the name of a"
                                        " folder in an Amazon S3 bucket.")
+    aws_endpoint_url = fields.Char(
+        string='Amazon S3 Endpoint',
+        help="URL of an S3 compatible service, like MinIO, used instead of "
+             "Amazon S3. Leave empty to use Amazon S3.")
+    aws_part_size = fields.Integer(
+        string='Amazon S3 Part Size', default=64,
+        help="Size in MiB of the parts of the multipart upload of the "
+             "backups, at least 5")
+    aws_max_concurrency = fields.Integer(
+        string='Amazon S3 Concurrency', default=4,
+        help="Number of parts uploaded at the same time")
+
+    def write(self, vals):
+        """When the backups are sent elsewhere, forget the filestore blobs
+        and the archived WAL, and start new backup chains. The catalogued
+        backups stay where they are, each one records its location.
+        When the encryption changes, the blobs and the chains are started
+        afresh as well, so that no backup depends on data encrypted
+        otherwise."""
+        if LOCATION_FIELDS.intersection(vals):
+            for rec in self:
+                self.env['db.backup.catalog'].sudo().search([
+                    ('config_id', '=', rec.id), ('location', '=', False),
+                ]).write({'backup_destination': rec.backup_destination,
+                          'location': rec._backup_location()})
+            self._reset_backup_chains()
+            self.env['db.backup.wal'].sudo().search(
+                [('config_id', 'in', self.ids)]).unlink()
+        elif ENCRYPTION_FIELDS.intersection(vals):
+            self._reset_backup_chains()
+        if vals.get('backup_mode', 'continuous') != 'continuous':
+            self.filtered(
+                lambda r: r.backup_mode == 'continuous')._drop_wal_slot()
+        return super().write(vals)
+
+    def unlink(self):
+        """Drop the replication slots of the continuous backups, which
+        would keep their WAL on the server forever"""
+        self.filtered(
+            lambda r: r.backup_mode == 'continuous')._drop_wal_slot()
+        return super().unlink()
+
+    def _reset_backup_chains(self):
+        """Make the next backups of these configurations start afresh: the
+        filestore blobs are uploaded again and the next backup of a chain
+        is a full one. The manifests are kept to restore the older
+        backups."""
+        self.env['db.backup.blob'].sudo().search(
+            [('config_id', 'in', self.ids)]).unlink()
+        self.env['db.backup.manifest'].sudo().search(
+            [('config_id', 'in', self.ids)]).closed = True
+
+    def _backup_location(self):
+        """Where the backups of this configuration are stored, as the JSON
+        values of the DESTINATION_FIELDS of its destination"""
+        self.ensure_one()
+        return json.dumps({
+            field: self[field] or False
+            for field in DESTINATION_FIELDS.get(self.backup_destination, ())
+        }, sort_keys=True)
+
+    def _location_config(self, backup):
+        """This configuration pointed to where the catalogued `backup` is
+        stored, which differs from its current location when the
+        destination changed since the backup was made"""
+        self.ensure_one()
+        if backup._location() == (self.backup_destination,
+                                  self._backup_location()):
+            return self
+        return self.new(dict(json.loads(backup.location),
+                             backup_destination=backup.backup_destination),
+                        origin=self)
 
     def action_s3cloud(self):
         """If it has aws_secret_access_key, which will perform s3cloud
          operations for connection test"""
         if self.aws_access_key and self.aws_secret_access_key:
             try:
-                s3_client = boto3.client(
-                    's3',
-                    aws_access_key_id=self.aws_access_key,
-                    aws_secret_access_key=self.aws_secret_access_key
-                )
+                s3_client = get_driver('amazon_s3').connect(self)
                 response = s3_client.head_bucket(Bucket=self.bucket_file_name)
                 if response['ResponseMetadata']['HTTPStatusCode'] == 200:
                     self.active = True
@@ -251,39 +542,14 @@ class DbBackupConfigure(models.Model):
          which will perform an action for nextcloud connection test"""
         if self.domain and self.next_cloud_password and \
                 self.next_cloud_user_name:
+            driver_class = get_driver('next_cloud')
             try:
-                ncx = NextCloud(self.domain,
-                                auth=HTTPBasicAuth(self.next_cloud_user_name,
-                                                   self.next_cloud_password))
-
-                data = ncx.list_folders('/').__dict__
-                if data['raw'].status_code == 207:
-                    self.active = True
-                    self.hide_active = True
-                    return {
-                        'type': 'ir.actions.client',
-                        'tag': 'display_notification',
-                        'params': {
-                            'type': 'success',
-                            'title': _("Connection Test Succeeded!"),
-                            'message': _("Everything seems properly set up!"),
-                            'sticky': False,
-                        }
-                    }
-                else:
-                    self.active = False
-                    self.hide_active = False
-                    return {
-                        'type': 'ir.actions.client',
-                        'tag': 'display_notification',
-                        'params': {
-                            'type': 'danger',
-                            'title': _("Connection Test Failed!"),
-                            'message': _("An error occurred while testing the "
-                                         "connection."),
-                            'sticky': False,
-                        }
-                    }
+                # Also creates the backup folder and remembers it
+                connection = driver_class.connect(self)
+                try:
+                    driver_class(self, connection).prepare()
+                finally:
+                    driver_class.disconnect(connection)
             except Exception:
                 self.active = False
                 self.hide_active = False
@@ -298,6 +564,18 @@ class DbBackupConfigure(models.Model):
                         'sticky': False,
                     }
                 }
+            self.active = True
+            self.hide_active = True
+            return {
+                'type': 'ir.actions.client',
+                'tag': 'display_notification',
+                'params': {
+                    'type': 'success',
+                    'title': _("Connection Test Succeeded!"),
+                    'message': _("Everything seems properly set up!"),
+                    'sticky': False,
+                }
+            }
 
     @api.depends('onedrive_redirect_uri', 'gdrive_redirect_uri')
     def _compute_redirect_uri(self):
@@ -428,6 +706,17 @@ class DbBackupConfigure(models.Model):
                               error.response.content)
             raise error
 
+    def action_restore_backup(self):
+        """Open the wizard restoring a backup of this configuration"""
+        return {
+            'type': 'ir.actions.act_window',
+            'name': _('Restore Backup'),
+            'res_model': 'db.backup.restore',
+            'view_mode': 'form',
+            'target': 'new',
+            'context': {'default_config_id': self.id},
+        }
+
     def get_onedrive_tokens(self, authorize_code):
         """Generate onedrive tokens from authorization code."""
         headers = {"content-type": "application/x-www-form-urlencoded"}
@@ -538,6 +827,137 @@ class DbBackupConfigure(models.Model):
         outh_result = dbx_auth.finish(auth_code)
         self.dropbox_refresh_token = outh_result.refresh_token
 
+    @api.constrains('dump_jobs')
+    def _check_dump_jobs(self):
+        """pg_dump needs at least one job"""
+        for rec in self:
+            if rec.dump_jobs < 1:
+                raise ValidationError(_("Dump Jobs must be at least 1."))
+
+    @api.constrains('backup_mode', 'base_backup_interval')
+    def _check_base_backup_interval(self):
+        """Continuous backups need a base backup at least every day"""
+        for rec in self.filtered(lambda r: r.backup_mode == 'continuous'):
+            if rec.base_backup_interval < 1:
+                raise ValidationError(
+                    _("Base backups must be taken at least every day."))
+
+    @api.constrains('dump_nice', 'filestore_bandwidth', 'upload_bandwidth',
+                    'backup_window_start', 'backup_window_end')
+    def _check_resource_limits(self):
+        """Niceness goes from 0 to 19, limits can not be negative and the
+        window is made of times of the day"""
+        for rec in self:
+            if not 0 <= rec.dump_nice <= 19:
+                raise ValidationError(
+                    _("Dump CPU Priority must be between 0 and 19."))
+            if rec.filestore_bandwidth < 0 or rec.upload_bandwidth < 0:
+                raise ValidationError(
+                    _("Bandwidth limits can not be negative."))
+            if not (0 <= rec.backup_window_start < 24 and
+                    0 <= rec.backup_window_end < 24):
+                raise ValidationError(
+                    _("The backup window must be made of times of the "
+                      "day."))
+
+    @api.constrains('backup_destination', 'aws_part_size',
+                    'aws_max_concurrency')
+    def _check_aws_transfer(self):
+        """S3 refuses multipart parts smaller than 5 MiB"""
+        for rec in self.filtered(
+                lambda r: r.backup_destination == 'amazon_s3'):
+            if rec.aws_part_size < S3_MIN_PART_SIZE:
+                raise ValidationError(
+                    _("Amazon S3 Part Size must be at least %s MiB.",
+                      S3_MIN_PART_SIZE))
+            if rec.aws_max_concurrency < 1:
+                raise ValidationError(
+                    _("Amazon S3 Concurrency must be at least 1."))
+
+    @api.constrains('backup_destination', 'nextcloud_chunk_size',
+                    'nextcloud_max_concurrency')
+    def _check_nextcloud_transfer(self):
+        """Nextcloud accepts chunks between 5 MiB and 5 GiB"""
+        for rec in self.filtered(
+                lambda r: r.backup_destination == 'next_cloud'):
+            if not NEXTCLOUD_MIN_CHUNK_MB <= rec.nextcloud_chunk_size <= \
+                    NEXTCLOUD_MAX_CHUNK_MB:
+                raise ValidationError(
+                    _("Nextcloud Chunk Size must be between %(min)s and "
+                      "%(max)s MiB.", min=NEXTCLOUD_MIN_CHUNK_MB,
+                      max=NEXTCLOUD_MAX_CHUNK_MB))
+            if rec.nextcloud_max_concurrency < 1:
+                raise ValidationError(
+                    _("Nextcloud Concurrency must be at least 1."))
+
+    @api.constrains('backup_destination', 'onedrive_chunk_size')
+    def _check_onedrive_chunk_size(self):
+        """Onedrive accepts upload requests of at most 60 MiB"""
+        for rec in self.filtered(
+                lambda r: r.backup_destination == 'onedrive'):
+            if not 1 <= rec.onedrive_chunk_size <= ONEDRIVE_MAX_CHUNK_MB:
+                raise ValidationError(
+                    _("Onedrive Chunk Size must be between 1 and %s MiB.",
+                      ONEDRIVE_MAX_CHUNK_MB))
+
+    @api.constrains('backup_encryption', 'encryption_passphrase')
+    def _check_encryption(self):
+        """Encryption needs a passphrase and the cryptography library"""
+        for rec in self.filtered('backup_encryption'):
+            if not rec.encryption_passphrase:
+                raise ValidationError(
+                    _("Set the passphrase of the encryption."))
+            try:
+                check_encryption()
+            except ImportError as error:
+                raise ValidationError(str(error))
+
+    @api.constrains('compression_codec', 'backup_format')
+    def _check_compression_codec(self):
+        """The library of the chosen codec must be installed"""
+        for rec in self.filtered(lambda r: r.backup_format == 'zip'):
+            try:
+                check_codec(rec.compression_codec)
+            except ImportError as error:
+                raise ValidationError(str(error))
+
+    @api.constrains('backup_chain', 'backup_format', 'full_backup_interval',
+                    'auto_remove', 'days_to_remove')
+    def _check_backup_chain(self):
+        """Chains are made of the segments of directory format dumps, and
+        retention must keep the full backup the current chain relies on"""
+        for rec in self.filtered(lambda r: r.backup_chain != 'full'):
+            if rec.backup_format != 'directory':
+                raise ValidationError(_(
+                    "Differential and incremental backups need the Directory "
+                    "backup format."))
+            if rec.full_backup_interval < 1:
+                raise ValidationError(_(
+                    "Full backups must be taken at least every day."))
+            if rec.auto_remove and \
+                    rec.days_to_remove <= rec.full_backup_interval:
+                raise ValidationError(_(
+                    "Backups must be kept longer than the interval between "
+                    "two full backups, or the chains could not be restored."))
+
+    @api.constrains('retention_policy', 'backup_chain', 'keep_daily',
+                    'keep_weekly', 'keep_monthly', 'keep_yearly')
+    def _check_retention_policy(self):
+        """Tiered retention needs something to keep, and would remove the
+        backups the differential and incremental ones rely on"""
+        for rec in self.filtered(lambda r: r.retention_policy == 'gfs'):
+            counts = (rec.keep_daily, rec.keep_weekly, rec.keep_monthly,
+                      rec.keep_yearly)
+            if min(counts) < 0 or not any(counts):
+                raise ValidationError(_(
+                    "Keep at least one daily, weekly, monthly or yearly "
+                    "backup."))
+            if rec.backup_chain != 'full':
+                raise ValidationError(_(
+                    "Daily, weekly and monthly retention needs full backups, "
+                    "differential and incremental backups rely on backups it "
+                    "would remove."))
+
     @api.constrains('db_name')
     def _check_db_credentials(self):
         """Validate entered database name and master password"""
@@ -567,10 +987,8 @@ class DbBackupConfigure(models.Model):
                 client.close()
         elif self.backup_destination == 'ftp':
             try:
-                ftp_server = ftplib.FTP()
-                ftp_server.connect(self.ftp_host, int(self.ftp_port))
-                ftp_server.login(self.ftp_user, self.ftp_password)
-                ftp_server.quit()
+                ftp_driver = get_driver('ftp')
+                ftp_driver.disconnect(ftp_driver.connect(self))
             except Exception as e:
                 raise UserError(_("FTP Exception: %s", e))
         self.hide_active = True
@@ -599,462 +1017,1356 @@ class DbBackupConfigure(models.Model):
     def _schedule_auto_backup(self):
         """Function for generating and storing backup.
            Database backup for all the active records in backup configuration
-           model will be created."""
-        records = self.search([])
-        mail_template_success = self.env.ref(
-            'auto_database_backup.mail_template_data_db_backup_successful')
-        mail_template_failed = self.env.ref(
-            'auto_database_backup.mail_template_data_db_backup_failed')
-        for rec in records:
-            backup_time = fields.datetime.utcnow().strftime(
-                "%Y-%m-%d_%H-%M-%S")
-            backup_filename = "%s_%s.%s" % (
-                rec.db_name, backup_time, rec.backup_format)
-            rec.backup_filename = backup_filename
-            # Local backup
-            if rec.backup_destination == 'local':
+           model will be created. Up to `auto_database_backup.backup_workers`
+           groups of configurations are processed at the same time. The
+           configurations sharing a dump or a connection are run by the same
+           worker. Configurations outside of their backup window, or which
+           already backed up in the current one, are left out. The runs
+           interrupted before resume first from their last checkpoint, the
+           filestore snapshots they left are removed."""
+        self._remove_stale_snapshots()
+        self._resume_interrupted_backups()
+        # The workers write the configurations and their runs with cursors
+        # of their own, which would wait for the locks of this one
+        self.env.cr.commit()
+        now = fields.Datetime.now()
+        records = self.search([('backup_mode', '=', 'dump')]).filtered(
+            lambda r: r._is_backup_due(now))
+        workers = int(self.env['ir.config_parameter'].sudo().get_param(
+            'auto_database_backup.backup_workers') or 1)
+        groups = []
+        for record in records:
+            group = {'keys': {('dump', record._dump_key()),
+                              ('connection', DriverPool.key(record))},
+                     'ids': [record.id]}
+            for other in [g for g in groups if g['keys'] & group['keys']]:
+                groups.remove(other)
+                group['keys'] |= other['keys']
+                group['ids'] = other['ids'] + group['ids']
+            groups.append(group)
+        if workers <= 1 or len(groups) <= 1:
+            records._run_backup()
+            return
+        with ThreadPoolExecutor(max_workers=min(workers, len(groups)),
+                                thread_name_prefix='db_backup') as executor:
+            futures = {
+                executor.submit(self._run_backup_with_cursor, group['ids']):
+                    group['ids'] for group in groups}
+            for future in as_completed(futures):
                 try:
-                    if not os.path.isdir(rec.backup_path):
-                        os.makedirs(rec.backup_path)
-                    backup_file = os.path.join(rec.backup_path,
-                                               backup_filename)
-                    f = open(backup_file, "wb")
-                    self.dump_data(rec.db_name, f, rec.backup_format)
-                    f.close()
-                    # Remove older backups
-                    if rec.auto_remove:
-                        for filename in os.listdir(rec.backup_path):
-                            file = os.path.join(rec.backup_path, filename)
-                            create_time = fields.datetime.fromtimestamp(
-                                os.path.getctime(file))
-                            backup_duration = fields.datetime.utcnow() - create_time
-                            if backup_duration.days >= rec.days_to_remove:
-                                os.remove(file)
-                    if rec.notify_user:
-                        mail_template_success.send_mail(rec.id,
-                                                        force_send=True)
-                except Exception as e:
-                    rec.generated_exception = e
-                    _logger.info('FTP Exception: %s', e)
-                    if rec.notify_user:
-                        mail_template_failed.send_mail(rec.id, force_send=True)
-            # FTP backup
-            elif rec.backup_destination == 'ftp':
-                try:
-                    ftp_server = ftplib.FTP()
-                    ftp_server.connect(rec.ftp_host, int(rec.ftp_port))
-                    ftp_server.login(rec.ftp_user, rec.ftp_password)
-                    ftp_server.encoding = "utf-8"
-                    temp = tempfile.NamedTemporaryFile(
-                        suffix='.%s' % rec.backup_format)
-                    try:
-                        ftp_server.cwd(rec.ftp_path)
-                    except ftplib.error_perm:
-                        ftp_server.mkd(rec.ftp_path)
-                        ftp_server.cwd(rec.ftp_path)
-                    with open(temp.name, "wb+") as tmp:
-                        self.dump_data(rec.db_name, tmp,
-                                                rec.backup_format)
-                    ftp_server.storbinary('STOR %s' % backup_filename,
-                                          open(temp.name, "rb"))
-                    if rec.auto_remove:
-                        files = ftp_server.nlst()
-                        for file in files:
-                            create_time = fields.datetime.strptime(
-                                ftp_server.sendcmd('MDTM ' + file)[4:],
-                                "%Y%m%d%H%M%S")
-                            diff_days = (
-                                    fields.datetime.now() - create_time).days
-                            if diff_days >= rec.days_to_remove:
-                                ftp_server.delete(file)
-                    ftp_server.quit()
-                    if rec.notify_user:
-                        mail_template_success.send_mail(rec.id,
-                                                        force_send=True)
-                except Exception as e:
-                    rec.generated_exception = e
-                    _logger.info('FTP Exception: %s', e)
-                    if rec.notify_user:
-                        mail_template_failed.send_mail(rec.id, force_send=True)
-            # SFTP backup
-            elif rec.backup_destination == 'sftp':
-                client = paramiko.SSHClient()
-                client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-                try:
-                    client.connect(hostname=rec.sftp_host,
-                                   username=rec.sftp_user,
-                                   password=rec.sftp_password,
-                                   port=rec.sftp_port)
-                    sftp = client.open_sftp()
-                    temp = tempfile.NamedTemporaryFile(
-                        suffix='.%s' % rec.backup_format)
-                    with open(temp.name, "wb+") as tmp:
-                        self.dump_data(rec.db_name, tmp, rec.backup_format)
-                    try:
-                        sftp.chdir(rec.sftp_path)
-                    except IOError as e:
-                        if e.errno == errno.ENOENT:
-                            sftp.mkdir(rec.sftp_path)
-                            sftp.chdir(rec.sftp_path)
-                    sftp.put(temp.name, backup_filename)
-                    if rec.auto_remove:
-                        files = sftp.listdir()
-                        expired = list(filter(
-                            lambda fl: (fields.datetime.now()
-                                        - fields.datetime.fromtimestamp(
-                                        sftp.stat(fl).st_mtime)).days >=
-                                       rec.days_to_remove, files))
-                        for file in expired:
-                            sftp.unlink(file)
-                    sftp.close()
-                    if rec.notify_user:
-                        mail_template_success.send_mail(rec.id,
-                                                        force_send=True)
-                except Exception as e:
-                    rec.generated_exception = e
-                    _logger.info('SFTP Exception: %s', e)
-                    if rec.notify_user:
-                        mail_template_failed.send_mail(rec.id, force_send=True)
-                finally:
-                    client.close()
-            # Google Drive backup
-            elif rec.backup_destination == 'google_drive':
-                try:
-                    if rec.gdrive_token_validity <= fields.Datetime.now():
-                        rec.generate_gdrive_refresh_token()
-                    temp = tempfile.NamedTemporaryFile(
-                        suffix='.%s' % rec.backup_format)
-                    with open(temp.name, "wb+") as tmp:
-                        self.dump_data(rec.db_name, tmp,
-                                                rec.backup_format)
-                    try:
-                        headers = {
-                            "Authorization": "Bearer %s" % rec.gdrive_access_token}
-                        para = {
-                            "name": backup_filename,
-                            "parents": [rec.google_drive_folder_key],
-                        }
-                        files = {
-                            'data': ('metadata', json.dumps(para),
-                                     'application/json; charset=UTF-8'),
-                            'file': open(temp.name, "rb")
-                        }
-                        requests.post(
-                            "https://www.googleapis.com/upload/drive/v3/files?uploadType=multipart",
-                            headers=headers,
-                            files=files
-                        )
-                        if rec.auto_remove:
-                            query = "parents = '%s'" % rec.google_drive_folder_key
-                            files_req = requests.get(
-                                "https://www.googleapis.com/drive/v3/files?q=%s" % query,
-                                headers=headers)
-                            files = files_req.json()['files']
-                            for file in files:
-                                file_date_req = requests.get(
-                                    "https://www.googleapis.com/drive/v3/files/%s?fields=createdTime" %
-                                    file['id'], headers=headers)
-                                create_time = file_date_req.json()[
-                                                  'createdTime'][
-                                              :19].replace('T', ' ')
-                                diff_days = (
-                                        fields.datetime.now() - fields.datetime.strptime(
-                                    create_time, '%Y-%m-%d %H:%M:%S')).days
-                                if diff_days >= rec.days_to_remove:
-                                    requests.delete(
-                                        "https://www.googleapis.com/drive/v3/files/%s" %
-                                        file['id'], headers=headers)
-                        if rec.notify_user:
-                            mail_template_success.send_mail(rec.id,
-                                                            force_send=True)
-                    except Exception as e:
-
-                        rec.generated_exception = e
-                        _logger.info('Google Drive Exception: %s', e)
-                        if rec.notify_user:
-                            mail_template_failed.send_mail(rec.id,
-                                                           force_send=True)
+                    future.result()
                 except Exception:
-                    if rec.notify_user:
-                        mail_template_failed.send_mail(rec.id, force_send=True)
-                        raise ValidationError(
-                            'Please check the credentials before activation')
-                    else:
-                        raise ValidationError('Please check connection')
-            # Dropbox backup
-            elif rec.backup_destination == 'dropbox':
-                temp = tempfile.NamedTemporaryFile(
-                    suffix='.%s' % rec.backup_format)
-                with open(temp.name, "wb+") as tmp:
-                    self.dump_data(rec.db_name, tmp,
-                                            rec.backup_format)
+                    _logger.exception('Backup of configurations %s failed',
+                                      futures[future])
+
+    def _schedule_wal_archiving(self):
+        """Archive the WAL written since the previous run of the
+        configurations in continuous mode, and take their base backup when
+        the last one is older than their interval"""
+        with DriverPool() as pool:
+            for rec in self.search([('backup_mode', '=', 'continuous')]):
                 try:
-                    dbx = dropbox.Dropbox(
-                        app_key=rec.dropbox_client_key,
-                        app_secret=rec.dropbox_client_secret,
-                        oauth2_refresh_token=rec.dropbox_refresh_token)
-                    dropbox_destination = (rec.dropbox_folder + '/' +
-                                           backup_filename)
-                    dbx.files_upload(temp.read(), dropbox_destination)
-                    if rec.auto_remove:
-                        files = dbx.files_list_folder(rec.dropbox_folder)
-                        file_entries = files.entries
-                        expired_files = list(filter(
-                            lambda fl: (fields.datetime.now() -
-                                        fl.client_modified).days >=
-                                       rec.days_to_remove,
-                            file_entries))
-                        for file in expired_files:
-                            dbx.files_delete_v2(file.path_display)
-                    if rec.notify_user:
-                        mail_template_success.send_mail(rec.id,
-                                                        force_send=True)
+                    driver = pool.driver(rec)
+                    driver.prepare()
+                    rec._archive_wal(driver)
                 except Exception as error:
+                    pool.discard(rec)
                     rec.generated_exception = error
-                    _logger.info('Dropbox Exception: %s', error)
-                    if rec.notify_user:
-                        mail_template_failed.send_mail(rec.id, force_send=True)
-            # Onedrive Backup
-            elif rec.backup_destination == 'onedrive':
-                if rec.onedrive_token_validity <= fields.Datetime.now():
-                    rec.generate_onedrive_refresh_token()
-                temp = tempfile.NamedTemporaryFile(
-                    suffix='.%s' % rec.backup_format)
-                with open(temp.name, "wb+") as tmp:
-                    self.dump_data(rec.db_name, tmp, rec.backup_format)
-                headers = {
-                    'Authorization': 'Bearer %s' % rec.onedrive_access_token,
-                    'Content-Type': 'application/json'}
-                upload_session_url = MICROSOFT_GRAPH_END_POINT + "/v1.0/me/drive/items/%s:/%s:/createUploadSession" % (
-                    rec.onedrive_folder_key, backup_filename)
+                    _logger.exception('WAL archiving of %s failed',
+                                      rec.name)
+                    continue
+                if rec._is_base_backup_due():
+                    rec._run_base_backup(pool)
+
+    def _wal_directory(self):
+        """Local directory in which pg_receivewal writes the WAL of this
+        configuration before it is uploaded"""
+        return os.path.join(odoo.tools.config['data_dir'], 'backup_wal',
+                            self.env.cr.dbname, str(self.id))
+
+    def _wal_slot(self):
+        """Replication slot keeping on the server the WAL this
+        configuration has not archived yet"""
+        return 'odoo_backup_%s_%s' % (
+            re.sub(r'[^a-z0-9_]', '_', self.env.cr.dbname.lower()), self.id)
+
+    def _drop_wal_slot(self, raise_error=False):
+        """Drop with pg_receivewal the replication slot of these
+        configurations, over the replication connection which created it,
+        and the WAL received locally through it. The WAL written since
+        their last archiving is not archived, the next one starts from now.
+        A slot which cannot be dropped is logged, or raises a UserError with
+        `raise_error`."""
+        receivewal = find_pg_tool('pg_receivewal')
+        for rec in self:
+            process = subprocess.run(
+                [receivewal, '--drop-slot', '--slot=' + rec._wal_slot()],
+                env=exec_pg_environ(), stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT, check=False)
+            if process.returncode:
+                output = process.stdout.decode(errors='replace').strip()
+                if raise_error:
+                    raise UserError(_("The replication slot could not be "
+                                      "dropped: %s", output))
+                _logger.warning('WAL replication slot of %s could not be '
+                                'dropped: %s', rec.name, output)
+                continue
+            shutil.rmtree(rec._wal_directory(), ignore_errors=True)
+            _logger.info('WAL replication slot of %s dropped', rec.name)
+
+    def action_drop_wal_slot(self):
+        """Drop the replication slot of this configuration, so that the
+        server stops keeping its WAL"""
+        self._drop_wal_slot(raise_error=True)
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'type': 'success',
+                'title': _("Replication Slot Dropped"),
+                'message': _("The WAL archiving starts over at its next run, "
+                             "take a base backup to restore past it."),
+                'sticky': False,
+            }
+        }
+
+    def _archive_wal(self, driver):
+        """Receive with pg_receivewal the WAL written up to now through the
+        replication slot of this configuration, and upload the completed
+        files with `driver`. Each file is committed once uploaded, and
+        only then removed locally. The last segment is kept locally for
+        pg_receivewal to know where to continue."""
+        wal_dir = self._wal_directory()
+        os.makedirs(wal_dir, exist_ok=True)
+        env = exec_pg_environ()
+        receivewal = find_pg_tool('pg_receivewal')
+        slot = self._wal_slot()
+        subprocess.run([receivewal, '--create-slot', '--if-not-exists',
+                        '--slot=' + slot], env=env, stdout=subprocess.DEVNULL,
+                       stderr=subprocess.STDOUT, check=True)
+        with odoo.sql_db.db_connect(self.db_name).cursor() as cr:
+            cr.execute("SELECT pg_current_wal_lsn()")
+            end_lsn = cr.fetchone()[0]
+        subprocess.run([receivewal, '--directory=' + wal_dir,
+                        '--slot=' + slot, '--endpos=' + end_lsn,
+                        '--no-loop'], env=env, stdout=subprocess.DEVNULL,
+                       stderr=subprocess.STDOUT, check=True)
+        archived = set(self.env['db.backup.wal'].search(
+            [('config_id', '=', self.id)]).mapped('name'))
+        completed = sorted(file_name for file_name in os.listdir(wal_dir)
+                           if not file_name.endswith('.partial'))
+        new = [file_name for file_name in completed
+               if file_name not in archived]
+        if new:
+            driver.make_folder(WAL_FOLDER)
+        for file_name in new:
+            with open(os.path.join(wal_dir, file_name), 'rb') as file:
+                key = driver.put('%s/%s' % (WAL_FOLDER, file_name), file)
+            self.env['db.backup.wal'].create({
+                'config_id': self.id,
+                'name': file_name,
+                'key': key,
+            })
+            # Committed before the local file is removed, so that a file
+            # is never gone from both the disk and the archive records
+            self.env.cr.commit()
+        segments = [file_name for file_name in completed
+                    if WAL_SEGMENT_RE.match(file_name)]
+        for file_name in completed:
+            if not segments or file_name != segments[-1]:
+                os.remove(os.path.join(wal_dir, file_name))
+        _logger.info('WAL of %s: %d files archived', self.name, len(new))
+
+    def _is_base_backup_due(self):
+        """Whether the last base backup of this configuration is older than
+        its interval, or missing"""
+        last = self.env['db.backup.run'].search([
+            ('config_id', '=', self.id), ('state', '=', 'done'),
+            ('name', '=like', '%.' + BASE_BACKUP_EXTENSION),
+        ], order='start_time desc', limit=1)
+        return not last or (fields.Datetime.now() - last.start_time).days >= \
+            self.base_backup_interval
+
+    def _run_base_backup(self, pool):
+        """Stream a base backup of the cluster taken by pg_basebackup to the
+        destination of this configuration, or stage it first when the
+        destination needs its size. The WAL needed to make it consistent is
+        part of the archive."""
+        self.backup_filename = '%s_%s.%s' % (
+            self.db_name,
+            fields.datetime.utcnow().strftime(BACKUP_TIME_FORMAT),
+            BASE_BACKUP_EXTENSION)
+        run = self.env['db.backup.run'].create({
+            'config_id': self.id,
+            'name': self.backup_filename,
+            'db_name': self.db_name,
+        })
+        stats = {}
+        cmd = self._priority_command() + [
+            find_pg_tool('pg_basebackup'), '--pgdata=-', '--format=tar',
+            '--wal-method=fetch', '--gzip', '--checkpoint=fast']
+        _logger.info('BASE BACKUP: %s', self.backup_filename)
+        try:
+            driver = pool.driver(self)
+            with ChunkedStream(self._iter_process_output(
+                    cmd, exec_pg_environ(), stats)) as source:
+                if driver.requires_size:
+                    self._stage_base_backup(driver, source, stats)
+                else:
+                    with self._measure(stats, 'upload_time'):
+                        driver.upload_backup(self.backup_filename, source)
+                stats['backup_size'] = source.tell()
+            run._record_stats(stats)
+            run.checksum = driver.checksum
+            self._catalog_backup(run, driver)
+            if self.auto_remove:
+                run.deleted_count = self._remove_expired_backups(driver)
+        except Exception as error:
+            pool.discard(self)
+            self._backup_failed(error, run)
+            return
+        self._backup_succeeded(run)
+
+    def _stage_base_backup(self, driver, source, stats):
+        """Write the base backup read from `source` in a staging file, then
+        upload it with `driver`"""
+        staging_dir = os.path.join(odoo.tools.config['data_dir'],
+                                   STAGING_FOLDER, self.env.cr.dbname)
+        os.makedirs(staging_dir, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=staging_dir) as file:
+            shutil.copyfileobj(source, file, CHUNK_SIZE)
+            file.flush()
+            size = file.tell()
+            self._add_temp_size(stats, size)
+            with self._measure(stats, 'upload_time'):
+                driver.upload_staged(self.backup_filename, file.name)
+        self._add_temp_size(stats, -size)
+
+    def _backup_window_opening(self, now):
+        """UTC time at which the backup window containing the UTC time `now`
+        opened, None when `now` is outside of the window. Without a window
+        it is `now` itself."""
+        start, end = self.backup_window_start, self.backup_window_end
+        if start == end:
+            return now
+        timezone = pytz.timezone(self.user_id.tz or 'UTC')
+        local_now = pytz.utc.localize(now).astimezone(timezone)
+        hour = local_now.hour + local_now.minute / 60
+        day = local_now.date()
+        if start < end:
+            if not start <= hour < end:
+                return None
+        elif hour < end:
+            # In the part of the window past midnight
+            day -= timedelta(days=1)
+        elif hour < start:
+            return None
+        opening = timezone.localize(
+            datetime.combine(day, datetime.min.time()) +
+            timedelta(hours=start))
+        return opening.astimezone(pytz.utc).replace(tzinfo=None)
+
+    def _is_backup_due(self, now):
+        """Whether a backup of this configuration may start at the UTC time
+        `now`: inside its backup window, if it has one, and when no backup
+        started in that window yet, unless it failed"""
+        opening = self._backup_window_opening(now)
+        if opening is None:
+            return False
+        if opening == now:
+            return True
+        return not self.env['db.backup.run'].search_count([
+            ('config_id', '=', self.id),
+            ('start_time', '>=', opening),
+            ('state', '!=', 'failed'),
+        ])
+
+    def _run_backup_with_cursor(self, record_ids):
+        """Run the backup of configurations from a worker thread, with its
+        own cursor so that the result is committed independently of the
+        other workers."""
+        with self.pool.cursor() as cr:
+            env = api.Environment(cr, self.env.uid, self.env.context)
+            env[self._name].browse(record_ids)._run_backup()
+
+    def _run_backup(self):
+        """Generate the backup of each configuration in `self` and store it
+        in its destination. The configurations producing the same backup of
+        a database share a single dump, sent to all of them at once."""
+        groups = {}
+        for rec in self:
+            key = rec._dump_key()
+            groups[key] = groups.get(key, self.browse()) | rec
+        with DriverPool() as pool:
+            for configs in groups.values():
+                configs._run_shared_backup(pool)
+
+    def _dump_key(self):
+        """Configurations with equal keys produce the same backup and can
+        share a dump. Backup chains depend on the history of each
+        configuration, so they are never shared."""
+        if self.backup_format == 'directory' and self.backup_chain != 'full':
+            return self.id,
+        return (self.db_name, self.backup_format, self.backup_streaming,
+                self.dump_jobs, self.filestore_mode, self.compression_codec,
+                self.compression_threads, self.dump_nice, self.dump_io_class,
+                self.filestore_bandwidth)
+
+    def _run_shared_backup(self, pool):
+        """Back up the database of the configurations of `self`, which share
+        the same `_dump_key`, with a single dump"""
+        backup_time = fields.datetime.utcnow().strftime(BACKUP_TIME_FORMAT)
+        drivers = {}
+        runs = {}
+        connections = set()
+        for rec in self:
+            rec.backup_filename = "%s_%s.%s" % (
+                rec.db_name, backup_time, rec._backup_extension())
+            runs[rec] = self.env['db.backup.run'].create({
+                'config_id': rec.id,
+                'name': rec.backup_filename,
+                'db_name': rec.db_name,
+            })
+            # Committed right away, so that the next cron run finds the run
+            # if this one is killed
+            self.env.cr.commit()
+            try:
+                # Uploads to the same server run at the same time, each
+                # needs its own connection
+                key = pool.key(rec)
+                driver = pool.driver(rec, private=key in connections)
+                connections.add(key)
+                driver.prepare()
+                drivers[rec] = driver
+            except Exception as error:
+                pool.discard(rec)
+                rec._backup_failed(error, runs[rec])
+        if not drivers:
+            return
+        first = next(iter(drivers))
+        options = first._dump_options()
+        # A destination which needs the size of the backup before it is
+        # uploaded only gets staged backups
+        streaming = first.backup_streaming and not any(
+            driver.requires_size for driver in drivers.values())
+        if not streaming and not (
+                len(drivers) == 1 and first.backup_destination == 'local'):
+            errors = first._stage_backup(drivers, runs, options)
+        elif len(drivers) == 1:
+            [(rec, driver)] = drivers.items()
+            try:
+                driver.store_backup(rec.backup_filename, options)
+                errors = {rec: None}
+            except Exception as error:
+                errors = {rec: error}
+        else:
+            errors = self._fan_out_backup(drivers, options)
+        for rec, driver in drivers.items():
+            run = runs[rec]
+            run._record_stats(options['stats'])
+            run.checksum = driver.checksum
+            error = errors[rec]
+            if not error:
+                try:
+                    rec._complete_backup(run, driver, options)
+                    continue
+                except Exception as finish_error:
+                    error = finish_error
+            pool.discard(rec)
+            rec._backup_failed(error, run)
+
+    def _stage_backup(self, drivers, runs, options):
+        """Dump the backup of the configurations of `drivers` once, with
+        `options`, into a staging file kept until all of them stored it,
+        then upload it to their destinations. The `runs` are checkpointed
+        once the dump is staged, so that an interrupted upload resumes from
+        the file instead of dumping again. Return the error of each
+        configuration, or None when its upload succeeded."""
+        stats = options['stats']
+        path = os.path.join(
+            odoo.tools.config['data_dir'], STAGING_FOLDER, self.env.cr.dbname,
+            '%s_%s' % (runs[self].id, self.backup_filename))
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as file:
+                stats['temp_file'] = file
                 try:
-                    upload_session = requests.post(upload_session_url,
-                                                   headers=headers)
-                    upload_url = upload_session.json().get('uploadUrl')
-                    requests.put(upload_url, data=temp.read())
-                    if rec.auto_remove:
-                        list_url = MICROSOFT_GRAPH_END_POINT + "/v1.0/me/drive/items/%s/children" % rec.onedrive_folder_key
-                        response = requests.get(list_url, headers=headers)
-                        files = response.json().get('value')
-                        for file in files:
-                            create_time = file['createdDateTime'][:19].replace(
-                                'T',
-                                ' ')
-                            diff_days = (
-                                    fields.datetime.now() - fields.datetime.strptime(
-                                create_time, '%Y-%m-%d %H:%M:%S')).days
-                            if diff_days >= rec.days_to_remove:
-                                delete_url = MICROSOFT_GRAPH_END_POINT + "/v1.0/me/drive/items/%s" % \
-                                             file['id']
-                                requests.delete(delete_url, headers=headers)
-                    if rec.notify_user:
-                        mail_template_success.send_mail(rec.id,
-                                                        force_send=True)
+                    self.dump_data(self.db_name, file, self.backup_format,
+                                   **options)
+                finally:
+                    del stats['temp_file']
+                stats['backup_size'] = file.tell()
+        except Exception as error:
+            if os.path.exists(path):
+                os.remove(path)
+            return dict.fromkeys(drivers, error)
+        self._add_temp_size(stats, stats['backup_size'])
+        chain = options['chain']
+        staged = self.env['db.backup.run'].concat(
+            *(runs[rec] for rec in drivers))
+        staged._record_stats(stats)
+        staged._checkpoint('dumped', staging_path=path, chain_state=chain and
+                           json.dumps({key: chain[key] for key in (
+                               'level', 'parent_id', 'manifest')}))
+        with self._measure(stats, 'upload_time'):
+            return self._upload_staged(drivers, runs, path)
+
+    def _upload_staged(self, drivers, runs, path):
+        """Upload the staged backup `path` to the destinations of `drivers`
+        at the same time, each one resuming the upload session its run
+        saved during an interrupted attempt. Return the error of each
+        configuration, or None when its upload succeeded."""
+        names = {}
+        for rec, driver in drivers.items():
+            names[rec] = rec.backup_filename
+            driver.session = json.loads(runs[rec].upload_session or 'null')
+            driver.on_session = runs[rec]._save_upload_session
+
+        def upload(rec, driver):
+            try:
+                driver.upload_staged(names[rec], path)
+            except Exception as error:
+                return error
+            return None
+
+        if len(drivers) == 1:
+            [(rec, driver)] = drivers.items()
+            errors = {rec: upload(rec, driver)}
+        else:
+            # The uploads run in threads, the configurations are read
+            # beforehand so that they do not need the database cursor
+            self.read([name for name, field in self._fields.items()
+                       if field.store and field.column_type])
+            with ThreadPoolExecutor(
+                    max_workers=len(drivers),
+                    thread_name_prefix='db_backup_upload') as executor:
+                futures = {rec: executor.submit(upload, rec, driver)
+                           for rec, driver in drivers.items()}
+            errors = {rec: future.result() for rec, future in futures.items()}
+        # The sessions were saved with other cursors
+        self.env['db.backup.run'].concat(*runs.values()).invalidate_recordset(
+            ['stage', 'upload_session', 'uploaded_size'])
+        return errors
+
+    def _complete_backup(self, run, driver, options):
+        """Carry the `run` of a backup stored by `driver` through its last
+        stages, from the one it reached: once the backup is verified, record
+        it in its chain and the catalog, then upload the deduplicated
+        filestore and apply retention. Each stage is committed, an
+        interrupted run resumes after the last one."""
+        if run.stage != 'verified':
+            self._after_dump(options)
+            self._catalog_backup(run, driver)
+            run._checkpoint('verified', checksum=driver.checksum,
+                            upload_session=False)
+        index_key = self._upload_filestore_blobs(
+            self.backup_filename, driver.put,
+            lambda: driver.make_folder(FILESTORE_BLOB_FOLDER))
+        if index_key:
+            self.env['db.backup.catalog'].search(
+                [('run_id', '=', run.id)]).index_key = index_key
+        # Remove older backups
+        if self.auto_remove:
+            run.deleted_count = self._remove_expired_backups(driver)
+        run._checkpoint('pruned')
+        self._backup_succeeded(run)
+
+    def _resume_interrupted_backups(self):
+        """Carry on the backup runs that a previous cron run left unfinished,
+        because it was killed or the upload failed, from their last
+        checkpoint. The ones which cannot resume fail."""
+        runs = self.env['db.backup.run'].search([
+            ('state', '=', 'running'),
+            ('config_id.backup_mode', '=', 'dump')])
+        with DriverPool() as pool:
+            for run in runs:
+                rec = run.config_id
+                if not run._is_resumable():
+                    rec._backup_failed(run.error or _(
+                        "The backup was interrupted during the %s stage.",
+                        run.stage), run)
+                    continue
+                _logger.info('Resuming backup %s from the %s stage',
+                             run.name, run.stage)
+                run._checkpoint(run.stage, attempts=run.attempts + 1)
+                rec.backup_filename = run.name
+                stats = {}
+                try:
+                    driver = pool.driver(rec)
+                    driver.prepare()
+                    if run.stage != 'verified':
+                        with rec._measure(stats, 'upload_time'):
+                            error = rec._upload_staged(
+                                {rec: driver}, {rec: run},
+                                run._staged_file())[rec]
+                        if error:
+                            raise error
+                        stats['backup_size'] = driver.size
+                        run._record_stats(stats)
+                    rec._complete_backup(run, driver, {
+                        'chain': json.loads(run.chain_state or 'null')})
                 except Exception as error:
-                    rec.generated_exception = error
-                    _logger.info('Onedrive Exception: %s', error)
-                    if rec.notify_user:
-                        mail_template_failed.send_mail(rec.id, force_send=True)
-            # NextCloud Backup
-            elif rec.backup_destination == 'next_cloud':
+                    pool.discard(rec)
+                    rec._backup_failed(error, run)
+
+    def _fan_out_backup(self, drivers, options):
+        """Dump the database once with `options` and upload it to the
+        destinations of all the configurations of `drivers` at the same
+        time. Return the error of each configuration, or None when its
+        upload succeeded."""
+        # The uploads run in threads, the configurations are read beforehand
+        # so that they do not need the database cursor
+        self.read([name for name, field in self._fields.items()
+                   if field.store and field.column_type])
+        try:
+            with next(iter(drivers))._dump_chunks(options) as chunks:
+                results = fan_out(chunks, [
+                    lambda stream, driver=driver, name=rec.backup_filename:
+                    driver.upload_backup(name, stream)
+                    for rec, driver in drivers.items()])
+        except Exception as error:
+            return dict.fromkeys(drivers, error)
+        return dict(zip(drivers, results))
+
+    def _backup_succeeded(self, run):
+        """Close the `run` of a successful backup and notify the user"""
+        run._finish()
+        if self.notify_user:
+            self.env.ref(
+                'auto_database_backup.mail_template_data_db_backup_successful'
+            ).send_mail(self.id, force_send=True)
+
+    def _backup_failed(self, error, run):
+        """Record the error of a failed backup in its `run` and notify the
+        user. A run which can resume from its last checkpoint is left
+        running for the next cron run instead."""
+        self.generated_exception = error
+        _logger.info('%s Exception: %s',
+                     get_driver(self.backup_destination).label, error)
+        if run._is_resumable():
+            run._checkpoint(run.stage, error=str(error))
+            _logger.info('Backup %s will resume from the %s stage',
+                         run.name, run.stage)
+            return
+        run._finish(error)
+        if self.notify_user:
+            self.env.ref(
+                'auto_database_backup.mail_template_data_db_backup_failed'
+            ).send_mail(self.id, force_send=True)
+
+    @contextlib.contextmanager
+    def _dump_chunks(self, options):
+        """Yield the backup of this configuration, dumped with `options`, as
+        an iterator of chunks generated while they are read. Only streamed
+        backups are read this way, the others are staged."""
+        stats = options['stats']
+        stats['backup_size'] = 0
+
+        def count(chunks):
+            for chunk in chunks:
+                stats['backup_size'] += len(chunk)
+                yield chunk
+
+        chunks = self._dump_data_stream(self.db_name, self.backup_format,
+                                        **options)
+        try:
+            with self._measure(stats, 'upload_time'):
+                yield count(chunks)
+        finally:
+            chunks.close()
+
+    @contextlib.contextmanager
+    def _backup_source(self, options):
+        """Yield a readable file object with the backup of this configuration
+        dumped with `options`, generated while it is being read. Only
+        streamed backups are read this way, the others are staged."""
+        self.ensure_one()
+        stats = options['stats']
+        with ChunkedStream(self._dump_data_stream(
+                self.db_name, self.backup_format, **options)) as source:
+            with self._measure(stats, 'upload_time'):
+                yield source
+            stats['backup_size'] = source.tell()
+
+    def _backup_extension(self):
+        """File extension of the backups of this configuration"""
+        extension = BACKUP_EXTENSIONS[self.backup_format]
+        if self.backup_format == 'zip':
+            extension += ARCHIVE_CODECS.get(self.compression_codec, '')
+        return extension
+
+    def _dump_options(self):
+        """Keyword arguments of dump_data for the next backup of this
+        configuration. `stats` is filled while the backup is dumped."""
+        return {
+            'jobs': self.dump_jobs,
+            'include_filestore': self.filestore_mode != 'dedup',
+            'chain': self._next_backup_chain(),
+            'codec': self.compression_codec,
+            'threads': self.compression_threads,
+            'filestore_rate': self.filestore_bandwidth * 1024 * 1024,
+            'stats': {},
+        }
+
+    def _after_dump(self, options):
+        """Record the backup chain state, once the backup is stored on its
+        destination"""
+        if options['chain']:
+            self._record_backup_chain(options['chain'])
+
+    @staticmethod
+    @contextlib.contextmanager
+    def _measure(stats, key):
+        """Add the wall time spent in the block to `stats[key]`"""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            if stats is not None:
+                stats[key] = stats.get(key, 0.0) + time.monotonic() - start
+
+    @staticmethod
+    def _add_temp_size(stats, size):
+        """Count `size` more bytes of temporary files in use in `stats`, a
+        negative `size` when they are removed, and keep the peak usage in
+        `stats['temp_size']`. The staging file being written,
+        `stats['temp_file']`, counts with its current size: the temporary
+        directory of a dump still exists while it is written."""
+        if stats is None:
+            return
+        in_use = stats.get('temp_in_use', 0)
+        staging = stats.get('temp_file')
+        stats['temp_size'] = max(stats.get('temp_size', 0),
+                                 in_use + max(size, 0) +
+                                 (staging.tell() if staging else 0))
+        stats['temp_in_use'] = in_use + size
+
+    @staticmethod
+    def _disk_usage(directory):
+        """Total size of the files under `directory`"""
+        return sum(os.path.getsize(os.path.join(root, file_name))
+                   for root, _dirs, files in os.walk(directory)
+                   for file_name in files)
+
+    def _next_backup_chain(self):
+        """Return the chain state of the next backup of this configuration:
+        its level, its parent and the checksums of the content already
+        shipped by the chain, or None when every backup is a full one."""
+        if self.backup_chain == 'full' or self.backup_format != 'directory':
+            return None
+        manifests = self.env['db.backup.manifest'].search(
+            [('config_id', '=', self.id), ('closed', '=', False)],
+            order='id desc')
+        last_full = manifests.filtered(lambda m: m.level == 'full')[:1]
+        if not last_full or (fields.Date.today() - last_full.create_date.date()
+                             ).days >= self.full_backup_interval:
+            return {'level': 'full', 'parent': False, 'parent_id': False,
+                    'available': set()}
+        parent = last_full if self.backup_chain == 'differential' else \
+            manifests[0]
+        return {
+            'level': self.backup_chain,
+            'parent': parent.name,
+            'parent_id': parent.id,
+            'available': {checksum for manifest in parent._get_chain()
+                          for checksum in manifest._get_shipped()},
+        }
+
+    def _record_backup_chain(self, chain):
+        """Store the checksum manifest of a backup once it has been uploaded.
+        Manifests are removed with their backup by the retention."""
+        manifest = chain['manifest']
+        self.env['db.backup.manifest'].create({
+            'config_id': self.id,
+            'name': self.backup_filename,
+            'level': chain['level'],
+            'parent_id': chain['parent_id'],
+            'manifest': json.dumps(manifest),
+            'file_count': len(manifest['dump']) + len(manifest['filestore']),
+            'shipped_count': len(manifest['shipped']),
+        })
+
+    def _is_backup_file(self, name):
+        """Whether the remote file `name` is named like the backups of this
+        configuration in its current format, or like their filestore index,
+        so that the files the module did not create, the backups of other
+        formats and the deduplicated filestore blobs are left alone"""
+        name = os.path.basename(name.rstrip('/'))
+        match = BACKUP_TIME_RE.search(name)
+        if not match:
+            return False
+        backup = '%s_%s.%s' % (
+            self.db_name, match.group(1),
+            BASE_BACKUP_EXTENSION if self.backup_mode == 'continuous' else
+            self._backup_extension())
+        return name in (backup, self._filestore_index_name(backup))
+
+    @staticmethod
+    def _filestore_index_name(backup_filename):
+        """Name of the filestore index of the backup `backup_filename`, in
+        deduplicated filestore mode"""
+        return '%s.filestore.json' % os.path.splitext(backup_filename)[0]
+
+    def _catalog_backup(self, run, driver):
+        """Add the backup of `run`, just stored by `driver`, to the
+        catalog"""
+        self.env['db.backup.catalog'].create({
+            'config_id': self.id,
+            'run_id': run.id,
+            'name': run.name,
+            'backup_destination': self.backup_destination,
+            'location': self._backup_location(),
+            'key': driver.key,
+            'backup_time': self._backup_time(
+                BackupEntry(run.name, driver.key, run.start_time)),
+            'size': driver.size / MB,
+            'checksum': driver.checksum,
+        })
+
+    def _remove_expired_backups(self, driver):
+        """Delete the backups of this configuration which its retention
+        policy does not keep, as found in its catalog, in bulk, return how
+        many backups were deleted. The filestore index of a backup goes with
+        it, then the blobs that no index references anymore. A chain
+        expires as a unit: the backups a kept differential or incremental
+        backup builds on are kept with their manifest until it expires too.
+        The backups of the current location are deleted with
+        `driver`, those stored before the destination changed with a driver
+        of their own, and are kept in the catalog when it cannot reach
+        them or does not delete them."""
+        backups = self.env['db.backup.catalog'].search(
+            [('config_id', '=', self.id)])
+        kept = self._retained_backup_times(set(backups.mapped('backup_time')))
+        manifests = {manifest.name: manifest
+                     for manifest in self.env['db.backup.manifest'].search(
+                         [('config_id', '=', self.id)])}
+        needed = set()
+        for backup in backups.filtered(lambda b: b.backup_time in kept):
+            manifest = manifests.get(backup.name)
+            while manifest and manifest.name not in needed:
+                needed.add(manifest.name)
+                manifest = manifest.parent_id
+        expired = backups.filtered(lambda b: b.backup_time not in kept and
+                                   b.name not in needed)
+        locations = {}
+        for backup in expired:
+            locations.setdefault(backup._location(), []).append(backup)
+        deleted = self.env['db.backup.catalog']
+        sweep = False
+        with DriverPool() as pool:
+            for group in locations.values():
+                group = deleted.concat(*group)
+                config = self._location_config(group[0])
+                keys = [key for backup in group
+                        for key in (backup.key, backup.index_key) if key]
+                if config is self:
+                    failed = driver.delete(keys)
+                else:
+                    try:
+                        failed = pool.driver(config).delete(keys)
+                    except Exception as error:
+                        _logger.warning(
+                            'Expired backups of %s could not be deleted from '
+                            'their previous destination: %s', self.name,
+                            error)
+                        continue
+                if failed:
+                    failed = set(failed)
+                    group = group.filtered(
+                        lambda b: b.key not in failed and
+                        b.index_key not in failed)
+                if config is self:
+                    sweep = sweep or any(group.mapped('index_key'))
+                deleted |= group
+        self.env['db.backup.manifest'].concat(*(
+            manifests[name] for name in deleted.mapped('name')
+            if name in manifests)).unlink()
+        deleted.unlink()
+        if sweep:
+            self._remove_unused_blobs(driver)
+        if self.backup_mode == 'continuous':
+            self._remove_expired_wal(driver)
+        return len(deleted)
+
+    def _remove_expired_wal(self, driver):
+        """Delete with `driver` the archived WAL that no kept base backup
+        replays, the files archived before the oldest one"""
+        location = (self.backup_destination, self._backup_location())
+        base_backups = self.env['db.backup.catalog'].search([
+            ('config_id', '=', self.id),
+            ('name', '=like', '%.' + BASE_BACKUP_EXTENSION),
+        ]).filtered(lambda backup: backup._location() == location)
+        if not base_backups:
+            return
+        expired = self.env['db.backup.wal'].search([
+            ('config_id', '=', self.id),
+            ('create_date', '<', min(base_backups.mapped('backup_time'))),
+        ])
+        keys = [key for key in expired.mapped('key') if key]
+        failed = set(driver.delete(keys) or ()) if keys else set()
+        expired = expired.filtered(lambda wal: wal.key not in failed)
+        expired.unlink()
+        _logger.info('WAL of %s: %d expired files removed', self.name,
+                     len(expired))
+
+    def _remove_unused_blobs(self, driver):
+        """Delete with `driver` the deduplicated filestore blobs of the
+        current location that the index of no catalogued backup references
+        anymore. The location may be shared by several configurations, so
+        the indexes of all their backups are read, and nothing is deleted
+        while one of them has a backup in progress, whose index is not
+        catalogued yet, or when an index cannot be read."""
+        self.ensure_one()
+        location = (self.backup_destination, self._backup_location())
+        configs = self.search([
+            ('backup_destination', '=', self.backup_destination),
+        ]).filtered(lambda config: config._backup_location() == location[1])
+        if self.env['db.backup.run'].search_count([
+                ('config_id', 'in', (configs - self).ids),
+                ('state', '=', 'running')]):
+            return
+        blobs = self.env['db.backup.blob'].search([
+            ('config_id', 'in', configs.ids)])
+        if not blobs:
+            return
+        backups = self.env['db.backup.catalog'].search([
+            ('config_id', 'in', configs.ids), ('index_key', '!=', False),
+        ]).filtered(lambda backup: backup._location() == location)
+        used = set()
+        try:
+            for backup in backups:
+                with backup.config_id._download(
+                        driver, self._filestore_index_name(
+                            backup.name)) as file:
+                    used.update(json.load(file)['files'].values())
+        except Exception as error:
+            _logger.warning('Unused filestore blobs of %s were not removed, '
+                            'the index of %s could not be read: %s',
+                            self.name, backup.name, error)
+            return
+        checksums = {blob.checksum for blob in blobs
+                     if blob.key and blob.checksum not in used}
+        if checksums:
+            # The same blob is recorded by each configuration which uploaded
+            # it to this location
+            unused = blobs.filtered(lambda blob: blob.checksum in checksums)
+            try:
+                failed = set(driver.delete(
+                    sorted({blob.key for blob in unused if blob.key})) or ())
+            except Exception as error:
+                _logger.warning('Unused filestore blobs of %s could not be '
+                                'removed: %s', self.name, error)
+                return
+            unused.filtered(lambda blob: blob.key not in failed).unlink()
+        _logger.info('Filestore blobs of %s: %d unused blobs removed',
+                     self.name, len(checksums))
+
+    def _reconcile_backup_catalogs(self):
+        """Reconcile the catalog of every configuration with a listing of
+        its destination"""
+        with DriverPool() as pool:
+            for rec in self.search([]):
                 try:
-                    if rec.domain and rec.next_cloud_password and \
-                            rec.next_cloud_user_name:
-                        try:
-                            # Connect to NextCloud using the provided username
-                            # and password
-                            ncx = NextCloud(rec.domain,
-                                            auth=HTTPBasicAuth(
-                                                rec.next_cloud_user_name,
-                                                rec.next_cloud_password))
-                            # Connect to NextCloud again to perform additional
-                            # operations
-                            nc = nextcloud_client.Client(rec.domain)
-                            nc.login(rec.next_cloud_user_name,
-                                     rec.next_cloud_password)
-                            # Get the folder name from the NextCloud folder ID
-                            folder_name = rec.nextcloud_folder_key
-                            # If auto_remove is enabled, remove backup files
-                            # older than specified days
-                            if rec.auto_remove:
-                                folder_path = "/" + folder_name
-                                for item in nc.list(folder_path):
-                                    backup_file_name = item.path.split("/")[-1]
-                                    backup_date_str = \
-                                        backup_file_name.split("_")[1]
-                                    backup_date = fields.datetime.strptime(
-                                        backup_date_str, '%Y-%m-%d').date()
-                                    if (fields.date.today() - backup_date).days \
-                                            >= rec.days_to_remove:
-                                        nc.delete(item.path)
-                            # If notify_user is enabled, send a success email
-                            # notification
-                            if rec.notify_user:
-                                mail_template_success.send_mail(rec.id,
-                                                                force_send=True)
-                        except Exception as error:
-                            rec.generated_exception = error
-                            _logger.info('NextCloud Exception: %s', error)
-                            if rec.notify_user:
-                                # If an exception occurs, send a failed email
-                                # notification
-                                mail_template_failed.send_mail(rec.id,
-                                                               force_send=True)
-                        # Get the list of folders in the root directory of NextCloud
-                        data = ncx.list_folders('/').__dict__
-                        folders = [
-                            [file_name['href'].split('/')[-2],
-                             file_name['file_id']]
-                            for file_name in data['data'] if
-                            file_name['href'].endswith('/')]
-                        # If the folder name is not found in the list of folders,
-                        # create the folder
-                        if folder_name not in [file[0] for file in folders]:
-                            nc.mkdir(folder_name)
-                            # Dump the database to a temporary file
-                            temp = tempfile.NamedTemporaryFile(
-                                suffix='.%s' % rec.backup_format)
-                            with open(temp.name, "wb+") as tmp:
-                                self.dump_data(rec.db_name, tmp,
-                                                        rec.backup_format)
-                            backup_file_path = temp.name
-                            remote_file_path = f"/{folder_name}/{rec.db_name}_" \
-                                               f"{backup_time}.{rec.backup_format}"
-                            nc.put_file(remote_file_path, backup_file_path)
-                        else:
-                            # Dump the database to a temporary file
-                            temp = tempfile.NamedTemporaryFile(
-                                suffix='.%s' % rec.backup_format)
-                            with open(temp.name, "wb+") as tmp:
-                                self.dump_data(rec.db_name, tmp,
-                                                        rec.backup_format)
-                            backup_file_path = temp.name
-                            remote_file_path = f"/{folder_name}/{rec.db_name}_" \
-                                               f"{backup_time}.{rec.backup_format}"
-                            nc.put_file(remote_file_path, backup_file_path)
+                    rec._reconcile_backup_catalog(pool.driver(rec))
                 except Exception:
-                    raise ValidationError('Please check connection')
-            # Amazon S3 Backup
-            elif rec.backup_destination == 'amazon_s3':
-                if rec.aws_access_key and rec.aws_secret_access_key:
+                    pool.discard(rec)
+                    _logger.exception('Backup catalog of %s could not be '
+                                      'reconciled', rec.name)
+
+    def _reconcile_backup_catalog(self, driver):
+        """Bring the catalog of this configuration in line with a single
+        listing of the destination of `driver`: the backups removed from the
+        destination are forgotten and the ones missing from the catalog,
+        like those made before it existed, are added so that retention
+        removes them in turn. Only the backups of the current location are
+        reconciled, and the backups another configuration catalogued there
+        are left to it."""
+        location = self._backup_location()
+        backups = self.env['db.backup.catalog'].search(
+            [('backup_destination', '=', self.backup_destination)]).filtered(
+            lambda b: b._location() == (self.backup_destination, location))
+        catalog = {backup.name: backup for backup in backups
+                   if backup.config_id == self}
+        others = {backup.name for backup in backups
+                  if backup.config_id != self}
+        entries = {os.path.basename(entry.name.rstrip('/')): entry
+                   for entry in driver.list()
+                   if self._is_backup_file(entry.name) and
+                   os.path.basename(entry.name.rstrip('/')) not in others}
+        new = []
+        for name, entry in entries.items():
+            if name.endswith('.filestore.json'):
+                continue
+            index = entries.get(self._filestore_index_name(name))
+            values = {'key': entry.key, 'index_key': index and index.key}
+            if entry.size is not None:
+                values['size'] = entry.size / MB
+            if name in catalog:
+                catalog.pop(name).write(values)
+            else:
+                new.append(dict(values, config_id=self.id, name=name,
+                                backup_destination=self.backup_destination,
+                                location=location,
+                                backup_time=self._backup_time(entry)))
+        self.env['db.backup.catalog'].create(new)
+        gone = self.env['db.backup.catalog'].concat(*catalog.values())
+        gone.unlink()
+        _logger.info('Backup catalog of %s: %d backups added, %d forgotten',
+                     self.name, len(new), len(gone))
+
+    @staticmethod
+    def _backup_time(entry):
+        """UTC time of the backup of the `BackupEntry` `entry`, from its name
+        or else from its creation on the destination"""
+        match = BACKUP_TIME_RE.search(entry.name)
+        if match:
+            return datetime.strptime(match.group(1), BACKUP_TIME_FORMAT)
+        return entry.created
+
+    def _retained_backup_times(self, backup_times):
+        """Times of the backups kept by the retention policy among
+        `backup_times`"""
+        if self.retention_policy == 'age':
+            now = fields.Datetime.now()
+            return {backup_time for backup_time in backup_times
+                    if (now - backup_time).days < self.days_to_remove}
+        newest_first = sorted(backup_times, reverse=True)
+        kept = set()
+        for count, period in (
+                (self.keep_daily, lambda t: t.date()),
+                (self.keep_weekly, lambda t: t.isocalendar()[:2]),
+                (self.keep_monthly, lambda t: (t.year, t.month)),
+                (self.keep_yearly, lambda t: t.year)):
+            periods = set()
+            for backup_time in newest_first:
+                if len(periods) >= count:
+                    break
+                if period(backup_time) not in periods:
+                    periods.add(period(backup_time))
+                    kept.add(backup_time)
+        return kept
+
+    def _upload_filestore_blobs(self, backup_filename, put,
+                                make_blob_folder=None):
+        """In deduplicated filestore mode, upload the filestore files which
+        are not on the destination yet, each one only once under its SHA-1 in
+        FILESTORE_BLOB_FOLDER, then the index of this backup which maps every
+        filestore path to its blob, and return the key of the index. The
+        files are read from a snapshot of the filestore.
+        `put(name, fileobj)` stores a file under `name`, relative to the
+        destination folder, and returns its key, `make_blob_folder()`
+        creates the blob folder before the first blob is uploaded."""
+        self.ensure_one()
+        if self.filestore_mode != 'dedup' or self.backup_format == 'dump':
+            return
+        filestore = odoo.tools.config.filestore(self.db_name)
+        self.env.cr.execute("SELECT checksum FROM db_backup_blob "
+                            "WHERE config_id = %s", [self.id])
+        known = {checksum for checksum, in self.env.cr.fetchall()}
+        index = {}
+        uploaded = {}
+        with self._filestore_snapshot(filestore) as snapshot:
+            for path, relative in self._iter_files(snapshot):
+                try:
+                    checksum = self._filestore_checksum(path, relative)
+                    if checksum not in known:
+                        if make_blob_folder and not uploaded:
+                            make_blob_folder()
+                        with open(path, 'rb') as blob:
+                            uploaded[checksum] = put('%s/%s' % (
+                                FILESTORE_BLOB_FOLDER, checksum), blob)
+                        known.add(checksum)
+                except FileNotFoundError:
+                    # Removed by the garbage collector of the attachments
+                    # while the filestore is read in place
+                    _logger.info('Filestore file %s vanished, it is not '
+                                 'backed up', relative)
+                    continue
+                index[relative] = checksum
+        index_key = put(self._filestore_index_name(backup_filename),
+                        io.BytesIO(json.dumps({
+                            'backup': backup_filename,
+                            'blob_folder': FILESTORE_BLOB_FOLDER,
+                            'files': index,
+                        }).encode()))
+        self.env['db.backup.blob'].create([{
+            'config_id': self.id,
+            'checksum': checksum,
+            'key': key,
+        } for checksum, key in uploaded.items()])
+        _logger.info('Filestore of %s: %d files, %d new blobs uploaded',
+                     self.db_name, len(index), len(uploaded))
+        return index_key
+
+    @staticmethod
+    def _iter_files(directory):
+        """Yield the path of every file under `directory` with its path
+        relative to `directory`, using forward slashes"""
+        for root, _dirs, files in os.walk(directory):
+            for file_name in files:
+                path = os.path.join(root, file_name)
+                yield path, os.path.relpath(path, directory).replace(
+                    os.sep, '/')
+
+    @staticmethod
+    @contextlib.contextmanager
+    def _filestore_snapshot(filestore):
+        """Yield a directory with a consistent view of `filestore`: a tree of
+        hard links to its files, made in the data directory so that it is on
+        the same file system. The filestore files are never modified, only
+        added and removed, so a link keeps the content of a file the garbage
+        collector removes while the backup reads it. Where links are not
+        supported the filestore itself is yielded and read in place."""
+        snapshot_root = os.path.join(odoo.tools.config['data_dir'],
+                                     SNAPSHOT_FOLDER)
+        snapshot = None
+        lock = None
+        try:
+            os.makedirs(snapshot_root, exist_ok=True)
+            lock = _lock_snapshots(snapshot_root)
+            snapshot = tempfile.TemporaryDirectory(dir=snapshot_root)
+            directories = set()
+            for root, _dirs, files in os.walk(filestore):
+                target = os.path.join(snapshot.name,
+                                      os.path.relpath(root, filestore))
+                for file_name in files:
+                    if target not in directories:
+                        os.makedirs(target, exist_ok=True)
+                        directories.add(target)
                     try:
-                        # Create a boto3 client for Amazon S3 with provided
-                        # access key id and secret access key
-                        bo3 = boto3.client(
-                            's3',
-                            aws_access_key_id=rec.aws_access_key,
-                            aws_secret_access_key=rec.aws_secret_access_key)
-                        # If auto_remove is enabled, remove the backups that
-                        # are older than specified days from the S3 bucket
-                        if rec.auto_remove:
-                            folder_path = rec.aws_folder_name
-                            response = bo3.list_objects(
-                                Bucket=rec.bucket_file_name,
-                                Prefix=folder_path)
-                            today = fields.date.today()
-                            for file in response['Contents']:
-                                file_path = file['Key']
-                                last_modified = file['LastModified']
-                                date = last_modified.date()
-                                age_in_days = (today - date).days
-                                if age_in_days >= rec.days_to_remove:
-                                    bo3.delete_object(
-                                        Bucket=rec.bucket_file_name,
-                                        Key=file_path)
-                        # Create a boto3 resource for Amazon S3 with provided
-                        # access key id and secret access key
-                        s3 = boto3.resource(
-                            's3',
-                            aws_access_key_id=rec.aws_access_key,
-                            aws_secret_access_key=rec.aws_secret_access_key)
-                        # Create a folder in the specified bucket, if it
-                        # doesn't already exist
-                        s3.Object(rec.bucket_file_name,
-                                  rec.aws_folder_name + '/').put()
-                        bucket = s3.Bucket(rec.bucket_file_name)
-                        # Get all the prefixes in the bucket
-                        prefixes = set()
-                        for obj in bucket.objects.all():
-                            key = obj.key
-                            if key.endswith('/'):
-                                prefix = key[:-1]  # Remove the trailing slash
-                                prefixes.add(prefix)
-                        # If the specified folder is present in the bucket,
-                        # take a backup of the database and upload it to the
-                        #   S3 bucket
-                        if rec.aws_folder_name in prefixes:
-                            temp = tempfile.NamedTemporaryFile(
-                                suffix='.%s' % rec.backup_format)
-                            with open(temp.name, "wb+") as tmp:
-                                self.dump_data(rec.db_name, tmp,
-                                                        rec.backup_format)
-                            backup_file_path = temp.name
-                            remote_file_path = f"{rec.aws_folder_name}/{rec.db_name}_" \
-                                               f"{backup_time}.{rec.backup_format}"
-                            s3.Object(rec.bucket_file_name,
-                                      remote_file_path).upload_file(
-                                backup_file_path)
-                            # If notify_user is enabled, send an email to the
-                            # user notifying them about the successful backup
-                            if rec.notify_user:
-                                mail_template_success.send_mail(rec.id,
-                                                                force_send=True)
-                    except Exception as error:
-                        # If any error occurs, set the 'generated_exception'
-                        # field to the error message and log the error
-                        rec.generated_exception = error
-                        _logger.info('Amazon S3 Exception: %s', error)
-                        # If notify_user is enabled, email the user
-                        # notifying them about the failed backup
-                        if rec.notify_user:
-                            mail_template_failed.send_mail(rec.id, force_send=True)
-
-    def dump_data(self, db_name, stream, backup_format):
-        """Dump database `db` into file-like object `stream` if stream is None
-        return a file object with the dump. """
+                        os.link(os.path.join(root, file_name),
+                                os.path.join(target, file_name))
+                    except FileNotFoundError:
+                        continue
+        except OSError as error:
+            _logger.info('Filestore %s read in place, no snapshot: %s',
+                         filestore, error)
+            if snapshot is not None:
+                snapshot.cleanup()
+                snapshot = None
+        with contextlib.ExitStack() as stack:
+            if lock is not None:
+                stack.enter_context(lock)
+            if snapshot is None:
+                yield filestore
+                return
+            with snapshot:
+                yield snapshot.name
+
+    @staticmethod
+    def _remove_stale_snapshots():
+        """Remove the filestore snapshots left in the data directory by
+        the backups which were killed while reading them. Nothing is removed
+        while a backup reads a snapshot, they are removed by a later run."""
+        snapshot_root = os.path.join(odoo.tools.config['data_dir'],
+                                     SNAPSHOT_FOLDER)
+        if fcntl is None or not os.path.isdir(snapshot_root):
+            return
+        lock = _lock_snapshots(snapshot_root, exclusive=True)
+        if lock is None:
+            return
+        with lock:
+            stale = [entry.path for entry in os.scandir(snapshot_root)
+                     if entry.is_dir(follow_symlinks=False)]
+            for path in stale:
+                shutil.rmtree(path, ignore_errors=True)
+        if stale:
+            _logger.info('%d stale filestore snapshots removed', len(stale))
+
+    @staticmethod
+    def _file_digest(path, algorithm='sha1'):
+        """Hexadecimal digest of the content of the file at `path`"""
+        digest = hashlib.new(algorithm)
+        with open(path, 'rb') as file:
+            for chunk in iter(lambda: file.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _filestore_checksum(self, path, relative):
+        """SHA-1 of a filestore file. Odoo stores attachments as
+        <sha[:2]>/<sha>, their content does not need to be read again."""
+        match = FILESTORE_PATH_RE.match(relative)
+        return match.group(2) if match else self._file_digest(path)
 
+    def _check_dump_access(self):
+        """Database dumps are only allowed from the scheduled action"""
         cron_user_id = self.env.ref('auto_database_backup.ir_cron_auto_db_backup').user_id.id
         if cron_user_id != self.env.user.id:
             _logger.error(
                 'Unauthorized database operation. Backups should only be available from the cron job.')
             raise ValidationError("Unauthorized database operation. Backups should only be available from the cron job.")
 
+    def _dump_data_stream(self, db_name, backup_format, jobs=1,
+                          include_filestore=True, chain=None,
+                          codec='deflate_6', threads=0, filestore_rate=0,
+                          stats=None):
+        """Dump database `db_name` as an iterator of byte chunks, which can be
+        piped into the destination without any temporary file. In zip format
+        the archive is written on the fly from the output of pg_dump and the
+        filestore read in place."""
+        self._check_dump_access()
+        _logger.info('DUMP DB: %s format %s (streaming)', db_name,
+                     backup_format)
+        cmd = self._priority_command() + [
+            find_pg_tool('pg_dump'), '--no-owner', db_name]
+        env = exec_pg_environ()
+        if backup_format == 'zip':
+            return threaded_chunks(
+                lambda stream: self._write_zip_stream(
+                    db_name, cmd, env, stream, include_filestore, codec,
+                    threads, filestore_rate, stats))
+        if backup_format == 'directory':
+            return threaded_chunks(
+                lambda stream: self._write_tar_stream(
+                    db_name, cmd, env, jobs, stream, include_filestore,
+                    chain, filestore_rate, stats))
+        cmd.insert(-1, '--format=c')
+        return self._iter_process_output(cmd, env, stats)
+
+    def _write_zip_stream(self, db_name, cmd, env, stream,
+                          include_filestore=True, codec='deflate_6',
+                          threads=0, filestore_rate=0, stats=None):
+        """Write the zip backup of `db_name` into the non seekable `stream`,
+        in the same layout as odoo.service.db.dump_db. The filestore is read
+        at `filestore_rate` bytes per second at most."""
+        filestore = odoo.tools.config.filestore(db_name)
+        throttle = Throttle(filestore_rate)
+        with self._open_zip(stream, codec, threads, stats) as zip_file:
+            with zip_file.open('dump.sql', 'w', force_zip64=True) as dump:
+                for chunk in self._iter_process_output(cmd, env, stats):
+                    dump.write(chunk)
+            db = odoo.sql_db.db_connect(db_name)
+            with db.cursor() as cr:
+                zip_file.writestr('manifest.json', json.dumps(
+                    self._dump_db_manifest(cr), indent=4))
+            if include_filestore and os.path.exists(filestore):
+                with self._measure(stats, 'filestore_time'), \
+                        self._filestore_snapshot(filestore) as snapshot:
+                    for path, relative in self._iter_files(snapshot):
+                        throttle.consume(os.path.getsize(path))
+                        write_zip_file(zip_file, path,
+                                       'filestore/' + relative, codec)
+
+    @contextlib.contextmanager
+    def _open_zip(self, stream, codec, threads=0, stats=None):
+        """Open a zip archive writing into `stream` compressed with `codec`.
+        Once it is closed `stats` receives the time spent compressing and
+        the sizes of the files and of the archive."""
+        compress_type, compresslevel = zip_compression(codec)
+        counter = CountingWriter(stream)
+        # Deflate compresses the entries in the thread writing the archive,
+        # its CPU time leaves out the other backups and the uploads
+        cpu_start = time.thread_time()
+        with archive_writer(codec, counter, threads) as writer:
+            with zipfile.ZipFile(writer, 'w', compression=compress_type,
+                                 compresslevel=compresslevel,
+                                 allowZip64=True) as zip_file:
+                yield zip_file
+        if stats is not None:
+            if isinstance(writer, FrameWriter):
+                compression_time = writer.compression_time
+            elif compress_type == zipfile.ZIP_DEFLATED:
+                compression_time = time.thread_time() - cpu_start
+            else:
+                compression_time = 0.0
+            stats.update(
+                compression_time=compression_time,
+                input_size=sum(info.file_size
+                               for info in zip_file.infolist()),
+                output_size=counter.bytes_written)
+
+    def _zip_dir(self, dump_dir, stream, codec, threads=0, stats=None,
+                 filestore=None, throttle=None):
+        """Zip the content of `dump_dir` into `stream` with `codec`, the
+        dump first as odoo.tools.osutil.zip_dir does, then the files of the
+        `filestore` directory under filestore/, read as fast as `throttle`
+        allows"""
+        with self._open_zip(stream, codec, threads, stats) as zip_file:
+            for path, relative in sorted(self._iter_files(dump_dir),
+                                         key=lambda f: f[1] != 'dump.sql'):
+                write_zip_file(zip_file, path, relative, codec)
+            if filestore:
+                with self._measure(stats, 'filestore_time'):
+                    for path, relative in self._iter_files(filestore):
+                        if throttle:
+                            throttle.consume(os.path.getsize(path))
+                        write_zip_file(zip_file, path,
+                                       'filestore/' + relative, codec)
+
+    def _write_tar_stream(self, db_name, cmd, env, jobs, stream,
+                          include_filestore=True, chain=None,
+                          filestore_rate=0, stats=None):
+        """Dump `db_name` with pg_dump in directory format using `jobs`
+        parallel jobs, then write it with the manifest and the filestore as a
+        tar archive into the non seekable `stream`. The table files are
+        already compressed by pg_dump, the archive itself is not.
+        For a differential or incremental backup of `chain`, only the files
+        whose content is not in the chain yet are written. The filestore is
+        read at `filestore_rate` bytes per second at most."""
+        filestore = odoo.tools.config.filestore(db_name)
+        throttle = Throttle(filestore_rate)
+
+        def pace(info):
+            throttle.consume(info.size)
+            return info
+        with tempfile.TemporaryDirectory() as dump_dir:
+            dump_path = os.path.join(dump_dir, 'dump')
+            cmd = cmd[:-1] + ['--format=d', '--jobs=%d' % max(jobs, 1),
+                              '--file=' + dump_path, cmd[-1]]
+            with self._measure(stats, 'dump_time'):
+                subprocess.run(cmd, env=env, stdout=subprocess.DEVNULL,
+                               stderr=subprocess.STDOUT, check=True)
+            dump_size = self._disk_usage(dump_dir)
+            self._add_temp_size(stats, dump_size)
+            db = odoo.sql_db.db_connect(db_name)
+            with db.cursor() as cr:
+                manifest = json.dumps(self._dump_db_manifest(cr),
+                                      indent=4).encode()
+            with tarfile.open(fileobj=stream, mode='w|') as tar:
+                self._add_tar_file(tar, 'manifest.json', manifest)
+                if not (include_filestore and os.path.exists(filestore)):
+                    filestore = None
+                with contextlib.ExitStack() as stack:
+                    stack.callback(self._add_temp_size, stats, -dump_size)
+                    if filestore:
+                        filestore = stack.enter_context(
+                            self._filestore_snapshot(filestore))
+                    if chain is not None:
+                        self._add_chain_files(tar, dump_path, filestore,
+                                              chain, stats, throttle)
+                        return
+                    tar.add(dump_path, arcname='dump')
+                    if filestore:
+                        with self._measure(stats, 'filestore_time'):
+                            tar.add(filestore, arcname='filestore',
+                                    filter=pace)
+
+    def _add_chain_files(self, tar, dump_path, filestore, chain,
+                         stats=None, throttle=None):
+        """Add to `tar` the dump segments and the filestore files whose
+        content is not already shipped by the backups of `chain`, with the
+        checksum manifest of the complete backup. The manifest is also
+        stored in `chain` to be recorded once the upload succeeded. The
+        filestore files are read as fast as `throttle` allows."""
+        manifest = {'dump': {}, 'filestore': {}}
+        shipped = {}
+        sections = [('dump', dump_path)]
+        if filestore:
+            sections.append(('filestore', filestore))
+        for section, directory in sections:
+            with self._measure(stats if section == 'filestore' else None,
+                               'filestore_time'):
+                for path, relative in self._iter_files(directory):
+                    if section == 'dump':
+                        checksum = self._file_digest(path, 'sha256')
+                    else:
+                        checksum = self._filestore_checksum(path, relative)
+                    manifest[section][relative] = checksum
+                    if checksum in chain['available'] or checksum in shipped:
+                        continue
+                    shipped[checksum] = '%s/%s' % (section, relative)
+                    if section == 'filestore' and throttle:
+                        throttle.consume(os.path.getsize(path))
+                    tar.add(path, arcname=shipped[checksum])
+        manifest.update(level=chain['level'], parent=chain['parent'],
+                        shipped=shipped)
+        self._add_tar_file(tar, 'backup_manifest.json',
+                           json.dumps(manifest).encode())
+        chain['manifest'] = manifest
+
+    @staticmethod
+    def _add_tar_file(tar, name, data):
+        """Add a file named `name` with the bytes `data` to `tar`"""
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = int(time.time())
+        tar.addfile(info, io.BytesIO(data))
+
+    @staticmethod
+    def _iter_process_output(cmd, env, stats=None):
+        """Run `cmd` and yield its standard output in chunks, raise if the
+        command fails so that an incomplete backup is never reported as
+        successful. The run time of the command is added to the dump time
+        of `stats`."""
+        start = time.monotonic()
+        process = subprocess.Popen(cmd, env=env, stdout=subprocess.PIPE)
+        try:
+            yield from iter(lambda: process.stdout.read(CHUNK_SIZE), b'')
+        except GeneratorExit:
+            process.kill()
+            raise
+        finally:
+            process.stdout.close()
+            returncode = process.wait()
+            if stats is not None:
+                stats['dump_time'] = stats.get('dump_time', 0.0) + \
+                    time.monotonic() - start
+        if returncode:
+            raise subprocess.CalledProcessError(returncode, cmd)
+
+    def dump_data(self, db_name, stream, backup_format, jobs=1,
+                  include_filestore=True, chain=None, codec='deflate_6',
+                  threads=0, filestore_rate=0, stats=None):
+        """Dump database `db_name` into the file-like object `stream`. `jobs`
+        is the number of parallel pg_dump jobs of the directory format, the
+        filestore is left out of the archive when `include_filestore` is
+        False and `chain` is the state of a differential or incremental
+        backup chain. Zip backups are compressed with `codec` using `threads`
+        threads, the filestore is read at `filestore_rate` bytes per second
+        at most and the measures are stored in `stats`."""
+        self._check_dump_access()
         _logger.info('DUMP DB: %s format %s', db_name, backup_format)
-        cmd = [find_pg_tool('pg_dump'), '--no-owner', db_name]
+        cmd = self._priority_command() + [
+            find_pg_tool('pg_dump'), '--no-owner', db_name]
         env = exec_pg_environ()
         if backup_format == 'zip':
             with tempfile.TemporaryDirectory() as dump_dir:
                 filestore = odoo.tools.config.filestore(db_name)
                 cmd.insert(-1,'--file=' + os.path.join(dump_dir, 'dump.sql'))
-                subprocess.run(cmd, env=env, stdout=subprocess.DEVNULL,
-                               stderr=subprocess.STDOUT, check=True)
-                if os.path.exists(filestore):
-                    shutil.copytree(filestore,
-                                    os.path.join(dump_dir, 'filestore'))
+                with self._measure(stats, 'dump_time'):
+                    subprocess.run(cmd, env=env, stdout=subprocess.DEVNULL,
+                                   stderr=subprocess.STDOUT, check=True)
+                dump_size = self._disk_usage(dump_dir)
+                self._add_temp_size(stats, dump_size)
                 with open(os.path.join(dump_dir, 'manifest.json'), 'w') as fh:
                     db = odoo.sql_db.db_connect(db_name)
                     with db.cursor() as cr:
                         json.dump(self._dump_db_manifest(cr), fh, indent=4)
-                if stream:
-                    odoo.tools.osutil.zip_dir(dump_dir, stream,
-                                              include_dir=False,
-                                              fnct_sort=lambda
-                                                  file_name: file_name != 'dump.sql')
-                else:
-                    t = tempfile.TemporaryFile()
-                    odoo.tools.osutil.zip_dir(dump_dir, t, include_dir=False,
-                                              fnct_sort=lambda
-                                                  file_name: file_name != 'dump.sql')
-                    t.seek(0)
-                    return t
+                with contextlib.ExitStack() as stack:
+                    stack.callback(self._add_temp_size, stats, -dump_size)
+                    if include_filestore and os.path.exists(filestore):
+                        filestore = stack.enter_context(
+                            self._filestore_snapshot(filestore))
+                    else:
+                        filestore = None
+                    self._zip_dir(dump_dir, stream, codec, threads, stats,
+                                  filestore, Throttle(filestore_rate))
+        elif backup_format == 'directory':
+            self._write_tar_stream(db_name, cmd, env, jobs, stream,
+                                   include_filestore, chain, filestore_rate,
+                                   stats)
         else:
             cmd.insert(-1,'--format=c')
-            process = subprocess.Popen(cmd, env=env, stdout=subprocess.PIPE)
-            stdout, _ = process.communicate()
-            if stream:
-                stream.write(stdout)
-            else:
-                return stdout
+            for chunk in self._iter_process_output(cmd, env, stats):
+                stream.write(chunk)
+
+    def _priority_command(self):
+        """Command prefix running pg_dump with the CPU and I/O priority of
+        this configuration. The server side of the dump keeps its own
+        priority."""
+        prefix = []
+        if self.dump_nice:
+            prefix += ['nice', '-n', str(self.dump_nice)]
+        if self.dump_io_class != 'default':
+            prefix += ['ionice', '-c', '3'] if self.dump_io_class == 'idle' \
+                else ['ionice', '-c', '2', '-n', '7']
+        missing = [tool for tool in ('nice', 'ionice')
+                   if tool in prefix and not shutil.which(tool)]
+        if missing:
+            _logger.warning('%s not found, pg_dump runs with the normal '
+                            'priority', ', '.join(missing))
+            return []
+        return prefix
 
     def _dump_db_manifest(self, cr):
         """ This function generates a manifest dictionary for database dump."""
@@ -1072,3 +2384,242 @@ class DbBackupConfigure(models.Model):
             'modules': modules,
         }
         return manifest
+
+    def _check_restore_access(self):
+        """Raise an AccessError unless the user is an administrator, the
+        only ones who may restore a backup, after typing the master password
+        in the restore wizard"""
+        if not self.env.is_system():
+            raise AccessError(_("Only administrators can restore backups."))
+
+    def _restore_backup(self, backup, db_name, jobs=1, copy=False):
+        """Restore the catalogued `backup` of this configuration from where
+        it is stored into the new database `db_name`, return how many
+        seconds it took. Dump and directory backups are restored by
+        pg_restore with `jobs` parallel jobs, the filestore is extracted
+        while the backup is downloaded. The database is marked as a copy
+        when `copy` is set."""
+        self.ensure_one()
+        self._check_restore_access()
+        name = backup.name
+        if db.exp_db_exist(db_name):
+            raise UserError(_("The database %s already exists.", db_name))
+        _logger.info('RESTORE DB: %s from %s', db_name, name)
+        start = time.monotonic()
+        db._create_empty_database(db_name)
+        try:
+            with DriverPool() as pool, \
+                    tempfile.TemporaryDirectory() as restore_dir:
+                driver = pool.driver(self._location_config(backup))
+                self._restore_dump(driver, name, db_name, restore_dir, jobs)
+                filestore = os.path.join(restore_dir, 'filestore')
+                if self.filestore_mode == 'dedup' and \
+                        not name.endswith('.dump') and \
+                        not os.path.exists(filestore):
+                    self._download_filestore_blobs(driver, name, filestore)
+                registry = odoo.modules.registry.Registry.new(db_name)
+                with registry.cursor() as cr:
+                    env = api.Environment(cr, odoo.SUPERUSER_ID, {})
+                    if copy:
+                        env['ir.config_parameter'].init(force=True)
+                    if os.path.exists(filestore):
+                        shutil.move(filestore,
+                                    env['ir.attachment']._filestore())
+        except Exception:
+            db.exp_drop(db_name)
+            raise
+        restore_time = time.monotonic() - start
+        _logger.info('RESTORE DB: %s restored in %.1f s', db_name,
+                     restore_time)
+        return restore_time
+
+    @contextlib.contextmanager
+    def _download(self, driver, name):
+        """Yield a readable file object over the file `name` downloaded with
+        `driver`, decrypted when it was encrypted"""
+        with driver.download(name) as source:
+            yield decrypting_reader(source, self.encryption_passphrase)
+
+    def _restore_data_directory(self, data_dir):
+        """Absolute path of the directory `data_dir` a cluster is restored
+        into, relative to the restore folder unless it is absolute. Raise a
+        UserError when it is outside of the restore folder or holds
+        characters that the restore_command would have to escape."""
+        root = os.path.realpath(
+            self.env['ir.config_parameter'].sudo().get_param(
+                'auto_database_backup.restore_directory') or
+            os.path.join(odoo.tools.config['data_dir'], RESTORE_FOLDER))
+        path = os.path.realpath(os.path.join(root, data_dir))
+        if not path.startswith(root + os.sep):
+            raise UserError(_("The data directory must be inside %s.", root))
+        if not RESTORE_PATH_RE.match(path):
+            raise UserError(_("The data directory may only contain letters, "
+                              "digits, dots, dashes, underscores and "
+                              "slashes."))
+        return path
+
+    def _restore_point_in_time(self, backup, data_dir, target_time):
+        """Prepare in the empty directory `data_dir` a PostgreSQL cluster
+        restored from the catalogued base backup `backup`, which replays the
+        archived WAL up to the UTC time `target_time` once it is started.
+        The WAL is downloaded next to it, in `data_dir`.wal. `data_dir` is
+        inside the restore folder. Return how many seconds it took."""
+        self.ensure_one()
+        self._check_restore_access()
+        name = backup.name
+        data_dir = self._restore_data_directory(data_dir)
+        wal_dir = data_dir + '.wal'
+        for directory in (data_dir, wal_dir):
+            if os.path.exists(directory) and os.listdir(directory):
+                raise UserError(_("The directory %s is not empty.",
+                                  directory))
+        _logger.info('RESTORE CLUSTER: %s from %s at %s', data_dir, name,
+                     target_time)
+        start = time.monotonic()
+        os.makedirs(data_dir, mode=0o700, exist_ok=True)
+        os.makedirs(wal_dir, exist_ok=True)
+        try:
+            self._download_cluster(backup, data_dir, wal_dir, target_time)
+        except Exception:
+            self._remove_cluster(data_dir)
+            raise
+        with open(os.path.join(data_dir, 'recovery.signal'), 'w'):
+            pass
+        with open(os.path.join(data_dir, 'postgresql.auto.conf'),
+                  'a') as conf:
+            conf.write("\nrestore_command = 'cp \"%s/%%f\" \"%%p\"'\n"
+                       "recovery_target_time = '%s+00'\n"
+                       "recovery_target_action = 'promote'\n" % (
+                           wal_dir, fields.Datetime.to_string(target_time)))
+        restore_time = time.monotonic() - start
+        _logger.info('RESTORE CLUSTER: %s prepared in %.1f s', data_dir,
+                     restore_time)
+        return restore_time
+
+    def _download_cluster(self, backup, data_dir, wal_dir, target_time):
+        """Extract the base backup `backup` in `data_dir` and download in
+        `wal_dir` the WAL archived since, up to the UTC time
+        `target_time`"""
+        with DriverPool() as pool:
+            driver = pool.driver(self._location_config(backup))
+            with self._download(driver, backup.name) as source:
+                self._extract_tar(source, data_dir, 'r|gz')
+            # Segments are archived once completed, the segments completed
+            # up to the first one after the target hold its WAL
+            for wal in self.env['db.backup.wal'].search([
+                    ('config_id', '=', self.id),
+                    ('create_date', '>=', backup.backup_time)]):
+                with self._download(
+                        driver, '%s/%s' % (WAL_FOLDER, wal.name)) as source, \
+                        open(os.path.join(wal_dir, wal.name), 'wb') as file:
+                    shutil.copyfileobj(source, file, CHUNK_SIZE)
+                if wal.create_date > target_time and \
+                        WAL_SEGMENT_RE.match(wal.name):
+                    break
+
+    @staticmethod
+    def _remove_cluster(data_dir):
+        """Remove the cluster partially restored in `data_dir`, with its
+        WAL"""
+        for directory in (data_dir, data_dir + '.wal'):
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def _restore_dump(self, driver, name, db_name, restore_dir, jobs=1):
+        """Download the backup `name` with `driver` and restore its dump into
+        `db_name`, its filestore is extracted in `restore_dir`"""
+        cmd = [find_pg_tool('pg_restore'), '--no-owner',
+               '--dbname=' + db_name]
+        env = exec_pg_environ()
+        if name.endswith('.dump'):
+            if jobs <= 1:
+                # pg_restore reads the dump while it is downloaded
+                process = subprocess.Popen(
+                    cmd, env=env, stdin=subprocess.PIPE,
+                    stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
+                try:
+                    with self._download(driver, name) as source:
+                        shutil.copyfileobj(source, process.stdin, CHUNK_SIZE)
+                finally:
+                    process.stdin.close()
+                    returncode = process.wait()
+                if returncode:
+                    raise subprocess.CalledProcessError(returncode, cmd)
+                return
+            # Parallel jobs seek in the dump, it must be a local file
+            path = os.path.join(restore_dir, 'backup.dump')
+            with self._download(driver, name) as source, \
+                    open(path, 'wb') as file:
+                shutil.copyfileobj(source, file, CHUNK_SIZE)
+            cmd += ['--jobs=%d' % jobs, path]
+        elif name.endswith('.tar'):
+            manifest = self.env['db.backup.manifest'].search(
+                [('config_id', '=', self.id), ('name', '=', name)], limit=1)
+            if manifest:
+                manifest._extract_chain(
+                    restore_dir, lambda member: self._download(driver, member))
+            else:
+                with self._download(driver, name) as source:
+                    self._extract_tar(source, restore_dir)
+                self._check_full_backup(name, restore_dir)
+            cmd += ['--format=d', '--jobs=%d' % max(jobs, 1),
+                    os.path.join(restore_dir, 'dump')]
+        else:
+            # The zip directory is at the end of the archive, the archive is
+            # decompressed into a local file before it can be read
+            path = os.path.join(restore_dir, 'backup.zip')
+            with self._download(driver, name) as source, \
+                    archive_reader(codec_from_name(name), source) as reader, \
+                    open(path, 'wb') as file:
+                shutil.copyfileobj(reader, file, CHUNK_SIZE)
+            with zipfile.ZipFile(path) as zip_file:
+                zip_file.extractall(restore_dir, [
+                    member for member in zip_file.namelist()
+                    if member == 'dump.sql' or
+                    member.startswith('filestore/')])
+            os.remove(path)
+            cmd = [find_pg_tool('psql'), '--dbname=' + db_name, '-q',
+                   '-f', os.path.join(restore_dir, 'dump.sql')]
+        subprocess.run(cmd, env=env, stdout=subprocess.DEVNULL,
+                       stderr=subprocess.STDOUT, check=True)
+
+    @staticmethod
+    def _check_full_backup(name, restore_dir):
+        """Raise when the archive of `name`, extracted in `restore_dir`
+        without the manifest of its chain, only holds the changes of a
+        differential or incremental backup"""
+        path = os.path.join(restore_dir, 'backup_manifest.json')
+        if not os.path.exists(path):
+            return
+        with open(path) as file:
+            level = json.load(file).get('level')
+        if level and level != 'full':
+            raise UserError(_(
+                "%(name)s is a %(level)s backup and the chain it builds on "
+                "is no longer known.", name=name, level=level))
+
+    @staticmethod
+    def _extract_tar(stream, target_dir, mode='r|'):
+        """Extract the tar archive read sequentially from `stream` into
+        `target_dir`. Only its files and directories are extracted, and
+        only when they land inside `target_dir`."""
+        root = os.path.realpath(target_dir)
+        with tarfile.open(fileobj=stream, mode=mode) as tar:
+            for info in tar:
+                path = os.path.realpath(os.path.join(root, info.name))
+                if (info.isfile() or info.isdir()) and \
+                        path.startswith(root + os.sep):
+                    tar.extract(info, root)
+
+    def _download_filestore_blobs(self, driver, name, filestore):
+        """Rebuild in `filestore` the deduplicated filestore of the backup
+        `name` from the blobs listed in its index"""
+        with self._download(driver,
+                            self._filestore_index_name(name)) as file:
+            index = json.load(file)
+        for relative, checksum in index['files'].items():
+            path = os.path.join(filestore, *relative.split('/'))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with self._download(driver, '%s/%s' % (
+                    index['blob_folder'], checksum)) as blob, \
+                    open(path, 'wb') as file:
+                shutil.copyfileobj(blob, file, CHUNK_SIZE)
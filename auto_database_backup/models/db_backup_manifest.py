@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+###############################################################################
+#
+#    Cybrosys Technologies Pvt. Ltd.
+#
+#    Copyright (C) 2023-TODAY Cybrosys Technologies(<https://www.cybrosys.com>)
+#    Author: Cybrosys Techno Solutions (odoo@cybrosys.com)
+#
+#    You can modify it under the terms of the GNU LESSER
+#    GENERAL PUBLIC LICENSE (LGPL v3), Version 3.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU LESSER GENERAL PUBLIC LICENSE (LGPL v3) for more details.
+#
+#    You should have received a copy of the GNU LESSER GENERAL PUBLIC LICENSE
+#    (LGPL v3) along with this program.
+#    If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+import json
+import os
+import shutil
+import tarfile
+from odoo import fields, models, _
+from odoo.exceptions import UserError
+
+
+class DbBackupManifest(models.Model):
+    """Checksum manifest of a backup of a differential or incremental chain.
+    It lists the checksum of every dump segment and filestore file of the
+    complete backup, and which of them the backup archive ships itself."""
+    _name = 'db.backup.manifest'
+    _description = 'Database Backup Manifest'
+    _order = 'id desc'
+
+    config_id = fields.Many2one('db.backup.configure',
+                                string='Backup Configuration', required=True,
+                                index=True, ondelete='cascade',
+                                help='Configuration which made the backup')
+    name = fields.Char(string='Backup Filename', required=True,
+                       help='Name of the backup on the destination')
+    level = fields.Selection([
+        ('full', 'Full'),
+        ('differential', 'Differential'),
+        ('incremental', 'Incremental')
+    ], string='Level', required=True, help='Level of the backup')
+    parent_id = fields.Many2one('db.backup.manifest', string='Parent',
+                                ondelete='set null',
+                                help='Backup the changes are relative to')
+    closed = fields.Boolean(
+        string='Closed',
+        help='No later backup builds on this chain, because the destination '
+             'or the encryption changed after it was made')
+    manifest = fields.Text(string='Manifest',
+                           help='Checksums of the backup, as JSON')
+    file_count = fields.Integer(string='Files',
+                                help='Number of files of the complete backup')
+    shipped_count = fields.Integer(string='Shipped Files',
+                                   help='Number of files in the archive of '
+                                        'this backup')
+
+    def _get_shipped(self):
+        """Map of checksum to archive path of the files shipped by the
+        archive of this backup"""
+        self.ensure_one()
+        return json.loads(self.manifest or '{}').get('shipped', {})
+
+    def _get_chain(self):
+        """Manifests needed to restore this backup, from the full backup it
+        relies on to this one"""
+        self.ensure_one()
+        chain = []
+        manifest = self
+        while manifest:
+            chain.insert(0, manifest)
+            manifest = manifest.parent_id
+        if chain[0].level != 'full':
+            raise UserError(_("The full backup of %s is missing.", self.name))
+        return chain
+
+    def _extract_chain(self, target_dir, open_archive):
+        """Rebuild in `target_dir` the complete backup of this manifest, in
+        the layout of a directory format backup (dump/, filestore/ and
+        manifest.json), from the archives of its chain.
+        `open_archive(name)` returns a readable file object with the archive
+        of the backup `name`, read sequentially so that it can be
+        downloaded while it is extracted."""
+        self.ensure_one()
+        manifest = json.loads(self.manifest)
+        wanted = {}
+        for section in ('dump', 'filestore'):
+            for relative, checksum in manifest[section].items():
+                wanted.setdefault(checksum, []).append(
+                    os.path.join(target_dir, section, *relative.split('/')))
+        # The newest backups hold the most recent copy of the changed files
+        for member in reversed(self._get_chain()):
+            needed = {path: checksum for checksum, path in
+                      member._get_shipped().items() if checksum in wanted}
+            if not needed and member != self:
+                continue
+            with open_archive(member.name) as archive, \
+                    tarfile.open(fileobj=archive, mode='r|') as tar:
+                for info in tar:
+                    if member == self and info.name == 'manifest.json':
+                        tar.extract(info, target_dir)
+                    checksum = needed.get(info.name)
+                    if not checksum or checksum not in wanted:
+                        continue
+                    targets = wanted.pop(checksum)
+                    for path in targets:
+                        os.makedirs(os.path.dirname(path), exist_ok=True)
+                    with open(targets[0], 'wb') as file:
+                        shutil.copyfileobj(tar.extractfile(info), file)
+                    for path in targets[1:]:
+                        shutil.copyfile(targets[0], path)
+        if wanted:
+            raise UserError(_(
+                "The backup chain of %(name)s is incomplete, %(count)s files "
+                "are missing.", name=self.name, count=len(wanted)))
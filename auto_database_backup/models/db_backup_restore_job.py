@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+###############################################################################
+#
+#    Cybrosys Technologies Pvt. Ltd.
+#
+#    Copyright (C) 2023-TODAY Cybrosys Technologies(<https://www.cybrosys.com>)
+#    Author: Cybrosys Techno Solutions (odoo@cybrosys.com)
+#
+#    You can modify it under the terms of the GNU LESSER
+#    GENERAL PUBLIC LICENSE (LGPL v3), Version 3.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU LESSER GENERAL PUBLIC LICENSE (LGPL v3) for more details.
+#
+#    You should have received a copy of the GNU LESSER GENERAL PUBLIC LICENSE
+#    (LGPL v3) along with this program.
+#    If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+import logging
+from odoo import api, fields, models, _
+from odoo.service import db
+
+_logger = logging.getLogger(__name__)
+
+
+class DbBackupRestoreJob(models.Model):
+    """Restore of a backup requested from the restore wizard. It is run by
+    a scheduled action rather than by the request, which the time limit of
+    the requests would kill, leaving a half-restored database behind."""
+    _name = 'db.backup.restore.job'
+    _description = 'Database Backup Restore Job'
+    _order = 'id desc'
+
+    config_id = fields.Many2one('db.backup.configure',
+                                string='Backup Configuration', required=True,
+                                ondelete='cascade',
+                                help='Configuration which made the backup')
+    backup_id = fields.Many2one('db.backup.catalog', string='Backup',
+                                required=True, ondelete='cascade',
+                                help='Backup to restore')
+    user_id = fields.Many2one('res.users', string='Requested By',
+                              default=lambda self: self.env.user,
+                              help='Administrator who requested the restore')
+    db_name = fields.Char(string='New Database Name',
+                          help='Name of the database created by the restore')
+    restore_jobs = fields.Integer(
+        string='Restore Jobs', default=1,
+        help='Number of tables restored in parallel by pg_restore')
+    copy_database = fields.Boolean(
+        string='This Database Is a Copy',
+        help='Give the restored database a new UUID')
+    data_directory = fields.Char(
+        string='Data Directory',
+        help='Directory receiving the restored PostgreSQL cluster, for the '
+             'continuous backups')
+    recovery_target_time = fields.Datetime(
+        string='Restore To',
+        help='Point in time the restored cluster is recovered to')
+    state = fields.Selection([
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed')
+    ], string='Status', default='pending', required=True,
+        help='Progress of the restore')
+    start_time = fields.Datetime(string='Start Time',
+                                 help='When the restore started')
+    restore_time = fields.Float(
+        string='Restore Time (s)', digits=(16, 2),
+        help='Wall time of the restore, from the start of the download to '
+             'the restored database')
+    error = fields.Text(string='Error', help='Why the restore failed')
+
+    def _trigger_restore(self):
+        """Have the scheduled action run the pending restores now"""
+        self.env.ref(
+            'auto_database_backup.ir_cron_restore_backup')._trigger()
+
+    @api.model
+    def _process_restore_jobs(self):
+        """Run the pending restores one after the other. A restore still
+        running was killed with the process which ran it: it fails and the
+        database or the cluster it partially restored is removed."""
+        for job in self.search([('state', '=', 'running')]):
+            job._remove_partial_restore()
+            job.write({'state': 'failed',
+                       'error': _("The restore was interrupted.")})
+            self.env.cr.commit()
+        for job in self.search([('state', '=', 'pending')], order='id'):
+            job.write({'state': 'running',
+                       'start_time': fields.Datetime.now()})
+            # Committed right away, so that the next cron run finds the
+            # restore if this one is killed
+            self.env.cr.commit()
+            try:
+                restore_time = job._restore()
+            except Exception as error:
+                self.env.cr.rollback()
+                _logger.exception('Restore of %s failed', job.backup_id.name)
+                job.write({'state': 'failed', 'error': str(error)})
+            else:
+                job.write({'state': 'done', 'restore_time': restore_time})
+                job.backup_id.run_id.restore_time = restore_time
+            self.env.cr.commit()
+
+    def _restore(self):
+        """Restore the backup of this job, return how many seconds it
+        took"""
+        self.ensure_one()
+        config = self.config_id
+        if self.data_directory:
+            return config._restore_point_in_time(
+                self.backup_id, self.data_directory,
+                self.recovery_target_time)
+        return config._restore_backup(self.backup_id, self.db_name,
+                                      self.restore_jobs,
+                                      self.copy_database)
+
+    def _remove_partial_restore(self):
+        """Remove what the interrupted restore of this job restored"""
+        self.ensure_one()
+        if self.data_directory:
+            self.config_id._remove_cluster(
+                self.config_id._restore_data_directory(self.data_directory))
+        elif self.db_name and db.exp_db_exist(self.db_name):
+            db.exp_drop(self.db_name)
+        _logger.info('Interrupted restore of %s removed',
+                     self.backup_id.name)
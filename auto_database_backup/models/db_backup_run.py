@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+###############################################################################
+#
+#    Cybrosys Technologies Pvt. Ltd.
+#
+#    Copyright (C) 2023-TODAY Cybrosys Technologies(<https://www.cybrosys.com>)
+#    Author: Cybrosys Techno Solutions (odoo@cybrosys.com)
+#
+#    You can modify it under the terms of the GNU LESSER
+#    GENERAL PUBLIC LICENSE (LGPL v3), Version 3.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU LESSER GENERAL PUBLIC LICENSE (LGPL v3) for more details.
+#
+#    You should have received a copy of the GNU LESSER GENERAL PUBLIC LICENSE
+#    (LGPL v3) along with this program.
+#    If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+import json
+import logging
+import os
+import odoo
+from odoo import api, fields, models
+
+_logger = logging.getLogger(__name__)
+MB = 1024 * 1024
+# Backups which are not streamed are dumped in this folder of the data
+# directory, and kept there until they are stored
+STAGING_FOLDER = 'backup_staging'
+# Cron runs which try an interrupted backup run before it fails
+RESUME_ATTEMPTS = 3
+
+
+class DbBackupRun(models.Model):
+    """A run of a backup configuration, with the time spent in each phase
+    and the amount of data produced, to follow the backups over time."""
+    _name = 'db.backup.run'
+    _description = 'Database Backup Run'
+    _order = 'start_time desc, id desc'
+
+    config_id = fields.Many2one('db.backup.configure',
+                                string='Backup Configuration', required=True,
+                                index=True, ondelete='cascade',
+                                help='Configuration which made the backup')
+    name = fields.Char(string='Backup Filename',
+                       help='Name of the backup on the destination')
+    db_name = fields.Char(string='Database Name',
+                          help='Name of the database backed up')
+    backup_destination = fields.Selection(
+        related='config_id.backup_destination', store=True,
+        string='Backup Destination')
+    state = fields.Selection([
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed')
+    ], string='Status', default='running', required=True,
+        help='Progress of the run')
+    stage = fields.Selection([
+        ('dump', 'Dumping'),
+        ('dumped', 'Dumped'),
+        ('upload', 'Uploading'),
+        ('verified', 'Verified'),
+        ('pruned', 'Pruned')
+    ], string='Stage', default='dump', required=True,
+        help='Last checkpoint of the run, an interrupted run resumes from it '
+             'at the next scheduled backup')
+    staging_path = fields.Char(
+        string='Staged Backup',
+        help='Local file holding the dump until the backup is stored, so '
+             'that an interrupted upload does not dump again')
+    upload_session = fields.Text(
+        string='Upload Session',
+        help='State of the interrupted upload, as JSON: the offset the '
+             'destination acknowledged and its upload session')
+    uploaded_size = fields.Float(string='Uploaded (MB)', digits=(16, 2),
+                                 help='Part of the backup acknowledged by '
+                                      'the destination so far')
+    chain_state = fields.Text(
+        string='Chain State',
+        help='Backup chain state recorded once the backup is stored, as JSON')
+    attempts = fields.Integer(string='Attempts', default=1,
+                              help='Number of cron runs which worked on the '
+                                   'backup')
+    start_time = fields.Datetime(string='Start Time',
+                                 default=fields.Datetime.now,
+                                 help='When the run started')
+    end_time = fields.Datetime(string='End Time',
+                               help='When the run ended')
+    duration = fields.Float(string='Duration (s)',
+                            help='Wall time of the whole run')
+    dump_time = fields.Float(string='Dump Time (s)',
+                             help='Wall time of pg_dump')
+    filestore_time = fields.Float(
+        string='Filestore Time (s)',
+        help='Wall time spent copying or archiving the filestore')
+    compression_time = fields.Float(
+        string='Compression Time (s)',
+        help='Time spent compressing the zip archive: the CPU time of the '
+             'thread writing it for Deflate, the time spent in the compressor '
+             'for Zstandard and LZ4')
+    upload_time = fields.Float(
+        string='Upload Time (s)',
+        help='Wall time of the transfer to the destination. In streaming '
+             'mode, and for local backups, the dump happens during the '
+             'transfer.')
+    backup_size = fields.Float(string='Size (MB)', digits=(16, 2),
+                               help='Size of the backup transferred')
+    throughput = fields.Float(string='Throughput (MB/s)', digits=(16, 2),
+                              compute='_compute_throughput', store=True,
+                              help='Size of the backup divided by the upload '
+                                   'time')
+    compression_ratio = fields.Float(
+        string='Compression Ratio', digits=(16, 2),
+        help='Size of the files of a zip backup divided by the size of the '
+             'archive')
+    temp_size = fields.Float(
+        string='Peak Temporary Disk (MB)', digits=(16, 2),
+        help='Largest amount of temporary files the run needed at once')
+    deleted_count = fields.Integer(
+        string='Deleted Backups',
+        help='Number of expired backups removed by retention')
+    restore_time = fields.Float(
+        string='Restore Time (s)', digits=(16, 2),
+        help='Wall time of the last restore of this backup, from the start '
+             'of the download to the restored database')
+    checksum = fields.Char(
+        string='SHA-256',
+        help='Checksum of the uploaded backup, computed while it was '
+             'uploaded')
+    error = fields.Text(string='Error', help='Why the run failed')
+
+    @api.depends('backup_size', 'upload_time')
+    def _compute_throughput(self):
+        """Compute the transfer speed of the run"""
+        for run in self:
+            run.throughput = run.backup_size / run.upload_time \
+                if run.upload_time else 0.0
+
+    def _record_stats(self, stats):
+        """Store the measures collected in `stats` while the backup was
+        dumped and uploaded"""
+        values = {key: stats[key] for key in (
+            'dump_time', 'filestore_time', 'compression_time', 'upload_time')
+                  if key in stats}
+        if 'backup_size' in stats:
+            values['backup_size'] = stats['backup_size'] / MB
+        if 'temp_size' in stats:
+            values['temp_size'] = stats['temp_size'] / MB
+        if stats.get('output_size'):
+            values['compression_ratio'] = \
+                stats['input_size'] / stats['output_size']
+        self.write(values)
+
+    def _finish(self, error=None):
+        """Close the run, as failed when there is an `error`, and delete its
+        staged backup once no other run needs it"""
+        end_time = fields.Datetime.now()
+        for run in self:
+            run.write({
+                'state': 'failed' if error else 'done',
+                'end_time': end_time,
+                'duration': (end_time - run.start_time).total_seconds(),
+                'error': error and str(error),
+                'upload_session': False,
+            })
+            staged = run._staged_file()
+            if staged and not self.search_count([
+                    ('staging_path', '=', run.staging_path),
+                    ('state', '=', 'running')]):
+                os.remove(staged)
+
+    def _staged_file(self):
+        """Path of the staged backup of the run, None when there is none or
+        when it is not in the staging folder, where only the backups write"""
+        self.ensure_one()
+        if not self.staging_path:
+            return None
+        root = os.path.realpath(os.path.join(
+            odoo.tools.config['data_dir'], STAGING_FOLDER))
+        path = os.path.realpath(self.staging_path)
+        if not path.startswith(root + os.sep):
+            _logger.warning('Staged backup %s of run %s is outside of %s, it '
+                            'is ignored', self.staging_path, self.id, root)
+            return None
+        return path if os.path.isfile(path) else None
+
+    def _checkpoint(self, stage, **values):
+        """Move the runs to `stage` with `values` and commit, so that the
+        next cron run resumes from there if this one is interrupted"""
+        self.write(dict(values, stage=stage))
+        self.env.cr.commit()
+
+    def _save_upload_session(self, session):
+        """Persist the upload `session` of the run. It is called by the
+        upload threads after every range the destination acknowledged, and
+        committed right away with a cursor of its own."""
+        with self.pool.cursor() as cr:
+            self.with_env(self.env(cr=cr)).write({
+                'stage': 'upload',
+                'upload_session': json.dumps(session),
+                'uploaded_size': session['offset'] / MB,
+            })
+
+    def _is_resumable(self):
+        """Whether the next cron run can carry on this unfinished run from
+        its last checkpoint"""
+        self.ensure_one()
+        if self.attempts >= RESUME_ATTEMPTS:
+            return False
+        if self.stage == 'verified':
+            return True
+        return self.stage in ('dumped', 'upload') and \
+            bool(self._staged_file())
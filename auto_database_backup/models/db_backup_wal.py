@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+###############################################################################
+#
+#    Cybrosys Technologies Pvt. Ltd.
+#
+#    Copyright (C) 2023-TODAY Cybrosys Technologies(<https://www.cybrosys.com>)
+#    Author: Cybrosys Techno Solutions (odoo@cybrosys.com)
+#
+#    You can modify it under the terms of the GNU LESSER
+#    GENERAL PUBLIC LICENSE (LGPL v3), Version 3.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU LESSER GENERAL PUBLIC LICENSE (LGPL v3) for more details.
+#
+#    You should have received a copy of the GNU LESSER GENERAL PUBLIC LICENSE
+#    (LGPL v3) along with this program.
+#    If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+from odoo import fields, models
+
+
+class DbBackupWal(models.Model):
+    """WAL file archived on the destination of a backup configuration in
+    continuous mode, replayed by the point-in-time restores"""
+    _name = 'db.backup.wal'
+    _description = 'Database Backup WAL File'
+    _order = 'name'
+
+    config_id = fields.Many2one('db.backup.configure',
+                                string='Backup Configuration', required=True,
+                                index=True, ondelete='cascade',
+                                help='Configuration which archived the file')
+    name = fields.Char(string='Name', required=True,
+                       help='Name of the WAL segment or timeline history '
+                            'file, in the WAL folder of the destination')
+    key = fields.Char(string='Remote Key',
+                      help='Path or identifier of the file on the '
+                           'destination, empty for the files archived before '
+                           'it was recorded')
+
+    _sql_constraints = [
+        ('name_uniq', 'unique(config_id, name)',
+         'A WAL file is archived only once per configuration.'),
+    ]
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+###############################################################################
+#
+#    Cybrosys Technologies Pvt. Ltd.
+#
+#    Copyright (C) 2023-TODAY Cybrosys Technologies(<https://www.cybrosys.com>)
+#    Author: Cybrosys Techno Solutions (odoo@cybrosys.com)
+#
+#    You can modify it under the terms of the GNU LESSER
+#    GENERAL PUBLIC LICENSE (LGPL v3), Version 3.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU LESSER GENERAL PUBLIC LICENSE (LGPL v3) for more details.
+#
+#    You should have received a copy of the GNU LESSER GENERAL PUBLIC LICENSE
+#    (LGPL v3) along with this program.
+#    If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+import hashlib
+import io
+import os
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from odoo.exceptions import UserError
+from odoo.tests import BaseCase
+
+from ..tools.backup_drivers.amazon_s3 import AmazonS3Driver, \
+    S3_DELETE_BATCH
+
+try:
+    import boto3
+    from moto import mock_aws
+except ImportError:
+    mock_aws = None
+
+MB = 1024 * 1024
+
+
+@unittest.skipIf(mock_aws is None, 'The moto library is not installed')
+class TestAmazonS3(BaseCase):
+    """Amazon S3 driver against the S3 API mocked by moto"""
+
+    def setUp(self):
+        super().setUp()
+        environ = patch.dict(os.environ, {
+            'AWS_ACCESS_KEY_ID': 'testing',
+            'AWS_SECRET_ACCESS_KEY': 'testing',
+            'AWS_DEFAULT_REGION': 'us-east-1',
+        })
+        environ.start()
+        self.addCleanup(environ.stop)
+        aws = mock_aws()
+        aws.start()
+        self.addCleanup(aws.stop)
+        self.client = boto3.client('s3', region_name='us-east-1')
+        self.client.create_bucket(Bucket='backups')
+        self.driver = AmazonS3Driver(SimpleNamespace(
+            bucket_file_name='backups', aws_folder_name='odoo',
+            aws_part_size=5, aws_max_concurrency=2, backup_encryption=False,
+            encryption_passphrase=False, upload_bandwidth=0), self.client)
+        self.driver.prepare()
+
+    def put_objects(self, count):
+        names = ['backup_%04d.zip' % number for number in range(count)]
+        for name in names:
+            self.client.put_object(Bucket='backups', Key='odoo/' + name,
+                                   Body=name.encode())
+        return names
+
+    def test_upload_single_part(self):
+        data = os.urandom(MB)
+        self.driver.upload_backup('small.zip', io.BytesIO(data))
+        self.assertEqual(self.driver.checksum,
+                         hashlib.sha256(data).hexdigest())
+        self.assertEqual(self.driver.key, 'odoo/small.zip')
+        self.assertEqual(self.driver.size, len(data))
+
+    def test_upload_multipart(self):
+        data = os.urandom(12 * MB + 1)
+        self.driver.upload_backup('large.zip', io.BytesIO(data))
+        head = self.client.head_object(Bucket='backups',
+                                       Key='odoo/large.zip')
+        self.assertTrue(head['ETag'].strip('"').endswith('-3'))
+        self.assertEqual(head['ContentLength'], len(data))
+        with self.driver.download('large.zip') as body:
+            self.assertEqual(body.read(), data)
+
+    def test_verify_etag(self):
+        data = os.urandom(6 * MB)
+        self.driver.upload_backup('large.zip', io.BytesIO(data))
+        digests = dict(self.driver.digests())
+        for digest in digests.values():
+            digest.update(data[:-1] + b'x')
+        with self.assertRaises(UserError):
+            self.driver.verify('large.zip', None, digests, len(data))
+
+    def test_list_pages(self):
+        # More objects than a page of list_objects_v2 holds
+        names = self.put_objects(S3_DELETE_BATCH + 5)
+        entries = self.driver.list()
+        self.assertEqual(
+            sorted(entry.name for entry in entries
+                   if entry.name != 'odoo/'),
+            ['odoo/' + name for name in names])
+        self.assertTrue(all(entry.key == entry.name and entry.size
+                            for entry in entries if entry.name != 'odoo/'))
+
+    def test_delete_batches(self):
+        names = self.put_objects(S3_DELETE_BATCH + 5)
+        with patch.object(self.client, 'delete_objects',
+                          wraps=self.client.delete_objects) as delete:
+            failed = self.driver.delete(['odoo/' + name for name in names])
+        self.assertEqual(failed, [])
+        self.assertEqual([len(call.kwargs['Delete']['Objects'])
+                          for call in delete.call_args_list],
+                         [S3_DELETE_BATCH, 5])
+        self.assertEqual([entry.name for entry in self.driver.list()],
+                         ['odoo/'])
+
+    def test_delete_failures(self):
+        names = self.put_objects(3)
+        keys = ['odoo/' + name for name in names]
+        with patch.object(self.client, 'delete_objects', return_value={
+                'Errors': [{'Key': keys[1], 'Code': 'AccessDenied',
+                            'Message': 'Access Denied'}]}):
+            self.assertEqual(self.driver.delete(keys), [keys[1]])
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+###############################################################################
+#
+#    Cybrosys Technologies Pvt. Ltd.
+#
+#    Copyright (C) 2023-TODAY Cybrosys Technologies(<https://www.cybrosys.com>)
+#    Author: Cybrosys Techno Solutions (odoo@cybrosys.com)
+#
+#    You can modify it under the terms of the GNU LESSER
+#    GENERAL PUBLIC LICENSE (LGPL v3), Version 3.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU LESSER GENERAL PUBLIC LICENSE (LGPL v3) for more details.
+#
+#    You should have received a copy of the GNU LESSER GENERAL PUBLIC LICENSE
+#    (LGPL v3) along with this program.
+#    If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+import io
+import unittest
+
+from odoo.exceptions import UserError
+from odoo.tests import BaseCase
+
+from ..tools.backup_crypto import (AESGCM, FRAME_SIZE, HEADER_SIZE,
+                                   TAG_SIZE, EncryptedChunks,
+                                   EncryptingWriter, decrypting_reader,
+                                   encrypted_size)
+
+PASSPHRASE = 'correct horse battery staple'
+
+
+@unittest.skipIf(AESGCM is None, 'The cryptography library is not installed')
+class TestBackupCrypto(BaseCase):
+    """Format of the encrypted backups"""
+
+    def encrypt(self, data, chunk_size=65536, header=None):
+        chunks = (data[i:i + chunk_size]
+                  for i in range(0, len(data), chunk_size))
+        return b''.join(EncryptedChunks(chunks, PASSPHRASE, header))
+
+    def decrypt(self, data, passphrase=PASSPHRASE):
+        return decrypting_reader(io.BytesIO(data), passphrase).read()
+
+    def test_round_trip(self):
+        for size in (0, 1, FRAME_SIZE - 1, FRAME_SIZE, FRAME_SIZE + 1,
+                     2 * FRAME_SIZE):
+            data = bytes(i % 251 for i in range(size))
+            encrypted = self.encrypt(data)
+            self.assertEqual(len(encrypted), encrypted_size(size))
+            self.assertEqual(self.decrypt(encrypted), data, size)
+
+    def test_round_trip_writer(self):
+        data = bytes(range(256)) * (FRAME_SIZE // 256 + 1)
+        stream = io.BytesIO()
+        with EncryptingWriter(stream, PASSPHRASE) as writer:
+            for i in range(0, len(data), 10000):
+                writer.write(data[i:i + 10000])
+        self.assertEqual(self.decrypt(stream.getvalue()), data)
+
+    def test_chunk_boundaries(self):
+        data = b'x' * (FRAME_SIZE + 1)
+        for chunk_size in (1000, FRAME_SIZE - 1, FRAME_SIZE, FRAME_SIZE + 1):
+            self.assertEqual(self.decrypt(self.encrypt(data, chunk_size)),
+                             data)
+
+    def test_read_sizes(self):
+        data = b'0123456789' * (FRAME_SIZE // 5)
+        reader = decrypting_reader(io.BytesIO(self.encrypt(data)),
+                                   PASSPHRASE)
+        parts = iter(lambda: reader.read(777777), b'')
+        self.assertEqual(b''.join(parts), data)
+
+    def test_same_header(self):
+        data = b'y' * (FRAME_SIZE + 10)
+        encrypted = self.encrypt(data)
+        header = encrypted[:HEADER_SIZE]
+        self.assertEqual(self.encrypt(data, 4096, header), encrypted)
+        self.assertNotEqual(self.encrypt(data)[:HEADER_SIZE], header)
+
+    def test_plain_backup(self):
+        for data in (b'', b'PK', b'PK\x03\x04' + b'z' * HEADER_SIZE):
+            self.assertEqual(self.decrypt(data, passphrase=False), data)
+
+    def test_missing_passphrase(self):
+        with self.assertRaises(UserError):
+            self.decrypt(self.encrypt(b'data'), passphrase=False)
+
+    def test_wrong_passphrase(self):
+        with self.assertRaises(UserError):
+            self.decrypt(self.encrypt(b'data'), passphrase='wrong')
+
+    def test_truncated(self):
+        encrypted = self.encrypt(b'z' * (FRAME_SIZE + 1))
+        # the last frame, a byte of it, or every byte past the header
+        for size in (len(encrypted) - TAG_SIZE - 1, len(encrypted) - 1,
+                     HEADER_SIZE + FRAME_SIZE + TAG_SIZE, HEADER_SIZE):
+            with self.assertRaises(UserError, msg=size):
+                self.decrypt(encrypted[:size])
+
+    def test_reordered_frame(self):
+        data = b'a' * FRAME_SIZE + b'b' * FRAME_SIZE + b'c'
+        encrypted = self.encrypt(data)
+        frame = FRAME_SIZE + TAG_SIZE
+        first = encrypted[HEADER_SIZE:HEADER_SIZE + frame]
+        second = encrypted[HEADER_SIZE + frame:HEADER_SIZE + 2 * frame]
+        swapped = (encrypted[:HEADER_SIZE] + second + first +
+                   encrypted[HEADER_SIZE + 2 * frame:])
+        with self.assertRaises(UserError):
+            self.decrypt(swapped)
+        # nor can a frame be dropped
+        with self.assertRaises(UserError):
+            self.decrypt(encrypted[:HEADER_SIZE] + second +
+                         encrypted[HEADER_SIZE + 2 * frame:])
+
+    def test_tampered(self):
+        encrypted = bytearray(self.encrypt(b'data' * 100))
+        encrypted[HEADER_SIZE + 10] ^= 1
+        with self.assertRaises(UserError):
+            self.decrypt(bytes(encrypted))
+        # the header is authenticated as well
+        encrypted = bytearray(self.encrypt(b'data' * 100))
+        encrypted[HEADER_SIZE - 1] ^= 1
+        with self.assertRaises(UserError):
+            self.decrypt(bytes(encrypted))
@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+###############################################################################
+#
+#    Cybrosys Technologies Pvt. Ltd.
+#
+#    Copyright (C) 2023-TODAY Cybrosys Technologies(<https://www.cybrosys.com>)
+#    Author: Cybrosys Techno Solutions (odoo@cybrosys.com)
+#
+#    You can modify it under the terms of the GNU LESSER
+#    GENERAL PUBLIC LICENSE (LGPL v3), Version 3.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU LESSER GENERAL PUBLIC LICENSE (LGPL v3) for more details.
+#
+#    You should have received a copy of the GNU LESSER GENERAL PUBLIC LICENSE
+#    (LGPL v3) along with this program.
+#    If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+import contextlib
+import os
+import struct
+import time
+import zipfile
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+# Codecs compressing the whole archive, the zip entries are then stored
+ARCHIVE_CODECS = {'zstd': '.zst', 'lz4': '.lz4'}
+# Frames whose blocks are stored uncompressed, see RFC 8878 and the lz4
+# frame format: the header of a zstd frame with a 128 KiB window, the size
+# of a block and the header of a block without the last block flag
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd\x00\x38'
+ZSTD_BLOCK_SIZE = 128 * 1024
+LZ4_BLOCK_SIZE = 64 * 1024
+LZ4_STORED_BLOCK = 0x80000000
+COMPRESSED_EXTENSIONS = {
+    '.gz', '.tgz', '.bz2', '.xz', '.zst', '.lz4', '.zip', '.7z', '.rar',
+    '.jpg', '.jpeg', '.png', '.gif', '.webp', '.heic', '.mp3', '.mp4',
+    '.mov', '.avi', '.mkv', '.ogg', '.webm', '.docx', '.xlsx', '.pptx',
+    '.odt', '.ods', '.odp', '.pdf'}
+# Odoo filestore files have no extension, they are recognized by content
+COMPRESSED_SIGNATURES = (
+    b'\x1f\x8b', b'BZh', b'\xfd7zXZ\x00', b'\x28\xb5\x2f\xfd',
+    b'\x04\x22\x4d\x18', b'PK\x03\x04', b'7z\xbc\xaf\x27\x1c', b'Rar!',
+    b'\xff\xd8\xff', b'\x89PNG', b'GIF8', b'ID3', b'OggS', b'fLaC',
+    b'%PDF')
+
+
+def is_compressed(path):
+    """Whether the file at `path` is already compressed, judging from its
+    extension or, when it has none, from its first bytes"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension:
+        return extension in COMPRESSED_EXTENSIONS
+    with open(path, 'rb') as file:
+        header = file.read(12)
+    return header.startswith(COMPRESSED_SIGNATURES) or \
+        header[4:8] == b'ftyp' or \
+        header[:4] == b'RIFF' and header[8:12] in (b'WEBP', b'AVI ')
+
+
+def zip_compression(codec):
+    """Return the ``(compress_type, compresslevel)`` of the zip entries"""
+    if codec.startswith('deflate_'):
+        return zipfile.ZIP_DEFLATED, int(codec.split('_')[1])
+    return zipfile.ZIP_STORED, None
+
+
+def check_codec(codec):
+    """Raise ImportError if the library of `codec` is not installed"""
+    if codec == 'zstd' and not zstandard:
+        raise ImportError('The zstandard python library is not installed')
+    if codec == 'lz4' and not lz4_frame:
+        raise ImportError('The lz4 python library is not installed')
+
+
+class FrameWriter:
+    """Write-only file object compressing what is written into `stream`
+    with the zstd or lz4 `codec`, as a sequence of frames. While `stored`
+    is set, what is written goes into frames of uncompressed blocks, which
+    cost no compression time and are read back as they are.
+    `compression_time` is the time spent in the compressor."""
+
+    def __init__(self, codec, stream, threads=0):
+        self._codec = codec
+        self._stream = stream
+        self._threads = threads
+        self._compressor = None
+        self._stored_frame = False
+        self._position = 0
+        self.stored = False
+        self.compression_time = 0.0
+
+    def write(self, data):
+        if self.stored:
+            self._end_frame()
+            self._write_stored(data)
+        elif data:
+            self._end_stored_frame()
+            start = time.perf_counter()
+            if not self._compressor:
+                self._compressor, header = self._begin_frame()
+                self._stream.write(header)
+            self._stream.write(self._compressor.compress(data))
+            self.compression_time += time.perf_counter() - start
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        self._stream.flush()
+
+    def close(self):
+        self._end_frame()
+        self._end_stored_frame()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _begin_frame(self):
+        """Return a new compressor and the bytes starting its frame"""
+        if self._codec == 'zstd':
+            compressor = zstandard.ZstdCompressor(
+                level=3, threads=self._threads or -1).compressobj()
+            return compressor, b''
+        compressor = lz4_frame.LZ4FrameCompressor(
+            block_size=lz4_frame.BLOCKSIZE_MAX64KB)
+        return compressor, compressor.begin()
+
+    def _end_frame(self):
+        if self._compressor:
+            start = time.perf_counter()
+            if self._codec == 'zstd':
+                self._stream.write(self._compressor.flush(
+                    zstandard.COMPRESSOBJ_FLUSH_FINISH))
+            else:
+                self._stream.write(self._compressor.flush())
+            self.compression_time += time.perf_counter() - start
+            self._compressor = None
+
+    def _write_stored(self, data):
+        if not data:
+            return
+        if not self._stored_frame:
+            self._stream.write(
+                ZSTD_MAGIC if self._codec == 'zstd' else
+                lz4_frame.LZ4FrameCompressor(
+                    block_size=lz4_frame.BLOCKSIZE_MAX64KB).begin())
+            self._stored_frame = True
+        view = memoryview(data)
+        if self._codec == 'zstd':
+            for start in range(0, len(view), ZSTD_BLOCK_SIZE):
+                block = view[start:start + ZSTD_BLOCK_SIZE]
+                self._stream.write(struct.pack('<I', len(block) << 3)[:3])
+                self._stream.write(block)
+        else:
+            for start in range(0, len(view), LZ4_BLOCK_SIZE):
+                block = view[start:start + LZ4_BLOCK_SIZE]
+                self._stream.write(struct.pack(
+                    '<I', len(block) | LZ4_STORED_BLOCK))
+                self._stream.write(block)
+
+    def _end_stored_frame(self):
+        if self._stored_frame:
+            # An empty last block for zstd, the end mark for lz4
+            self._stream.write(b'\x01\x00\x00' if self._codec == 'zstd'
+                               else b'\x00\x00\x00\x00')
+            self._stored_frame = False
+
+
+def archive_writer(codec, stream, threads=0):
+    """Context manager returning a file object which writes into `stream`,
+    through a FrameWriter if `codec` compresses the whole archive.
+    `threads` is the number of zstd worker threads, 0 for one per core."""
+    check_codec(codec)
+    if codec in ARCHIVE_CODECS:
+        return FrameWriter(codec, stream, threads)
+    return contextlib.nullcontext(stream)
+
+
+@contextlib.contextmanager
+def stored_frames(zip_file):
+    """Context manager during which what is written into `zip_file` is not
+    compressed by the FrameWriter the archive is written through, if any"""
+    writer = zip_file.fp
+    if not isinstance(writer, FrameWriter):
+        yield
+        return
+    writer.stored = True
+    try:
+        yield
+    finally:
+        writer.stored = False
+
+
+def archive_reader(codec, stream):
+    """Context manager returning a file object which reads the archive
+    from `stream`, through the decompressor of `codec` if it compresses the
+    whole archive. The archive is made of several frames when it contains
+    already compressed files."""
+    check_codec(codec)
+    if codec == 'zstd':
+        return zstandard.ZstdDecompressor().stream_reader(
+            stream, read_across_frames=True, closefd=False)
+    if codec == 'lz4':
+        return lz4_frame.LZ4FrameFile(stream, mode='rb')
+    return contextlib.nullcontext(stream)
+
+
+def codec_from_name(name):
+    """Codec compressing the whole archive of the backup file `name`, None
+    when the archive itself is not compressed"""
+    for codec, extension in ARCHIVE_CODECS.items():
+        if name.endswith(extension):
+            return codec
+    return None
+
+
+def write_zip_file(zip_file, path, arcname, codec):
+    """Add the file at `path` to `zip_file`, already compressed files are
+    stored as they are instead of being compressed again, by the zip entry
+    or by the codec compressing the whole archive"""
+    compress_type, compresslevel = zip_compression(codec)
+    if not is_compressed(path):
+        zip_file.write(path, arcname, compress_type=compress_type,
+                       compresslevel=compresslevel)
+        return
+    with stored_frames(zip_file):
+        zip_file.write(path, arcname, compress_type=zipfile.ZIP_STORED)
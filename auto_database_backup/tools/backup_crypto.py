@@ -0,0 +1,285 @@
+# -*- coding: utf-8 -*-
+###############################################################################
+#
+#    Cybrosys Technologies Pvt. Ltd.
+#
+#    Copyright (C) 2023-TODAY Cybrosys Technologies(<https://www.cybrosys.com>)
+#    Author: Cybrosys Techno Solutions (odoo@cybrosys.com)
+#
+#    You can modify it under the terms of the GNU LESSER
+#    GENERAL PUBLIC LICENSE (LGPL v3), Version 3.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU LESSER GENERAL PUBLIC LICENSE (LGPL v3) for more details.
+#
+#    You should have received a copy of the GNU LESSER GENERAL PUBLIC LICENSE
+#    (LGPL v3) along with this program.
+#    If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+import functools
+import hashlib
+import hmac
+import os
+import struct
+
+from odoo import _
+from odoo.exceptions import UserError
+
+try:
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+except ImportError:
+    AESGCM = None
+
+MAGIC = b'ODOOBKE1'
+FRAME_SIZE = 1024 * 1024
+TAG_SIZE = 16
+SALT_SIZE = 16
+HEADER_FORMAT = '>8sI%ds%ds' % (SALT_SIZE, SALT_SIZE)
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+KDF_ITERATIONS = 600000
+# Salt of the passphrase keys derived by this process, the key of each file
+# comes from its own salt so that the slow derivation runs only once
+_process_salts = {}
+
+
+def check_encryption():
+    """Raise ImportError if the cryptography library is not installed"""
+    if not AESGCM:
+        raise ImportError('The cryptography python library is not installed')
+
+
+@functools.lru_cache(maxsize=16)
+def _passphrase_key(passphrase, salt):
+    return hashlib.pbkdf2_hmac('sha256', passphrase.encode(), salt,
+                               KDF_ITERATIONS)
+
+
+def _file_cipher(passphrase, salt, file_salt):
+    return AESGCM(hmac.new(_passphrase_key(passphrase, salt), file_salt,
+                           hashlib.sha256).digest())
+
+
+def _nonce(counter, is_last):
+    return struct.pack('>QI', counter, 1 if is_last else 0)
+
+
+class Encryptor:
+    """Encrypt a byte stream with `passphrase`, `header` comes first, then
+    what `update` and `finalize` return.
+
+    The header holds a magic string, the frame size, the salt of the key
+    derived from the passphrase and the salt of the key of the file. The
+    content follows in AES-256-GCM frames of `FRAME_SIZE` bytes, but the
+    last one which is shorter, possibly empty. The nonce of a frame is its
+    number with a flag set on the last frame, so that frames can neither be
+    reordered nor dropped, and every frame authenticates the header.
+    Given the `header` of a previous encryption, the same content is
+    encrypted to the same bytes again."""
+
+    def __init__(self, passphrase, header=None):
+        check_encryption()
+        if header:
+            _magic, _frame_size, salt, file_salt = struct.unpack(
+                HEADER_FORMAT, header)
+        else:
+            salt = _process_salts.setdefault(passphrase,
+                                             os.urandom(SALT_SIZE))
+            file_salt = os.urandom(SALT_SIZE)
+        self.header = struct.pack(HEADER_FORMAT, MAGIC, FRAME_SIZE, salt,
+                                  file_salt)
+        self._cipher = _file_cipher(passphrase, salt, file_salt)
+        self._buffer = bytearray()
+        self._counter = 0
+
+    def _frame(self, data, is_last):
+        frame = self._cipher.encrypt(_nonce(self._counter, is_last),
+                                     bytes(data), self.header)
+        self._counter += 1
+        return frame
+
+    def update(self, data):
+        view = memoryview(data)
+        frames = []
+        if self._buffer:
+            missing = FRAME_SIZE - len(self._buffer)
+            self._buffer += view[:missing]
+            view = view[missing:]
+            if len(self._buffer) < FRAME_SIZE:
+                return b''
+            frames.append(self._frame(self._buffer, False))
+            self._buffer = bytearray()
+        while len(view) >= FRAME_SIZE:
+            frames.append(self._frame(view[:FRAME_SIZE], False))
+            view = view[FRAME_SIZE:]
+        self._buffer += view
+        return b''.join(frames)
+
+    def finalize(self):
+        frame = self._frame(self._buffer, True)
+        self._buffer = bytearray()
+        return frame
+
+
+class EncryptedChunks:
+    """Iterator over the encryption of the byte chunks of `chunks`, closing
+    it closes `chunks`. `header` repeats a previous encryption."""
+
+    def __init__(self, chunks, passphrase, header=None):
+        self._chunks = iter(chunks)
+        self._encryptor = Encryptor(passphrase, header)
+        self.header = self._encryptor.header
+        self._pending = [self.header]
+        self._done = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        while not self._pending:
+            if self._done:
+                raise StopIteration
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                self._pending.append(self._encryptor.finalize())
+                self._done = True
+            else:
+                data = self._encryptor.update(chunk)
+                if data:
+                    self._pending.append(data)
+        return self._pending.pop(0)
+
+    def close(self):
+        close = getattr(self._chunks, 'close', None)
+        if close:
+            close()
+
+
+class EncryptingWriter:
+    """Write-only file object encrypting what is written into `stream`, the
+    last frame is written when it is closed, `stream` is left open"""
+
+    def __init__(self, stream, passphrase):
+        self._stream = stream
+        self._encryptor = Encryptor(passphrase)
+        self._closed = False
+        stream.write(self._encryptor.header)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        if exc_type is None:
+            self.close()
+
+    def write(self, data):
+        encrypted = self._encryptor.update(data)
+        if encrypted:
+            self._stream.write(encrypted)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._stream.write(self._encryptor.finalize())
+
+
+def encrypted_size(size):
+    """Size of the encryption of `size` bytes: the header, then the frames
+    of the content with a tag each, the last one possibly empty"""
+    return HEADER_SIZE + size + (size // FRAME_SIZE + 1) * TAG_SIZE
+
+
+def _read_exactly(stream, size):
+    parts = []
+    while size:
+        data = stream.read(size)
+        if not data:
+            break
+        parts.append(data)
+        size -= len(data)
+    return b''.join(parts)
+
+
+class DecryptingReader:
+    """Read-only file object over the decryption of the encrypted `stream`
+    whose `header` was already read"""
+
+    def __init__(self, stream, header, passphrase):
+        check_encryption()
+        _magic, self._frame_size, salt, file_salt = struct.unpack(
+            HEADER_FORMAT, header)
+        self._stream = stream
+        self._header = header
+        self._cipher = _file_cipher(passphrase, salt, file_salt)
+        self._counter = 0
+        self._pending = b''
+        self._done = False
+
+    def _next_frame(self):
+        frame = _read_exactly(self._stream, self._frame_size + TAG_SIZE)
+        is_last = len(frame) < self._frame_size + TAG_SIZE
+        try:
+            data = self._cipher.decrypt(_nonce(self._counter, is_last),
+                                        frame, self._header)
+        except Exception:
+            raise UserError(_("The backup is corrupted, truncated or was "
+                              "encrypted with another passphrase."))
+        self._counter += 1
+        self._done = is_last
+        return data
+
+    def read(self, size=-1):
+        while (size < 0 or len(self._pending) < size) and not self._done:
+            self._pending += self._next_frame()
+        if size < 0:
+            size = len(self._pending)
+        data, self._pending = self._pending[:size], self._pending[size:]
+        return data
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return False
+
+
+class _PrefixedReader:
+    """Read-only file object over `prefix` followed by `stream`"""
+
+    def __init__(self, prefix, stream):
+        self._prefix = prefix
+        self._stream = stream
+
+    def read(self, size=-1):
+        if not self._prefix:
+            return self._stream.read(size)
+        if size < 0:
+            data = self._prefix + self._stream.read()
+            self._prefix = b''
+            return data
+        data, self._prefix = self._prefix[:size], self._prefix[size:]
+        return data
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return False
+
+
+def decrypting_reader(stream, passphrase):
+    """Return a file object reading `stream` decrypted when it was encrypted
+    by this module, and as it is otherwise"""
+    header = _read_exactly(stream, HEADER_SIZE)
+    if not header.startswith(MAGIC):
+        return _PrefixedReader(header, stream)
+    if not passphrase:
+        raise UserError(_("The backup is encrypted, set the encryption "
+                          "passphrase of the configuration to restore it."))
+    return DecryptingReader(stream, header, passphrase)
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+###############################################################################
+#
+#    Cybrosys Technologies Pvt. Ltd.
+#
+#    Copyright (C) 2023-TODAY Cybrosys Technologies(<https://www.cybrosys.com>)
+#    Author: Cybrosys Techno Solutions (odoo@cybrosys.com)
+#
+#    You can modify it under the terms of the GNU LESSER
+#    GENERAL PUBLIC LICENSE (LGPL v3), Version 3.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU LESSER GENERAL PUBLIC LICENSE (LGPL v3) for more details.
+#
+#    You should have received a copy of the GNU LESSER GENERAL PUBLIC LICENSE
+#    (LGPL v3) along with this program.
+#    If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+import boto3
+import contextlib
+import hashlib
+import logging
+from boto3.s3.transfer import TransferConfig
+
+from ..backup_stream import BlockDigest
+from .base import BackupDriver, BackupEntry, register_driver
+
+_logger = logging.getLogger(__name__)
+
+# S3 multipart parts are at least 5 MiB, DeleteObjects takes 1000 keys
+S3_MIN_PART_SIZE = 5
+S3_DELETE_BATCH = 1000
+
+
+@register_driver
+class AmazonS3Driver(BackupDriver):
+    """Backups stored under a prefix of an S3 bucket"""
+
+    destination = 'amazon_s3'
+    label = 'Amazon S3'
+
+    @classmethod
+    def connection_key(cls, config):
+        return config.aws_endpoint_url, config.aws_access_key
+
+    @classmethod
+    def connect(cls, config):
+        return boto3.client(
+            's3',
+            aws_access_key_id=config.aws_access_key,
+            aws_secret_access_key=config.aws_secret_access_key,
+            endpoint_url=config.aws_endpoint_url or None)
+
+    @classmethod
+    def disconnect(cls, connection):
+        connection.close()
+
+    @property
+    def bucket(self):
+        return self.config.bucket_file_name
+
+    def _key(self, name):
+        return '%s/%s' % (self.config.aws_folder_name, name)
+
+    def prepare(self):
+        """Create the folder marker, unless an object already exists under
+        the prefix"""
+        if not self.connection.list_objects_v2(
+                Bucket=self.bucket, Prefix=self._key(''),
+                MaxKeys=1).get('KeyCount'):
+            self.connection.put_object(Bucket=self.bucket, Key=self._key(''))
+
+    @property
+    def part_size(self):
+        return max(self.config.aws_part_size, S3_MIN_PART_SIZE) * 1024 * 1024
+
+    def upload(self, name, stream):
+        """Multipart upload of `stream`, parts are read from it and sent by
+        several threads"""
+        part_size = self.part_size
+        self.connection.upload_fileobj(
+            stream, self.bucket, self._key(name),
+            Config=TransferConfig(
+                multipart_threshold=part_size, multipart_chunksize=part_size,
+                max_concurrency=max(self.config.aws_max_concurrency, 1)))
+
+    def stored_key(self, name, result):
+        return self._key(name)
+
+    def download(self, name):
+        return contextlib.closing(self.connection.get_object(
+            Bucket=self.bucket, Key=self._key(name))['Body'])
+
+    def digests(self):
+        return {'md5': hashlib.md5(),
+                'parts': BlockDigest(self.part_size, 'md5')}
+
+    def verify(self, name, result, digests, size):
+        """Compare with the size and the ETag of the object. Smaller objects
+        are sent in a single request and their ETag is their MD5, the ETag
+        of multipart ones is the MD5 of the MD5 of their parts. Objects
+        encrypted with KMS keys do not have such ETags."""
+        head = self.connection.head_object(Bucket=self.bucket,
+                                           Key=self._key(name))
+        self.check(name, 'size', size, head['ContentLength'])
+        if head.get('ServerSideEncryption') == 'aws:kms' or \
+                head.get('SSECustomerAlgorithm'):
+            return
+        if size < self.part_size:
+            expected = digests['md5'].hexdigest()
+        else:
+            parts = digests['parts']
+            expected = '%s-%s' % (parts.hexdigest(),
+                                  len(parts.block_digests()))
+        self.check(name, 'ETag', expected, head['ETag'].strip('"'))
+
+    def list(self):
+        """List the objects of the folder, page after page"""
+        paginator = self.connection.get_paginator('list_objects_v2')
+        return [BackupEntry(obj['Key'], obj['Key'],
+                            obj['LastModified'].replace(tzinfo=None),
+                            obj['Size'])
+                for page in paginator.paginate(Bucket=self.bucket,
+                                               Prefix=self._key(''))
+                for obj in page.get('Contents', [])]
+
+    def delete(self, keys):
+        """Delete the objects, 1000 keys per request, return the keys of
+        those which Amazon S3 did not delete"""
+        failed = []
+        for index in range(0, len(keys), S3_DELETE_BATCH):
+            response = self.connection.delete_objects(
+                Bucket=self.bucket,
+                Delete={'Objects': [{'Key': key} for key in
+                                    keys[index:index + S3_DELETE_BATCH]],
+                        'Quiet': True})
+            for error in response.get('Errors', []):
+                _logger.warning('Amazon S3 could not delete %s: %s',
+                                error['Key'], error['Message'])
+                failed.append(error['Key'])
+        return failed
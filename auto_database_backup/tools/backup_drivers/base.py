@@ -0,0 +1,397 @@
+# -*- coding: utf-8 -*-
+###############################################################################
+#
+#    Cybrosys Technologies Pvt. Ltd.
+#
+#    Copyright (C) 2023-TODAY Cybrosys Technologies(<https://www.cybrosys.com>)
+#    Author: Cybrosys Techno Solutions (odoo@cybrosys.com)
+#
+#    You can modify it under the terms of the GNU LESSER
+#    GENERAL PUBLIC LICENSE (LGPL v3), Version 3.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU LESSER GENERAL PUBLIC LICENSE (LGPL v3) for more details.
+#
+#    You should have received a copy of the GNU LESSER GENERAL PUBLIC LICENSE
+#    (LGPL v3) along with this program.
+#    If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+import contextlib
+import hashlib
+import logging
+import os
+import requests
+import time
+from collections import namedtuple
+from datetime import datetime, timezone
+
+from odoo import _
+from odoo.exceptions import UserError
+
+from ..backup_crypto import EncryptedChunks, encrypted_size
+from ..backup_stream import CHUNK_SIZE, ChunkedStream, DigestReader, \
+    Throttle, ThrottledReader, iter_chunks, skip
+
+_logger = logging.getLogger(__name__)
+
+# Attempts for each chunk of a resumable upload before giving up
+UPLOAD_RETRIES = 5
+
+# A backup found on a destination, `created` is a naive UTC datetime,
+# `key` is what `BackupDriver.delete` expects to remove it and `size` is in
+# bytes, None when the listing does not give it
+BackupEntry = namedtuple('BackupEntry', ['name', 'key', 'created', 'size'],
+                         defaults=[None])
+
+_drivers = {}
+
+
+class UploadSessionLost(Exception):
+    """The destination no longer has the upload session to resume"""
+
+
+def register_driver(driver_class):
+    """Class decorator registering a driver for its `destination`"""
+    _drivers[driver_class.destination] = driver_class
+    return driver_class
+
+
+def get_driver(destination):
+    """Return the driver class of the backup destination `destination`"""
+    return _drivers[destination]
+
+
+def utc_from_timestamp(timestamp):
+    """Naive UTC datetime of a POSIX timestamp"""
+    return datetime.fromtimestamp(timestamp, timezone.utc).replace(
+        tzinfo=None)
+
+
+class BackupDriver:
+    """A backup destination.
+
+    Connections are opened by the class with `connect` and shared, through
+    a `DriverPool`, by every configuration with the same `connection_key`
+    during a backup run. A driver instance binds one configuration to such
+    a connection. File names given to the driver are relative to the backup
+    folder of the configuration and may contain a sub folder."""
+
+    destination = None
+    label = None
+    # Errors after which a ranged upload is resumed instead of failing
+    transient_errors = (requests.ConnectionError, requests.Timeout)
+    # Whether `upload` resumes the upload described by `session`
+    resumable = False
+    # Whether `upload` needs the size of the stream beforehand, given in
+    # `upload_size`. Backups to such a destination are staged, not streamed.
+    requires_size = False
+
+    def __init__(self, config, connection):
+        self.config = config
+        self.connection = connection
+        # SHA-256, `BackupEntry.key` and size of the last backup uploaded
+        # by `upload_backup`
+        self.checksum = None
+        self.key = None
+        self.size = None
+        # State of the upload of a staged backup: the `offset` of the bytes
+        # the destination acknowledged, the encryption `header` and what the
+        # driver needs to resume it. `on_session(session)` persists it.
+        self.session = None
+        self.on_session = None
+        # Size of the stream `upload` is called with, when it is known
+        self.upload_size = None
+
+    @classmethod
+    def connection_key(cls, config):
+        """Configurations with equal keys share the same connection"""
+        return config.id
+
+    @classmethod
+    def connect(cls, config):
+        """Open and return the connection used by the drivers"""
+        return None
+
+    @classmethod
+    def disconnect(cls, connection):
+        """Close a connection returned by `connect`"""
+
+    def prepare(self):
+        """Create the backup folder if it does not exist yet"""
+
+    def make_folder(self, name):
+        """Create the sub folder `name` of the backup folder if it is
+        missing"""
+
+    def upload(self, name, stream):
+        """Store the content of the file object `stream` as `name`"""
+        raise NotImplementedError()
+
+    def download(self, name):
+        """Context manager returning a readable file object over the file
+        `name`, read sequentially while it is downloaded"""
+        raise NotImplementedError()
+
+    @staticmethod
+    @contextlib.contextmanager
+    def response_stream(response):
+        """Yield the body of the streamed `requests` `response`"""
+        with response:
+            response.raise_for_status()
+            response.raw.decode_content = True
+            yield response.raw
+
+    def store_backup(self, name, options):
+        """Dump the database of the configuration with the dump_data
+        `options` and store it as `name`"""
+        with self.config._backup_source(options) as source:
+            self.upload_backup(name, source)
+
+    def upload_backup(self, name, stream):
+        """Upload the backup `stream` as `name`, hashing it on the way, then
+        check that the destination stored the same content"""
+        digests = dict(self.digests(), sha256=hashlib.sha256())
+        reader = DigestReader(self.throttle(self.encrypt(stream)),
+                              digests.values())
+        result = self.upload(name, reader)
+        self.verify(name, result, digests, reader.tell())
+        self.checksum = digests['sha256'].hexdigest()
+        self.key = self.stored_key(name, result)
+        self.size = reader.tell()
+
+    def upload_staged(self, name, path):
+        """Upload the backup staged in the file at `path` as `name`, like
+        `upload_backup`. With the `session` of an interrupted upload, the
+        file is encrypted again with the same header and the part the
+        destination acknowledged is only read to hash it: a resumable
+        driver carries on from there, the others start over."""
+        session = self.session if self.resumable else None
+        try:
+            self._upload_staged(name, path, session)
+        except UploadSessionLost:
+            if not session:
+                raise
+            _logger.info('%s upload session of %s lost, starting over',
+                         self.label, name)
+            self.session = None
+            self._upload_staged(name, path, None)
+
+    def _upload_staged(self, name, path, session):
+        """Upload the staged backup at `path`, resuming `session` if set"""
+        digests = dict(self.digests(), sha256=hashlib.sha256())
+        offset = session.get('offset', 0) if session else 0
+        with open(path, 'rb') as file:
+            stream = file
+            header = session.get('header') if session else None
+            if self.config.backup_encryption:
+                chunks = EncryptedChunks(
+                    iter(lambda: file.read(CHUNK_SIZE), b''),
+                    self.config.encryption_passphrase,
+                    header and bytes.fromhex(header))
+                stream = ChunkedStream(chunks)
+                header = chunks.header.hex()
+            reader = DigestReader(stream, digests.values())
+            skip(reader, offset)
+            self.session = dict(session or {}, offset=offset, header=header)
+            self.upload_size = self.stored_size(os.path.getsize(path))
+            try:
+                result = self.upload(name, self.throttle(reader))
+            finally:
+                self.upload_size = None
+            self.verify(name, result, digests, reader.tell())
+        self.checksum = digests['sha256'].hexdigest()
+        self.key = self.stored_key(name, result)
+        self.size = reader.tell()
+        self.session = None
+
+    def save_session(self, **values):
+        """Update the `session` of the staged backup being uploaded with
+        `values` and persist it. Other uploads have no session."""
+        if self.session is None:
+            return
+        self.session = dict(self.session, **values)
+        if self.on_session:
+            self.on_session(self.session)
+
+    def put(self, name, stream):
+        """Upload the file object `stream` as `name`, encrypted and paced
+        like the backups, and return its `BackupEntry.key`. `stream` is
+        seekable when the driver `requires_size`."""
+        if self.requires_size:
+            position = stream.tell()
+            self.upload_size = self.stored_size(
+                stream.seek(0, os.SEEK_END) - position)
+            stream.seek(position)
+        try:
+            result = self.upload(name, self.throttle(self.encrypt(stream)))
+        finally:
+            self.upload_size = None
+        return self.stored_key(name, result)
+
+    def stored_size(self, size):
+        """Size of `size` bytes once stored, encrypted when the backups of
+        the configuration are"""
+        if not self.config.backup_encryption:
+            return size
+        return encrypted_size(size)
+
+    def stored_key(self, name, result):
+        """`BackupEntry.key` of the file just uploaded as `name`, `result`
+        is what `upload` returned"""
+        raise NotImplementedError()
+
+    def encrypt(self, stream):
+        """Return `stream` encrypted with the passphrase of the
+        configuration, when its backups are encrypted"""
+        if not self.config.backup_encryption:
+            return stream
+        return ChunkedStream(EncryptedChunks(
+            iter(lambda: stream.read(CHUNK_SIZE), b''),
+            self.config.encryption_passphrase))
+
+    def throttle(self, stream):
+        """Return `stream` read no faster than the upload limit of the
+        configuration"""
+        if not self.config.upload_bandwidth:
+            return stream
+        return ThrottledReader(stream, Throttle(
+            self.config.upload_bandwidth * 1024 * 1024))
+
+    def digests(self):
+        """Hash objects, by name, computed on the uploaded backup for the
+        checks of `verify`. A SHA-256 is always computed."""
+        return {}
+
+    def verify(self, name, result, digests, size):
+        """Raise when the file stored as `name` does not match the `size`
+        bytes and the `digests` of the uploaded backup. `result` is what
+        `upload` returned."""
+
+    def check(self, name, what, expected, stored):
+        """Raise a UserError if the `stored` value of `name` is not the
+        `expected` one"""
+        if expected != stored:
+            raise UserError(_(
+                "%(destination)s stored %(name)s with a different %(what)s "
+                "(%(stored)s instead of %(expected)s).",
+                destination=self.label, name=name, what=what, stored=stored,
+                expected=expected))
+
+    def list(self):
+        """Return the `BackupEntry` of the files of the backup folder"""
+        raise NotImplementedError()
+
+    def delete(self, keys):
+        """Delete the files of `keys`, taken from `BackupEntry.key`. Return
+        the keys which could not be deleted when the destination reports
+        them one by one, the catalog keeps their records."""
+        raise NotImplementedError()
+
+    @staticmethod
+    def content_range(offset, data, is_last, total=None):
+        """Content-Range header of a chunk in a ranged upload of `total`
+        bytes. Without `total`, the total size is only given with the last
+        chunk."""
+        end = offset + len(data)
+        if total is None:
+            total = end if is_last else '*'
+        return 'bytes %d-%d/%s' % (offset, end - 1, total)
+
+    def upload_ranges(self, source, chunk_size, send, resume, offset=0,
+                      checkpoint=None):
+        """Send `source` in ranges of `chunk_size` bytes, read while they
+        are sent, the first one at `offset`. `send(offset, data, is_last)`
+        sends a range and returns False when the destination asks to try
+        again. After a failure `resume(end, is_last)` returns the offset the
+        destination expects next, or None if it has everything, and the
+        range is sent again from there. `checkpoint(end)` is called once a
+        range is stored."""
+        for start, data, is_last in iter_chunks(source, chunk_size, offset):
+            self._send_range(start, data, is_last, send, resume)
+            if checkpoint and not is_last:
+                checkpoint(start + len(data))
+
+    def _send_range(self, offset, data, is_last, send, resume):
+        """Send one range of `upload_ranges`, retrying it with a growing
+        delay. Only the current range is kept, so the destination must not
+        have lost bytes before it."""
+        end = offset + len(data)
+        sent = offset
+        for attempt in range(UPLOAD_RETRIES):
+            try:
+                if send(sent, data[sent - offset:], is_last):
+                    return
+            except self.transient_errors as error:
+                _logger.info('%s upload interrupted: %s', self.label, error)
+            time.sleep(2 ** attempt)
+            try:
+                sent = resume(end, is_last)
+            except self.transient_errors:
+                continue
+            if sent is None or sent >= end:
+                return
+            if sent < offset:
+                raise UserError(_("%s lost a part of the upload which is no "
+                                  "longer available.", self.label))
+        raise UserError(_("%s upload failed after %s attempts.", self.label,
+                          UPLOAD_RETRIES))
+
+
+class DriverPool:
+    """Connections opened during a backup run, shared by configurations
+    using the same destination and credentials"""
+
+    def __init__(self):
+        self._connections = {}
+        self._private = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @staticmethod
+    def key(config):
+        """Key of the connection used by `config`"""
+        driver_class = get_driver(config.backup_destination)
+        return driver_class, driver_class.connection_key(config)
+
+    def driver(self, config, private=False):
+        """Return the driver of `config`, connected. A `private` driver gets
+        its own connection, for uploads running at the same time as another
+        one on the shared connection."""
+        key = self.key(config)
+        if private:
+            connection = key[0].connect(config)
+            self._private.append((key[0], connection))
+            return key[0](config, connection)
+        if key not in self._connections:
+            self._connections[key] = key[0].connect(config)
+        return key[0](config, self._connections[key])
+
+    def discard(self, config):
+        """Close the connection of `config` after a failure, the next
+        configuration using it opens a new one"""
+        key = self.key(config)
+        if key in self._connections:
+            self._disconnect(key[0], self._connections.pop(key))
+
+    def close(self):
+        """Close every connection of the pool"""
+        while self._connections:
+            (driver_class, _key), connection = self._connections.popitem()
+            self._disconnect(driver_class, connection)
+        while self._private:
+            self._disconnect(*self._private.pop())
+
+    @staticmethod
+    def _disconnect(driver_class, connection):
+        try:
+            driver_class.disconnect(connection)
+        except Exception as error:
+            _logger.info('%s disconnection failed: %s', driver_class.label,
+                         error)
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+###############################################################################
+#
+#    Cybrosys Technologies Pvt. Ltd.
+#
+#    Copyright (C) 2023-TODAY Cybrosys Technologies(<https://www.cybrosys.com>)
+#    Author: Cybrosys Techno Solutions (odoo@cybrosys.com)
+#
+#    You can modify it under the terms of the GNU LESSER
+#    GENERAL PUBLIC LICENSE (LGPL v3), Version 3.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU LESSER GENERAL PUBLIC LICENSE (LGPL v3) for more details.
+#
+#    You should have received a copy of the GNU LESSER GENERAL PUBLIC LICENSE
+#    (LGPL v3) along with this program.
+#    If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+import dropbox
+import logging
+import time
+
+from odoo import _
+from odoo.exceptions import UserError
+
+from ..backup_stream import BlockDigest, iter_chunks
+from .base import BackupDriver, BackupEntry, register_driver
+
+_logger = logging.getLogger(__name__)
+
+DROPBOX_CHUNK_SIZE = 8 * 1024 * 1024
+# Dropbox deletes at most 1000 entries per batch job
+DROPBOX_BATCH_SIZE = 1000
+# Block size of the Dropbox content hash
+DROPBOX_HASH_BLOCK_SIZE = 4 * 1024 * 1024
+
+
+@register_driver
+class DropboxDriver(BackupDriver):
+    """Backups stored in a Dropbox folder"""
+
+    destination = 'dropbox'
+    label = 'Dropbox'
+
+    @classmethod
+    def connect(cls, config):
+        return dropbox.Dropbox(
+            app_key=config.dropbox_client_key,
+            app_secret=config.dropbox_client_secret,
+            oauth2_refresh_token=config.dropbox_refresh_token)
+
+    @classmethod
+    def disconnect(cls, connection):
+        connection.close()
+
+    def _path(self, name):
+        return self.config.dropbox_folder + '/' + name
+
+    def upload(self, name, stream):
+        """Upload `stream` in an upload session, one chunk at a time, so
+        that the backup is never fully loaded in memory, or in a single
+        request when it fits in one chunk or is empty. Returns the metadata
+        of the stored file."""
+        dbx = self.connection
+        path = self._path(name)
+        cursor = None
+        for offset, data, is_last in iter_chunks(stream, DROPBOX_CHUNK_SIZE):
+            if cursor is None and is_last:
+                return dbx.files_upload(data, path)
+            elif cursor is None:
+                session = dbx.files_upload_session_start(data)
+                cursor = dropbox.files.UploadSessionCursor(
+                    session_id=session.session_id, offset=len(data))
+            elif is_last:
+                return dbx.files_upload_session_finish(
+                    data, cursor, dropbox.files.CommitInfo(path=path))
+            else:
+                dbx.files_upload_session_append_v2(data, cursor)
+                cursor.offset += len(data)
+        # An empty stream has no chunk
+        return dbx.files_upload(b'', path)
+
+    def stored_key(self, name, result):
+        return result.path_lower
+
+    def download(self, name):
+        _metadata, response = self.connection.files_download(self._path(name))
+        return self.response_stream(response)
+
+    def digests(self):
+        return {'content_hash': BlockDigest(DROPBOX_HASH_BLOCK_SIZE)}
+
+    def verify(self, name, result, digests, size):
+        """Compare with the size and the content hash computed by Dropbox"""
+        self.check(name, 'size', size, result.size)
+        self.check(name, 'content hash', digests['content_hash'].hexdigest(),
+                   result.content_hash)
+
+    def list(self):
+        """List the files of the backup folder, following the cursor of the
+        listing until every page is read"""
+        dbx = self.connection
+        result = dbx.files_list_folder(self.config.dropbox_folder)
+        entries = []
+        while True:
+            entries += [BackupEntry(entry.name, entry.path_lower,
+                                    entry.client_modified, entry.size)
+                        for entry in result.entries
+                        if isinstance(entry, dropbox.files.FileMetadata)]
+            if not result.has_more:
+                return entries
+            result = dbx.files_list_folder_continue(result.cursor)
+
+    def delete(self, keys):
+        """Delete the files with batch delete jobs. Dropbox answers a batch
+        with its result, or with a job which is polled until it ends."""
+        dbx = self.connection
+        for index in range(0, len(keys), DROPBOX_BATCH_SIZE):
+            job = dbx.files_delete_batch([
+                dropbox.files.DeleteArg(path)
+                for path in keys[index:index + DROPBOX_BATCH_SIZE]])
+            if job.is_async_job_id():
+                job_id = job.get_async_job_id()
+                job = dbx.files_delete_batch_check(job_id)
+                while job.is_in_progress():
+                    time.sleep(1)
+                    job = dbx.files_delete_batch_check(job_id)
+                if job.is_failed():
+                    raise UserError(_("Dropbox could not delete the expired "
+                                      "backups: %s", job.get_failed()))
+            if job.is_other():
+                raise UserError(_("Dropbox could not delete the expired "
+                                  "backups."))
+            for entry in job.get_complete().entries:
+                if entry.is_failure():
+                    _logger.warning('Dropbox could not delete a backup: %s',
+                                    entry.get_failure())
@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+###############################################################################
+#
+#    Cybrosys Technologies Pvt. Ltd.
+#
+#    Copyright (C) 2023-TODAY Cybrosys Technologies(<https://www.cybrosys.com>)
+#    Author: Cybrosys Techno Solutions (odoo@cybrosys.com)
+#
+#    You can modify it under the terms of the GNU LESSER
+#    GENERAL PUBLIC LICENSE (LGPL v3), Version 3.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU LESSER GENERAL PUBLIC LICENSE (LGPL v3) for more details.
+#
+#    You should have received a copy of the GNU LESSER GENERAL PUBLIC LICENSE
+#    (LGPL v3) along with this program.
+#    If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+import contextlib
+import ftplib
+import logging
+import posixpath
+import ssl
+import time
+from datetime import datetime
+
+from odoo import _
+from odoo.exceptions import UserError
+
+from ..backup_stream import CHUNK_SIZE, ReplayReader, skip
+from .base import UPLOAD_RETRIES, BackupDriver, BackupEntry, \
+    UploadSessionLost, register_driver
+
+_logger = logging.getLogger(__name__)
+
+# Bytes kept once sent, an upload goes on after a dropped connection if the
+# server stored at least up to the first of them
+FTP_RESEND_SIZE = 32 * 1024 * 1024
+# Seconds without traffic after which the connection is considered lost
+FTP_TIMEOUT = 120
+
+
+@register_driver
+class FtpDriver(BackupDriver):
+    """Backups stored on an FTP server"""
+
+    destination = 'ftp'
+    label = 'FTP'
+    transient_errors = (OSError, EOFError, ftplib.error_temp)
+    resumable = True
+
+    @classmethod
+    def connection_key(cls, config):
+        return (config.ftp_host, config.ftp_port, config.ftp_user,
+                config.ftp_tls, config.ftp_passive)
+
+    @classmethod
+    def connect(cls, config):
+        if config.ftp_tls:
+            ftp_server = ftplib.FTP_TLS(
+                context=ssl.create_default_context(), timeout=FTP_TIMEOUT)
+        else:
+            ftp_server = ftplib.FTP(timeout=FTP_TIMEOUT)
+        try:
+            cls._login(ftp_server, config)
+        except Exception:
+            ftp_server.close()
+            raise
+        return ftp_server
+
+    @staticmethod
+    def _login(ftp_server, config):
+        """Connect `ftp_server` and log in with the settings of `config`.
+        Over FTPS the data connections are encrypted too."""
+        ftp_server.connect(config.ftp_host, int(config.ftp_port))
+        ftp_server.login(config.ftp_user, config.ftp_password)
+        ftp_server.encoding = "utf-8"
+        ftp_server.set_pasv(config.ftp_passive)
+        if config.ftp_tls:
+            ftp_server.prot_p()
+
+    @classmethod
+    def disconnect(cls, connection):
+        connection.quit()
+
+    def _path(self, name):
+        return posixpath.join(self.config.ftp_path, name)
+
+    def prepare(self):
+        self.make_folder('')
+
+    def make_folder(self, name):
+        try:
+            self.connection.mkd(self._path(name))
+        except ftplib.error_perm:
+            pass
+
+    def upload(self, name, stream):
+        """Send `stream` with a single STOR. When the connection drops, it
+        is opened again and the upload goes on from the size the server
+        stored, restarted there with REST, or appended with APPE on servers
+        which refuse REST before STOR. The last FTP_RESEND_SIZE bytes sent
+        are kept for that. A staged backup resumes the same way at a later
+        attempt, its session only records that the upload started."""
+        path = self._path(name)
+        offset = 0
+        if self.session is not None:
+            offset = self.session.get('offset', 0)
+            if self.session.get('started'):
+                try:
+                    self.connection.voidcmd('TYPE I')
+                    stored = self.connection.size(path)
+                except ftplib.error_perm as error:
+                    raise UploadSessionLost() from error
+                if stored < offset:
+                    raise UploadSessionLost()
+                skip(stream, stored - offset)
+                offset = stored
+            else:
+                self.save_session(started=True)
+        reader = ReplayReader(stream, offset, FTP_RESEND_SIZE)
+        for attempt in range(UPLOAD_RETRIES):
+            try:
+                self._store(path, reader)
+                return
+            except self.transient_errors as error:
+                _logger.info('FTP upload interrupted: %s', error)
+            time.sleep(2 ** attempt)
+            try:
+                self.connection.close()
+                self._login(self.connection, self.config)
+                self.connection.voidcmd('TYPE I')
+                stored = self.connection.size(path)
+            except self.transient_errors:
+                continue
+            if not reader.seek(stored):
+                raise UserError(_("%s lost a part of the upload which is no "
+                                  "longer available.", self.label))
+        raise UserError(_("%s upload failed after %s attempts.", self.label,
+                          UPLOAD_RETRIES))
+
+    def _store(self, path, reader):
+        """Send what remains of `reader` into the file `path`, which holds
+        the bytes before its position"""
+        ftp_server = self.connection
+        ftp_server.voidcmd('TYPE I')
+        offset = reader.tell()
+        if not offset:
+            conn = ftp_server.transfercmd('STOR %s' % path)
+        else:
+            try:
+                conn = ftp_server.transfercmd('STOR %s' % path, offset)
+            except ftplib.error_perm:
+                # Restarting a STOR is off by default on ProFTPD
+                conn = ftp_server.transfercmd('APPE %s' % path)
+        with conn:
+            for data in iter(lambda: reader.read(CHUNK_SIZE), b''):
+                conn.sendall(data)
+            if isinstance(conn, ssl.SSLSocket):
+                conn.unwrap()
+        ftp_server.voidresp()
+
+    def stored_key(self, name, result):
+        return self._path(name)
+
+    @contextlib.contextmanager
+    def download(self, name):
+        self.connection.voidcmd('TYPE I')
+        with self.connection.transfercmd('RETR %s' % self._path(name)) as \
+                conn, conn.makefile('rb') as file:
+            yield file
+        self.connection.voidresp()
+
+    def verify(self, name, result, digests, size):
+        self.connection.voidcmd('TYPE I')
+        self.check(name, 'size', size, self.connection.size(self._path(name)))
+
+    def list(self):
+        """List the files of the folder with a single MLSD, or with an MDTM
+        per file on servers without it"""
+        try:
+            return [BackupEntry(
+                name, self._path(name),
+                datetime.strptime(facts['modify'][:14], "%Y%m%d%H%M%S"),
+                int(facts['size']) if 'size' in facts else None)
+                for name, facts in self.connection.mlsd(
+                    self.config.ftp_path, ['type', 'size', 'modify'])
+                if facts.get('type') == 'file']
+        except ftplib.error_perm:
+            pass
+        entries = []
+        for name in self.connection.nlst(self.config.ftp_path):
+            path = self._path(posixpath.basename(name))
+            entries.append(BackupEntry(
+                posixpath.basename(name), path, datetime.strptime(
+                    self.connection.sendcmd('MDTM ' + path)[4:18],
+                    "%Y%m%d%H%M%S")))
+        return entries
+
+    def delete(self, keys):
+        for path in keys:
+            self.connection.delete(path)
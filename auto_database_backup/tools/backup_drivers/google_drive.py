@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+###############################################################################
+#
+#    Cybrosys Technologies Pvt. Ltd.
+#
+#    Copyright (C) 2023-TODAY Cybrosys Technologies(<https://www.cybrosys.com>)
+#    Author: Cybrosys Techno Solutions (odoo@cybrosys.com)
+#
+#    You can modify it under the terms of the GNU LESSER
+#    GENERAL PUBLIC LICENSE (LGPL v3), Version 3.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU LESSER GENERAL PUBLIC LICENSE (LGPL v3) for more details.
+#
+#    You should have received a copy of the GNU LESSER GENERAL PUBLIC LICENSE
+#    (LGPL v3) along with this program.
+#    If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+import hashlib
+import json
+import logging
+import posixpath
+import re
+import requests
+import uuid
+from datetime import datetime
+
+from odoo import fields, _
+from odoo.exceptions import UserError
+
+from ..backup_stream import CHUNK_SIZE, skip
+from .base import BackupDriver, BackupEntry, UploadSessionLost, \
+    register_driver
+
+_logger = logging.getLogger(__name__)
+
+GOOGLE_API_BASE_URL = 'https://www.googleapis.com'
+# Ranged uploads must use multiples of 256 KiB
+GDRIVE_CHUNK_SIZE = 32 * 256 * 1024
+# Google Drive batch requests hold at most 100 calls
+GDRIVE_BATCH_SIZE = 100
+
+
+@register_driver
+class GoogleDriveDriver(BackupDriver):
+    """Backups stored in a Google Drive folder, the connection is the
+    authorization header of the configuration"""
+
+    destination = 'google_drive'
+    resumable = True
+    label = 'Google Drive'
+
+    def __init__(self, config, connection):
+        super().__init__(config, connection)
+        self._folders = {'': config.google_drive_folder_key}
+
+    @classmethod
+    def connect(cls, config):
+        if config.gdrive_token_validity <= fields.Datetime.now():
+            config.generate_gdrive_refresh_token()
+        return {"Authorization": "Bearer %s" % config.gdrive_access_token}
+
+    def make_folder(self, name):
+        """Find the sub folder `name` of the backup folder, it is created if
+        it does not exist yet"""
+        query = "name = '%s' and '%s' in parents and trashed = false and " \
+                "mimeType = 'application/vnd.google-apps.folder'" % (
+                    name, self.config.google_drive_folder_key)
+        response = requests.get(GOOGLE_API_BASE_URL + "/drive/v3/files",
+                                params={'q': query, 'fields': 'files(id)'},
+                                headers=self.connection)
+        response.raise_for_status()
+        folders = response.json()['files']
+        if folders:
+            self._folders[name] = folders[0]['id']
+            return
+        response = requests.post(
+            GOOGLE_API_BASE_URL + "/drive/v3/files", json={
+                'name': name,
+                'mimeType': 'application/vnd.google-apps.folder',
+                'parents': [self.config.google_drive_folder_key],
+            }, headers=self.connection)
+        response.raise_for_status()
+        self._folders[name] = response.json()['id']
+
+    def upload(self, name, stream):
+        """Upload `stream` in a resumable session, in chunks sent while it
+        is being read. When the connection drops, Drive is asked how many
+        bytes it received and the upload continues from there. The session
+        is saved after every chunk, so that a later attempt resumes it."""
+        folder, name = posixpath.split(name)
+        offset = (self.session or {}).get('offset', 0)
+        upload_url = (self.session or {}).get('url')
+        if not upload_url:
+            session = requests.post(
+                GOOGLE_API_BASE_URL +
+                "/upload/drive/v3/files?uploadType=resumable"
+                "&fields=id,size,md5Checksum",
+                headers=dict(self.connection, **{
+                    'Content-Type': 'application/json; charset=UTF-8'}),
+                data=json.dumps({"name": name,
+                                 "parents": [self._folders[folder]]}))
+            session.raise_for_status()
+            upload_url = session.headers['Location']
+            self.save_session(url=upload_url)
+        uploaded = {}
+
+        def send(offset, data, is_last):
+            response = requests.put(upload_url, data=data, headers={
+                'Content-Range': self.content_range(offset, data, is_last)})
+            if response.status_code >= 500:
+                return False
+            if is_last or response.status_code != 308:
+                response.raise_for_status()
+                uploaded.update(response.json())
+            return True
+
+        def resume(end, is_last):
+            # Ask for the bytes already stored to resume after them
+            status = requests.put(upload_url, headers={
+                'Content-Range': 'bytes */%s' % (end if is_last else '*')})
+            if status.status_code in (200, 201):
+                uploaded.update(status.json())
+                return None
+            if status.status_code != 308:
+                status.raise_for_status()
+            received = status.headers.get('Range')
+            return int(received.split('-')[1]) + 1 if received else 0
+
+        if offset:
+            try:
+                received = resume(offset, False)
+            except requests.HTTPError as error:
+                raise UploadSessionLost() from error
+            if received is None:
+                # Completed before the interruption, only hash the rest
+                while stream.read(CHUNK_SIZE):
+                    pass
+                return uploaded
+            if received < offset:
+                raise UploadSessionLost()
+            skip(stream, received - offset)
+            offset = received
+        self.upload_ranges(stream, GDRIVE_CHUNK_SIZE, send, resume, offset,
+                           lambda end: self.save_session(offset=end))
+        return uploaded
+
+    def stored_key(self, name, result):
+        return result['id']
+
+    def download(self, name):
+        folder, name = posixpath.split(name)
+        if folder not in self._folders:
+            self.make_folder(folder)
+        query = "name = '%s' and '%s' in parents and trashed = false" % (
+            name, self._folders[folder])
+        response = requests.get(GOOGLE_API_BASE_URL + "/drive/v3/files",
+                                params={'q': query, 'fields': 'files(id)'},
+                                headers=self.connection)
+        response.raise_for_status()
+        files = response.json()['files']
+        if not files:
+            raise UserError(_("%s was not found on Google Drive.", name))
+        return self.response_stream(requests.get(
+            GOOGLE_API_BASE_URL + "/drive/v3/files/%s" % files[0]['id'],
+            params={'alt': 'media'}, headers=self.connection, stream=True))
+
+    def digests(self):
+        return {'md5': hashlib.md5()}
+
+    def verify(self, name, result, digests, size):
+        """Compare with the size and the MD5 computed by Drive"""
+        self.check(name, 'size', size, int(result.get('size', -1)))
+        self.check(name, 'MD5', digests['md5'].hexdigest(),
+                   result.get('md5Checksum'))
+
+    def list(self):
+        """List the backup folder, a page of 1000 files per request"""
+        params = {
+            'q': "'%s' in parents and trashed = false" %
+                 self.config.google_drive_folder_key,
+            'fields': 'nextPageToken, files(id, name, createdTime, size)',
+            'pageSize': 1000,
+        }
+        entries = []
+        while True:
+            response = requests.get(GOOGLE_API_BASE_URL + "/drive/v3/files",
+                                    params=params, headers=self.connection)
+            response.raise_for_status()
+            result = response.json()
+            entries += [BackupEntry(file['name'], file['id'], datetime.strptime(
+                file['createdTime'][:19], '%Y-%m-%dT%H:%M:%S'),
+                int(file.get('size', 0)))
+                for file in result.get('files', [])]
+            if not result.get('nextPageToken'):
+                return entries
+            params['pageToken'] = result['nextPageToken']
+
+    def delete(self, keys):
+        """Delete the files in batch requests"""
+        for index in range(0, len(keys), GDRIVE_BATCH_SIZE):
+            boundary = 'batch_%s' % uuid.uuid4().hex
+            body = ''.join(
+                '--%s\r\nContent-Type: application/http\r\n'
+                'Content-ID: <%s>\r\n\r\nDELETE /drive/v3/files/%s\r\n\r\n'
+                % (boundary, file_id, file_id)
+                for file_id in keys[index:index + GDRIVE_BATCH_SIZE])
+            response = requests.post(
+                GOOGLE_API_BASE_URL + "/batch/drive/v3",
+                data=body + '--%s--\r\n' % boundary,
+                headers=dict(self.connection, **{
+                    'Content-Type': 'multipart/mixed; boundary=%s' %
+                                    boundary}))
+            response.raise_for_status()
+            failed = re.findall(r'HTTP/1\.1 ([45]\d\d)', response.text)
+            if failed:
+                _logger.warning('Google Drive could not delete %s backups: %s',
+                                len(failed), ', '.join(failed))
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+###############################################################################
+#
+#    Cybrosys Technologies Pvt. Ltd.
+#
+#    Copyright (C) 2023-TODAY Cybrosys Technologies(<https://www.cybrosys.com>)
+#    Author: Cybrosys Techno Solutions (odoo@cybrosys.com)
+#
+#    You can modify it under the terms of the GNU LESSER
+#    GENERAL PUBLIC LICENSE (LGPL v3), Version 3.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU LESSER GENERAL PUBLIC LICENSE (LGPL v3) for more details.
+#
+#    You should have received a copy of the GNU LESSER GENERAL PUBLIC LICENSE
+#    (LGPL v3) along with this program.
+#    If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+import contextlib
+import hashlib
+import os
+import shutil
+
+from odoo import _
+from odoo.exceptions import UserError
+
+from ..backup_crypto import EncryptingWriter
+from ..backup_stream import CHUNK_SIZE, DigestWriter
+from .base import BackupDriver, BackupEntry, register_driver, \
+    utc_from_timestamp
+
+
+@register_driver
+class LocalDriver(BackupDriver):
+    """Backups stored in a directory of the Odoo server"""
+
+    destination = 'local'
+    label = 'Local'
+
+    def _path(self, name):
+        return os.path.join(self.config.backup_path, name)
+
+    def prepare(self):
+        os.makedirs(self.config.backup_path, exist_ok=True)
+
+    def make_folder(self, name):
+        os.makedirs(self._path(name), exist_ok=True)
+
+    def upload(self, name, stream):
+        with open(self._path(name), 'wb') as file:
+            shutil.copyfileobj(stream, file, CHUNK_SIZE)
+
+    def store_backup(self, name, options):
+        """Without streaming, the backup is dumped straight into its file
+        instead of going through a temporary file"""
+        config = self.config
+        if config.backup_streaming:
+            return super().store_backup(name, options)
+        stats = options['stats']
+        digest = hashlib.sha256()
+        with config._measure(stats, 'upload_time'), \
+                open(self._path(name), 'wb') as file:
+            writer = DigestWriter(file, [digest])
+            with EncryptingWriter(writer, config.encryption_passphrase) \
+                    if config.backup_encryption else \
+                    contextlib.nullcontext(writer) as target:
+                config.dump_data(config.db_name, target,
+                                 config.backup_format, **options)
+            stats['backup_size'] = writer.bytes_written
+        self.verify(name, None, {}, writer.bytes_written)
+        self.checksum = digest.hexdigest()
+        self.key = self._path(name)
+        self.size = writer.bytes_written
+
+    def stored_key(self, name, result):
+        return self._path(name)
+
+    def download(self, name):
+        return open(self._path(name), 'rb')
+
+    def verify(self, name, result, digests, size):
+        self.check(name, 'size', size, os.path.getsize(self._path(name)))
+
+    def list(self):
+        with os.scandir(self.config.backup_path) as entries:
+            return [BackupEntry(entry.name, entry.path,
+                                utc_from_timestamp(entry.stat().st_ctime),
+                                entry.stat().st_size)
+                    for entry in entries if entry.is_file()]
+
+    def delete(self, keys):
+        """Delete the files, which must all be inside the backup folder"""
+        root = os.path.realpath(self.config.backup_path)
+        paths = [os.path.realpath(path) for path in keys]
+        for key, path in zip(keys, paths):
+            if not path.startswith(root + os.sep):
+                raise UserError(_("%(path)s is not in the backup folder "
+                                  "%(folder)s, it is not deleted.",
+                                  path=key, folder=root))
+        for path in paths:
+            os.remove(path)
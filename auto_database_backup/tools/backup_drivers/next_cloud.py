@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+###############################################################################
+#
+#    Cybrosys Technologies Pvt. Ltd.
+#
+#    Copyright (C) 2023-TODAY Cybrosys Technologies(<https://www.cybrosys.com>)
+#    Author: Cybrosys Techno Solutions (odoo@cybrosys.com)
+#
+#    You can modify it under the terms of the GNU LESSER
+#    GENERAL PUBLIC LICENSE (LGPL v3), Version 3.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU LESSER GENERAL PUBLIC LICENSE (LGPL v3) for more details.
+#
+#    You should have received a copy of the GNU LESSER GENERAL PUBLIC LICENSE
+#    (LGPL v3) along with this program.
+#    If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+import collections
+import itertools
+import posixpath
+import requests
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from lxml import etree
+from requests.adapters import HTTPAdapter
+from urllib.parse import quote, unquote
+
+from ..backup_stream import iter_chunks
+from .base import BackupDriver, BackupEntry, UploadSessionLost, \
+    register_driver
+
+# Chunks of the chunked upload v2 are between 5 MiB and 5 GiB, except for
+# the last one, and are numbered from 1 to 10000
+NEXTCLOUD_MIN_CHUNK_MB = 5
+NEXTCLOUD_MAX_CHUNK_MB = 5 * 1024
+DAV_PROPFIND = b"""<?xml version="1.0"?>
+<d:propfind xmlns:d="DAV:"><d:prop>
+<d:getlastmodified/><d:getcontentlength/><d:resourcetype/>
+</d:prop></d:propfind>"""
+DAV_NAMESPACES = {'d': 'DAV:'}
+
+
+@register_driver
+class NextcloudDriver(BackupDriver):
+    """Backups stored in a Nextcloud folder, reached through WebDAV. The
+    connection is a `requests` session authenticated as the user."""
+
+    destination = 'next_cloud'
+    resumable = True
+    label = 'NextCloud'
+
+    def __init__(self, config, connection):
+        super().__init__(config, connection)
+        # Folders known to exist, so that they are only looked up once
+        self._folders = set()
+
+    @classmethod
+    def connection_key(cls, config):
+        return config.domain, config.next_cloud_user_name
+
+    @classmethod
+    def connect(cls, config):
+        session = requests.Session()
+        session.auth = (config.next_cloud_user_name,
+                        config.next_cloud_password)
+        adapter = HTTPAdapter(
+            pool_maxsize=max(config.nextcloud_max_concurrency, 1))
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    @classmethod
+    def disconnect(cls, connection):
+        connection.close()
+
+    def _dav_url(self, root, path):
+        return '%s/remote.php/dav/%s/%s%s' % (
+            self.config.domain.rstrip('/'), root,
+            quote(self.config.next_cloud_user_name), quote(path))
+
+    def _path(self, name):
+        return '/%s/%s' % (self.config.nextcloud_folder_key, name)
+
+    def _propfind(self, path, depth):
+        """Properties of the file or folder `path` and, with a `depth` of 1,
+        of its children, as `(href, property element)` pairs. Returns None
+        when `path` does not exist."""
+        response = self.connection.request(
+            'PROPFIND', self._dav_url('files', path), data=DAV_PROPFIND,
+            headers={'Depth': str(depth)})
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return [(unquote(item.findtext('d:href', namespaces=DAV_NAMESPACES)),
+                 item.find('d:propstat/d:prop', DAV_NAMESPACES))
+                for item in etree.fromstring(response.content).iterfind(
+                    'd:response', DAV_NAMESPACES)]
+
+    def prepare(self):
+        self.make_folder('')
+
+    def make_folder(self, name):
+        """Create the folder unless this driver already found it"""
+        path = self._path(name).rstrip('/')
+        if path in self._folders:
+            return
+        if self._propfind(path, 0) is None:
+            response = self.connection.request(
+                'MKCOL', self._dav_url('files', path))
+            # 405 when the folder was created in the meantime
+            if response.status_code != 405:
+                response.raise_for_status()
+        self._folders.add(path)
+
+    @property
+    def chunk_size(self):
+        return min(max(self.config.nextcloud_chunk_size,
+                       NEXTCLOUD_MIN_CHUNK_MB),
+                   NEXTCLOUD_MAX_CHUNK_MB) * 1024 * 1024
+
+    def upload(self, name, stream):
+        """Chunked upload v2 of `stream`: the chunks are read from it and
+        sent by several threads into an upload folder, then assembled into
+        the file. The session is saved as soon as all the chunks before an
+        offset are stored, so that a later attempt resumes from there. An
+        empty stream has no chunk, it is sent in a single request."""
+        offset = (self.session or {}).get('offset', 0)
+        upload_url = (self.session or {}).get('url')
+        chunk_size = (self.session or {}).get('chunk_size', self.chunk_size)
+        headers = {'Destination': self._dav_url('files', self._path(name))}
+        chunks = iter_chunks(stream, chunk_size, offset)
+        if offset:
+            response = self.connection.request('PROPFIND', upload_url,
+                                               headers={'Depth': '0'})
+            if response.status_code == 404:
+                # Expired, or already assembled
+                raise UploadSessionLost()
+            response.raise_for_status()
+        else:
+            first = next(chunks, None)
+            if first is None:
+                self._check_stored(name, self.connection.put(
+                    headers['Destination'], data=b''))
+                return
+            chunks = itertools.chain([first], chunks)
+            upload_url = self._dav_url('uploads', '/%s' % uuid.uuid4().hex)
+            self.connection.request(
+                'MKCOL', upload_url, headers=headers).raise_for_status()
+            self.save_session(url=upload_url, chunk_size=chunk_size)
+
+        def send(start, data, is_last):
+            response = self.connection.put(
+                '%s/%d' % (upload_url, start // chunk_size + 1), data=data,
+                headers=headers)
+            if response.status_code >= 500:
+                return False
+            response.raise_for_status()
+            return True
+
+        concurrency = max(self.config.nextcloud_max_concurrency, 1)
+        pending = collections.deque()
+        size = offset
+        with ThreadPoolExecutor(max_workers=concurrency,
+                                thread_name_prefix='nextcloud') as executor:
+            for start, data, is_last in chunks:
+                if len(pending) == concurrency:
+                    self._stored_chunk(*pending.popleft())
+                # A chunk is always sent again as a whole
+                pending.append((start + len(data), executor.submit(
+                    self._send_range, start, data, is_last, send,
+                    lambda end, is_last, start=start: start)))
+                size = start + len(data)
+            while pending:
+                self._stored_chunk(*pending.popleft())
+        self._check_stored(name, self.connection.request(
+            'MOVE', upload_url + '/.file',
+            headers=dict(headers, **{'OC-Total-Length': str(size)})))
+
+    def _check_stored(self, name, response):
+        """Raise if the file `name` was not stored by `response`"""
+        if response.status_code == 409:
+            # The folder was removed since it was looked up
+            self._folders.discard(posixpath.dirname(self._path(name)))
+        response.raise_for_status()
+
+    def _stored_chunk(self, end, future):
+        """Wait for the upload of the chunk ending at `end`, the chunks
+        before it are already stored"""
+        future.result()
+        self.save_session(offset=end)
+
+    @staticmethod
+    def _size(prop):
+        return int(prop.findtext('d:getcontentlength', '0', DAV_NAMESPACES))
+
+    def download(self, name):
+        return self.response_stream(self.connection.get(
+            self._dav_url('files', self._path(name)), stream=True))
+
+    def verify(self, name, result, digests, size):
+        stored = self._propfind(self._path(name), 0)
+        self.check(name, 'size', size,
+                   self._size(stored[0][1]) if stored else None)
+
+    def stored_key(self, name, result):
+        return self._path(name)
+
+    def list(self):
+        """List the files of the folder with a single PROPFIND request, the
+        keys are their paths from the root of the user files"""
+        root = '/' + unquote(self._dav_url('files', '').split('/', 3)[3])
+        return [BackupEntry(
+            posixpath.basename(href.rstrip('/')), href[len(root):],
+            parsedate_to_datetime(prop.findtext(
+                'd:getlastmodified', namespaces=DAV_NAMESPACES)).replace(
+                tzinfo=None), self._size(prop))
+            for href, prop in self._propfind(self._path(''), 1) or []
+            if prop.find('d:resourcetype/d:collection',
+                         DAV_NAMESPACES) is None]
+
+    def delete(self, keys):
+        for path in keys:
+            response = self.connection.delete(self._dav_url('files', path))
+            if response.status_code != 404:
+                response.raise_for_status()
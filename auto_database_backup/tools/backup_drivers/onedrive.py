@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+###############################################################################
+#
+#    Cybrosys Technologies Pvt. Ltd.
+#
+#    Copyright (C) 2023-TODAY Cybrosys Technologies(<https://www.cybrosys.com>)
+#    Author: Cybrosys Techno Solutions (odoo@cybrosys.com)
+#
+#    You can modify it under the terms of the GNU LESSER
+#    GENERAL PUBLIC LICENSE (LGPL v3), Version 3.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU LESSER GENERAL PUBLIC LICENSE (LGPL v3) for more details.
+#
+#    You should have received a copy of the GNU LESSER GENERAL PUBLIC LICENSE
+#    (LGPL v3) along with this program.
+#    If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+import logging
+import requests
+from datetime import datetime
+
+from odoo import fields, _
+from odoo.exceptions import UserError
+
+from ..backup_stream import skip
+from .base import BackupDriver, BackupEntry, UploadSessionLost, \
+    register_driver
+
+_logger = logging.getLogger(__name__)
+
+MICROSOFT_GRAPH_END_POINT = "https://graph.microsoft.com"
+# Ranges must be multiples of 320 KiB, except for the last one
+ONEDRIVE_CHUNK_UNIT = 320 * 1024
+# Onedrive refuses upload requests larger than 60 MiB
+ONEDRIVE_MAX_CHUNK_MB = 60
+# Microsoft Graph JSON batches hold at most 20 requests
+ONEDRIVE_BATCH_SIZE = 20
+
+
+@register_driver
+class OnedriveDriver(BackupDriver):
+    """Backups stored in a Onedrive folder, the connection is the
+    authorization header of the configuration"""
+
+    destination = 'onedrive'
+    resumable = True
+    # Every range of an upload session gives the size of the file
+    requires_size = True
+    label = 'Onedrive'
+
+    @classmethod
+    def connect(cls, config):
+        if config.onedrive_token_validity <= fields.Datetime.now():
+            config.generate_onedrive_refresh_token()
+        return {'Authorization': 'Bearer %s' % config.onedrive_access_token,
+                'Content-Type': 'application/json'}
+
+    def _item_url(self, item):
+        return MICROSOFT_GRAPH_END_POINT + "/v1.0/me/drive/items/%s" % item
+
+    def upload(self, name, stream):
+        """Upload `stream` in ranged requests of an upload session. When a
+        request fails the session tells which bytes it still expects and
+        the range is sent again from there. The session is saved after
+        every range, so that a later attempt resumes it."""
+        if self.upload_size is None:
+            raise UserError(_("Onedrive needs the size of %s before it is "
+                              "uploaded.", name))
+        offset = (self.session or {}).get('offset', 0)
+        upload_url = (self.session or {}).get('url')
+        if not upload_url:
+            upload_session = requests.post(
+                self._item_url(self.config.onedrive_folder_key) +
+                ":/%s:/createUploadSession" % name, headers=self.connection)
+            upload_session.raise_for_status()
+            upload_url = upload_session.json().get('uploadUrl')
+            self.save_session(url=upload_url)
+        uploaded = {}
+        chunk_size = max(
+            self.config.onedrive_chunk_size * 1024 * 1024 //
+            ONEDRIVE_CHUNK_UNIT, 1) * ONEDRIVE_CHUNK_UNIT
+
+        def send(offset, data, is_last):
+            response = requests.put(upload_url, data=data, headers={
+                'Content-Range': self.content_range(
+                    offset, data, is_last, self.upload_size)})
+            if response.status_code >= 500:
+                return False
+            response.raise_for_status()
+            if response.status_code in (200, 201):
+                uploaded.update(response.json())
+            return True
+
+        def resume(end, is_last):
+            # Resume from the first byte the session still expects
+            status = requests.get(upload_url)
+            status.raise_for_status()
+            expected = status.json().get('nextExpectedRanges')
+            return int(expected[0].split('-')[0]) if expected else None
+
+        if offset:
+            try:
+                expected = resume(offset, False)
+            except requests.HTTPError as error:
+                # Expired, or completed and closed
+                raise UploadSessionLost() from error
+            if expected is None or expected < offset:
+                raise UploadSessionLost()
+            skip(stream, expected - offset)
+            offset = expected
+        self.upload_ranges(stream, chunk_size, send, resume, offset,
+                           lambda end: self.save_session(offset=end))
+        return uploaded
+
+    def _stored_item(self, name, result):
+        """Metadata of the item uploaded as `name`, read again when the
+        session completed while retrying and `result` is empty"""
+        if result:
+            return result
+        response = requests.get(
+            self._item_url(self.config.onedrive_folder_key) + ":/%s" % name,
+            headers=self.connection)
+        response.raise_for_status()
+        return response.json()
+
+    def stored_key(self, name, result):
+        return self._stored_item(name, result)['id']
+
+    def download(self, name):
+        return self.response_stream(requests.get(
+            self._item_url(self.config.onedrive_folder_key) +
+            ":/%s:/content" % name, headers=self.connection, stream=True))
+
+    def verify(self, name, result, digests, size):
+        """Compare with the size and, on personal accounts which provide
+        it, the SHA-256 computed by Onedrive"""
+        result = self._stored_item(name, result)
+        self.check(name, 'size', size, result.get('size'))
+        sha256 = result.get('file', {}).get('hashes', {}).get('sha256Hash')
+        if sha256:
+            self.check(name, 'SHA-256', digests['sha256'].hexdigest().upper(),
+                       sha256.upper())
+
+    def list(self):
+        """List the children of the backup folder, following the
+        @odata.nextLink of every page"""
+        url = self._item_url(self.config.onedrive_folder_key) + \
+            "/children?$select=id,name,createdDateTime,size"
+        entries = []
+        while url:
+            response = requests.get(url, headers=self.connection)
+            response.raise_for_status()
+            result = response.json()
+            entries += [BackupEntry(
+                file['name'], file['id'], datetime.strptime(
+                    file['createdDateTime'][:19], '%Y-%m-%dT%H:%M:%S'),
+                file.get('size'))
+                for file in result.get('value', [])]
+            url = result.get('@odata.nextLink')
+        return entries
+
+    def delete(self, keys):
+        """Delete the items with JSON batch requests"""
+        for index in range(0, len(keys), ONEDRIVE_BATCH_SIZE):
+            response = requests.post(
+                MICROSOFT_GRAPH_END_POINT + "/v1.0/$batch", json={
+                    'requests': [{
+                        'id': str(number), 'method': 'DELETE',
+                        'url': '/me/drive/items/%s' % item,
+                    } for number, item in enumerate(
+                        keys[index:index + ONEDRIVE_BATCH_SIZE])]},
+                headers=self.connection)
+            response.raise_for_status()
+            failed = [str(result['status'])
+                      for result in response.json().get('responses', [])
+                      if result['status'] >= 400]
+            if failed:
+                _logger.warning('Onedrive could not delete %s backups: %s',
+                                len(failed), ', '.join(failed))
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+###############################################################################
+#
+#    Cybrosys Technologies Pvt. Ltd.
+#
+#    Copyright (C) 2023-TODAY Cybrosys Technologies(<https://www.cybrosys.com>)
+#    Author: Cybrosys Techno Solutions (odoo@cybrosys.com)
+#
+#    You can modify it under the terms of the GNU LESSER
+#    GENERAL PUBLIC LICENSE (LGPL v3), Version 3.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU LESSER GENERAL PUBLIC LICENSE (LGPL v3) for more details.
+#
+#    You should have received a copy of the GNU LESSER GENERAL PUBLIC LICENSE
+#    (LGPL v3) along with this program.
+#    If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+import errno
+import paramiko
+import posixpath
+import shutil
+import stat
+
+from ..backup_stream import CHUNK_SIZE, skip
+from .base import BackupDriver, BackupEntry, UploadSessionLost, \
+    register_driver, utc_from_timestamp
+
+# Receive window of the SFTP channel, how much the server may send before
+# it waits for us. It speeds up the prefetched downloads of the restores.
+# Uploads are bound by the window of the server and rely on pipelining.
+SFTP_WINDOW_SIZE = 64 * 1024 * 1024
+# The upload offset is saved every time this many bytes are written
+SFTP_CHECKPOINT_SIZE = 32 * 1024 * 1024
+
+
+@register_driver
+class SftpDriver(BackupDriver):
+    """Backups stored on an SFTP server"""
+
+    destination = 'sftp'
+    label = 'SFTP'
+    resumable = True
+
+    @classmethod
+    def connection_key(cls, config):
+        return config.sftp_host, config.sftp_port, config.sftp_user
+
+    @classmethod
+    def connect(cls, config):
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        try:
+            client.connect(hostname=config.sftp_host,
+                           username=config.sftp_user,
+                           password=config.sftp_password,
+                           port=config.sftp_port)
+            return client, paramiko.SFTPClient.from_transport(
+                client.get_transport(), window_size=SFTP_WINDOW_SIZE)
+        except Exception:
+            client.close()
+            raise
+
+    @classmethod
+    def disconnect(cls, connection):
+        client, sftp = connection
+        sftp.close()
+        client.close()
+
+    @property
+    def sftp(self):
+        return self.connection[1]
+
+    def _path(self, name):
+        return posixpath.join(self.config.sftp_path, name)
+
+    def prepare(self):
+        self.make_folder('')
+
+    def make_folder(self, name):
+        try:
+            self.sftp.stat(self._path(name))
+        except IOError as e:
+            if e.errno != errno.ENOENT:
+                raise
+            self.sftp.mkdir(self._path(name))
+
+    def upload(self, name, stream):
+        """Write `stream` in pipelined requests, sent without waiting for
+        the acknowledgement of the previous ones, which is what keeps the
+        link busy on high latency connections. A lost write shows in the
+        size compared by `verify`. For a staged backup the size the server
+        stored is saved every SFTP_CHECKPOINT_SIZE bytes, and a later
+        attempt writes on from there."""
+        path = self._path(name)
+        offset = (self.session or {}).get('offset', 0)
+        if offset:
+            try:
+                stored = self.sftp.stat(path).st_size
+            except IOError as error:
+                raise UploadSessionLost() from error
+            if stored < offset:
+                raise UploadSessionLost()
+            skip(stream, stored - offset)
+            offset = stored
+        with self.sftp.open(path, 'r+b' if offset else 'wb',
+                            CHUNK_SIZE) as file:
+            file.seek(offset)
+            file.set_pipelined(True)
+            if self.session is None:
+                shutil.copyfileobj(stream, file, CHUNK_SIZE)
+                return
+            for data in iter(lambda: stream.read(SFTP_CHECKPOINT_SIZE),
+                             b''):
+                file.write(data)
+                file.flush()
+                # Answered once the server wrote the requests sent before
+                self.save_session(offset=file.stat().st_size)
+
+    def stored_key(self, name, result):
+        return self._path(name)
+
+    def download(self, name):
+        # Prefetching requests the blocks ahead instead of one at a time
+        file = self.sftp.open(self._path(name), 'rb')
+        file.prefetch()
+        return file
+
+    def verify(self, name, result, digests, size):
+        self.check(name, 'size', size,
+                   self.sftp.stat(self._path(name)).st_size)
+
+    def list(self):
+        """List the files of the folder with their attributes, read by a
+        single listdir_attr instead of a stat per file"""
+        return [BackupEntry(attr.filename, self._path(attr.filename),
+                            utc_from_timestamp(attr.st_mtime), attr.st_size)
+                for attr in self.sftp.listdir_attr(self.config.sftp_path)
+                if attr.st_mode is None or stat.S_ISREG(attr.st_mode)]
+
+    def delete(self, keys):
+        for path in keys:
+            self.sftp.unlink(path)
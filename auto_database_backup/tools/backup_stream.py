@@ -0,0 +1,451 @@
+# -*- coding: utf-8 -*-
+###############################################################################
+#
+#    Cybrosys Technologies Pvt. Ltd.
+#
+#    Copyright (C) 2023-TODAY Cybrosys Technologies(<https://www.cybrosys.com>)
+#    Author: Cybrosys Techno Solutions (odoo@cybrosys.com)
+#
+#    You can modify it under the terms of the GNU LESSER
+#    GENERAL PUBLIC LICENSE (LGPL v3), Version 3.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU LESSER GENERAL PUBLIC LICENSE (LGPL v3) for more details.
+#
+#    You should have received a copy of the GNU LESSER GENERAL PUBLIC LICENSE
+#    (LGPL v3) along with this program.
+#    If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+import hashlib
+import queue
+import threading
+import time
+
+CHUNK_SIZE = 8 * 1024 * 1024
+_EOF = object()
+
+
+class ChunkedStream:
+    """Read-only file object over an iterator of byte chunks.
+
+    It lets the upload APIs of the different destinations (``storbinary``,
+    ``putfo``, ``upload_fileobj``, ``requests`` bodies, ...) consume a backup
+    while it is still being produced, without any full-size copy on disk."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._pending = b''
+        self._offset = 0
+        self._position = 0
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __iter__(self):
+        while True:
+            chunk = self.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return False
+
+    def tell(self):
+        return self._position
+
+    def read(self, size=-1):
+        """Return exactly `size` bytes, or less only at the end of stream"""
+        parts = []
+        remaining = size
+        while remaining:
+            if self._offset >= len(self._pending):
+                chunk = next(self._chunks, None)
+                if chunk is None:
+                    break
+                self._pending = chunk
+                self._offset = 0
+                continue
+            end = len(self._pending) if remaining < 0 else min(
+                len(self._pending), self._offset + remaining)
+            parts.append(self._pending[self._offset:end])
+            if remaining > 0:
+                remaining -= end - self._offset
+            self._offset = end
+        data = b''.join(parts)
+        self._position += len(data)
+        return data
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            close = getattr(self._chunks, 'close', None)
+            if close:
+                close()
+
+
+class _QueueWriter:
+    """Write-only file object feeding a bounded queue with fixed-size chunks"""
+
+    def __init__(self, chunk_queue, cancelled, chunk_size):
+        self._queue = chunk_queue
+        self._cancelled = cancelled
+        self._chunk_size = chunk_size
+        self._buffer = bytearray()
+
+    def write(self, data):
+        self._buffer += data
+        while len(self._buffer) >= self._chunk_size:
+            self._put(bytes(self._buffer[:self._chunk_size]))
+            del self._buffer[:self._chunk_size]
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        if self._buffer:
+            self._put(bytes(self._buffer))
+            self._buffer.clear()
+
+    def _put(self, item):
+        while True:
+            if self._cancelled.is_set():
+                raise BrokenPipeError('Backup stream consumer went away')
+            try:
+                self._queue.put(item, timeout=1)
+                return
+            except queue.Full:
+                continue
+
+
+def threaded_chunks(producer, chunk_size=CHUNK_SIZE, depth=4):
+    """Run ``producer(fileobj)`` in a thread and yield what it writes.
+
+    At most `depth` chunks are buffered in memory, so the producer is slowed
+    down to the pace of the consumer. An exception raised by the producer is
+    raised again in the consumer."""
+    chunk_queue = queue.Queue(maxsize=depth)
+    cancelled = threading.Event()
+    errors = []
+
+    def run():
+        writer = _QueueWriter(chunk_queue, cancelled, chunk_size)
+        try:
+            producer(writer)
+            writer.drain()
+        except BaseException as error:
+            errors.append(error)
+        finally:
+            while not cancelled.is_set():
+                try:
+                    chunk_queue.put(_EOF, timeout=1)
+                    break
+                except queue.Full:
+                    continue
+
+    thread = threading.Thread(target=run, name='backup-stream', daemon=True)
+    thread.start()
+    try:
+        while True:
+            chunk = chunk_queue.get()
+            if chunk is _EOF:
+                break
+            yield chunk
+        if errors:
+            raise errors[0]
+    finally:
+        cancelled.set()
+        thread.join()
+
+
+class _Abort:
+    """Queue item telling a consumer that the source of its stream failed"""
+
+    def __init__(self, error):
+        self.error = error
+
+
+def fan_out(chunks, consumers, depth=4):
+    """Send the same stream to several consumers at the same time.
+
+    Every ``consumer(fileobj)`` runs in its own thread and reads a
+    `ChunkedStream` of `chunks`, which are only produced once. At most
+    `depth` chunks are buffered per consumer, so the source goes at the
+    pace of the slowest one. A consumer failing does not stop the others.
+    Production stops as soon as no consumer is left. If `chunks` fails, the
+    consumers get the error while reading, so that no truncated stream is
+    stored, and it is raised again.
+    Return the exception raised by each consumer, or None."""
+    queues = [queue.Queue(maxsize=depth) for _consumer in consumers]
+    finished = [threading.Event() for _consumer in consumers]
+    errors = [None] * len(consumers)
+
+    def read(index):
+        while True:
+            chunk = queues[index].get()
+            if chunk is _EOF:
+                return
+            if isinstance(chunk, _Abort):
+                raise chunk.error
+            yield chunk
+
+    def run(index, consumer):
+        try:
+            with ChunkedStream(read(index)) as stream:
+                consumer(stream)
+        except BaseException as error:
+            errors[index] = error
+        finally:
+            finished[index].set()
+
+    def put(index, item):
+        while not finished[index].is_set():
+            try:
+                queues[index].put(item, timeout=1)
+                return
+            except queue.Full:
+                continue
+
+    threads = [threading.Thread(target=run, args=(index, consumer),
+                                name='backup-fan-out-%d' % index, daemon=True)
+               for index, consumer in enumerate(consumers)]
+    for thread in threads:
+        thread.start()
+    chunks = iter(chunks)
+    try:
+        for chunk in chunks:
+            if all(event.is_set() for event in finished):
+                break
+            for index in range(len(consumers)):
+                put(index, chunk)
+    except BaseException as error:
+        for index in range(len(consumers)):
+            put(index, _Abort(error))
+        raise
+    else:
+        for index in range(len(consumers)):
+            put(index, _EOF)
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+        for thread in threads:
+            thread.join()
+    return errors
+
+
+def iter_chunks(fileobj, chunk_size, offset=0):
+    """Yield ``(offset, data, is_last)`` for fixed-size chunks of `fileobj`,
+    whose first byte is at `offset`.
+
+    One chunk is read ahead so that the last one is known before it is sent,
+    as required by the ranged upload protocols of Google Drive and Onedrive
+    when the total size is not known in advance."""
+    data = fileobj.read(chunk_size)
+    while data:
+        following = fileobj.read(chunk_size) if len(data) == chunk_size \
+            else b''
+        yield offset, data, not following
+        offset += len(data)
+        data = following
+
+
+def skip(fileobj, size):
+    """Read and drop the next `size` bytes of `fileobj`"""
+    while size > 0:
+        data = fileobj.read(min(size, CHUNK_SIZE))
+        if not data:
+            raise EOFError('%d bytes missing' % size)
+        size -= len(data)
+
+
+class ReplayReader:
+    """Read-only file object over `stream`, whose first byte is at `offset`,
+    keeping the last `size` bytes read so that reading can go back to any of
+    them with `seek`. It lets an upload sent in a single transfer go on from
+    what the destination stored after the connection dropped."""
+
+    def __init__(self, stream, offset=0, size=CHUNK_SIZE):
+        self._stream = stream
+        self._size = size
+        self._tail = bytearray()
+        self._position = offset
+        self._end = offset
+
+    def read(self, size=-1):
+        if self._position < self._end:
+            start = len(self._tail) - (self._end - self._position)
+            data = bytes(self._tail[start:] if size < 0
+                         else self._tail[start:start + size])
+        else:
+            data = self._stream.read(size)
+            self._tail += data
+            del self._tail[:-self._size]
+            self._end += len(data)
+        self._position += len(data)
+        return data
+
+    def seek(self, offset):
+        """Go back to `offset`, return False when it is no longer kept"""
+        if not self._end - len(self._tail) <= offset <= self._end:
+            return False
+        self._position = offset
+        return True
+
+    def tell(self):
+        return self._position
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return False
+
+
+class CountingWriter:
+    """Write-only file object counting the bytes written into `stream`"""
+
+    def __init__(self, stream):
+        self._stream = stream
+        self.bytes_written = 0
+
+    def write(self, data):
+        self._stream.write(data)
+        self.bytes_written += len(data)
+        return len(data)
+
+    def flush(self):
+        self._stream.flush()
+
+
+class DigestReader:
+    """Read-only file object over `stream` which passes every byte read to
+    the hashlib like `digests`, so that a backup is hashed while it is
+    uploaded, without reading it twice"""
+
+    def __init__(self, stream, digests):
+        self._stream = stream
+        self._digests = list(digests)
+        self._position = 0
+
+    def read(self, size=-1):
+        data = self._stream.read(size)
+        for digest in self._digests:
+            digest.update(data)
+        self._position += len(data)
+        return data
+
+    def tell(self):
+        return self._position
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return False
+
+    def __iter__(self):
+        return iter(lambda: self.read(CHUNK_SIZE), b'')
+
+
+class DigestWriter(CountingWriter):
+    """Write-only file object counting and hashing with `digests` the bytes
+    written into `stream`"""
+
+    def __init__(self, stream, digests):
+        super().__init__(stream)
+        self._digests = list(digests)
+
+    def write(self, data):
+        for digest in self._digests:
+            digest.update(data)
+        return super().write(data)
+
+
+class BlockDigest:
+    """Hashlib like digest of the concatenated digests of the `block_size`
+    blocks of the data, the scheme storage providers use to hash files
+    uploaded in parts (Dropbox content hash, S3 multipart ETag)"""
+
+    def __init__(self, block_size, algorithm='sha256'):
+        self.block_size = block_size
+        self.algorithm = algorithm
+        self.blocks = []
+        self._block = hashlib.new(algorithm)
+        self._filled = 0
+
+    def update(self, data):
+        data = memoryview(data)
+        while data:
+            size = min(self.block_size - self._filled, len(data))
+            self._block.update(data[:size])
+            self._filled += size
+            data = data[size:]
+            if self._filled == self.block_size:
+                self.blocks.append(self._block.digest())
+                self._block = hashlib.new(self.algorithm)
+                self._filled = 0
+
+    def block_digests(self):
+        """Digests of every block, the last one possibly partial"""
+        if self._filled:
+            return self.blocks + [self._block.digest()]
+        return list(self.blocks)
+
+    def hexdigest(self):
+        return hashlib.new(
+            self.algorithm, b''.join(self.block_digests())).hexdigest()
+
+
+class Throttle:
+    """Keep a transfer under `rate` bytes per second on average, `consume`
+    sleeps as long as the bytes transferred so far are ahead of the rate.
+    A rate of 0 does not limit anything."""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self._start = time.monotonic()
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def consume(self, size):
+        if not self.rate:
+            return
+        with self._lock:
+            self._total += size
+            delay = self._total / self.rate - (time.monotonic() - self._start)
+        if delay > 0:
+            time.sleep(delay)
+
+
+class ThrottledReader:
+    """Read-only file object over `stream` whose reads are paced by the
+    `throttle`"""
+
+    def __init__(self, stream, throttle):
+        self._stream = stream
+        self._throttle = throttle
+
+    def read(self, size=-1):
+        data = self._stream.read(size)
+        self._throttle.consume(len(data))
+        return data
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return False
+
+    def __iter__(self):
+        return iter(lambda: self.read(CHUNK_SIZE), b'')
@@ -19,4 +19,5 @@
 #    If not, see <http://www.gnu.org/licenses/>.
 #
 ###############################################################################
+from . import db_backup_restore
 from . import dropbox_auth_code
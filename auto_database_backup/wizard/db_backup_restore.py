@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+###############################################################################
+#
+#    Cybrosys Technologies Pvt. Ltd.
+#
+#    Copyright (C) 2023-TODAY Cybrosys Technologies(<https://www.cybrosys.com>)
+#    Author: Cybrosys Techno Solutions (odoo@cybrosys.com)
+#
+#    You can modify it under the terms of the GNU LESSER
+#    GENERAL PUBLIC LICENSE (LGPL v3), Version 3.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU LESSER GENERAL PUBLIC LICENSE (LGPL v3) for more details.
+#
+#    You should have received a copy of the GNU LESSER GENERAL PUBLIC LICENSE
+#    (LGPL v3) along with this program.
+#    If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+from odoo import fields, models, _
+from odoo.exceptions import UserError
+from odoo.service import db
+
+
+class DbBackupRestore(models.TransientModel):
+    """Wizard restoring a backup of a configuration into a new database,
+    streamed back from the destination of the configuration by a restore
+    job"""
+    _name = 'db.backup.restore'
+    _description = 'Database Backup Restore'
+
+    config_id = fields.Many2one('db.backup.configure',
+                                string='Backup Configuration', required=True,
+                                ondelete='cascade',
+                                help='Configuration which made the backup')
+    backup_mode = fields.Selection(related='config_id.backup_mode')
+    backup_id = fields.Many2one(
+        'db.backup.catalog', string='Backup', required=True,
+        domain="[('config_id', '=', config_id)]",
+        help='Backup to restore, from the catalog of the configuration')
+    master_pwd = fields.Char(string='Master Password',
+                             help='Master password of the Odoo server, '
+                                  'required to restore a backup')
+    db_name = fields.Char(string='New Database Name',
+                          help='Name of the database created by the restore')
+    recovery_target_time = fields.Datetime(
+        string='Restore To', default=fields.Datetime.now,
+        help='Point in time the restored cluster is recovered to')
+    data_directory = fields.Char(
+        string='Data Directory',
+        help='Empty directory receiving the restored PostgreSQL cluster, '
+             'started afterwards with pg_ctl or as a service. It is inside '
+             'the backup_restores folder of the Odoo data directory, or the '
+             'folder of the auto_database_backup.restore_directory system '
+             'parameter, a relative path starts from there.')
+    restore_jobs = fields.Integer(
+        string='Restore Jobs', default=2,
+        help='Number of tables restored in parallel by pg_restore, for the '
+             'Dump and Directory formats')
+    copy_database = fields.Boolean(
+        string='This Database Is a Copy',
+        help='Give the restored database a new UUID, so that it is not '
+             'mistaken for the original')
+
+    def action_restore(self):
+        """Check the master password and queue the restore of the backup,
+        which a scheduled action runs in the background"""
+        self.ensure_one()
+        db.check_super(self.master_pwd)
+        self.master_pwd = False
+        self.config_id._check_restore_access()
+        if self.backup_mode == 'continuous':
+            values = self._point_in_time_values()
+            message = _("The cluster is being restored into %(directory)s "
+                        "in the background, follow it in the Restores menu. "
+                        "It recovers to %(time)s when it is started.",
+                        directory=values['data_directory'],
+                        time=self.recovery_target_time)
+        else:
+            if not self.db_name:
+                raise UserError(_("Set the name of the new database."))
+            if self.restore_jobs < 1:
+                raise UserError(_("Restore Jobs must be at least 1."))
+            if db.exp_db_exist(self.db_name):
+                raise UserError(_("The database %s already exists.",
+                                  self.db_name))
+            values = {'db_name': self.db_name,
+                      'restore_jobs': self.restore_jobs,
+                      'copy_database': self.copy_database}
+            message = _("%(backup)s is being restored into %(database)s in "
+                        "the background, follow it in the Restores menu.",
+                        backup=self.backup_id.name, database=self.db_name)
+        job = self.env['db.backup.restore.job'].create(dict(
+            values, config_id=self.config_id.id, backup_id=self.backup_id.id))
+        job._trigger_restore()
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'type': 'info',
+                'title': _("Restore Started"),
+                'message': message,
+                'sticky': False,
+                'next': {'type': 'ir.actions.act_window_close'},
+            }
+        }
+
+    def _point_in_time_values(self):
+        """Values of the restore job of the cluster to the chosen point in
+        time"""
+        if not self.data_directory or not self.recovery_target_time:
+            raise UserError(_("Set the data directory and the point in time "
+                              "to restore to."))
+        if self.recovery_target_time < self.backup_id.backup_time:
+            raise UserError(_("The base backup was taken after the point in "
+                              "time to restore to."))
+        return {
+            'data_directory': self.config_id._restore_data_directory(
+                self.data_directory),
+            'recovery_target_time': self.recovery_target_time,
+        }